@@ -0,0 +1,98 @@
+"""
+Many concurrent requests against a local stand-in server over HTTP/1.1 with a
+per-client connection cap, and over one multiplexed HTTP/2 connection. Needs
+canvy[http2] and hypercorn, run with `python benchmarks/bench_http2.py`
+"""
+
+import asyncio
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import requests
+from hypercorn.asyncio import serve
+from hypercorn.config import Config
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+from canvy.http2 import HTTP2Adapter
+
+REQUESTS = 600
+CONCURRENCY = 64
+# INFO: Roughly what Canvas hosts allow a single client
+CONNECTION_CAP = 6
+LATENCY = 0.02
+BODY = b"x" * 16 * 1024
+
+
+async def app(scope, receive, send):
+    if scope["type"] != "http":
+        return
+    await asyncio.sleep(LATENCY)
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": BODY})
+
+
+def start_server() -> tuple[str, threading.Event]:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    config = Config()
+    config.bind = [f"127.0.0.1:{port}"]
+    config.loglevel = "WARNING"
+    stop = threading.Event()
+
+    async def run():
+        await serve(app, config, shutdown_trigger=lambda: asyncio.to_thread(stop.wait))
+
+    threading.Thread(target=asyncio.run, args=(run(),), daemon=True).start()
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port)).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    return f"http://127.0.0.1:{port}", stop
+
+
+def run(url: str, adapter: BaseAdapter) -> float:
+    session = requests.Session()
+    session.mount("http://", adapter)
+
+    def fetch(i: int) -> None:
+        response = session.get(f"{url}/files/{i}")
+        response.raise_for_status()
+        if len(response.content) != len(BODY):
+            e = f"Got {len(response.content)} of {len(BODY)} bytes"
+            raise RuntimeError(e)
+
+    fetch(-1)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(CONCURRENCY) as pool:
+        list(pool.map(fetch, range(REQUESTS)))
+    elapsed = time.perf_counter() - started
+    adapter.close()
+    return elapsed
+
+
+def main():
+    url, stop = start_server()
+    http1 = run(
+        url,
+        HTTPAdapter(pool_connections=1, pool_maxsize=CONNECTION_CAP, pool_block=True),
+    )
+    # INFO: Prior knowledge since the stand-in has no TLS to negotiate HTTP/2 with
+    http2 = run(url, HTTP2Adapter(httpx.Client(http1=False, http2=True)))
+    stop.set()
+    print(  # noqa: T201
+        f"{REQUESTS} requests, {CONCURRENCY} at once, {LATENCY * 1000:.0f}ms each"
+    )
+    print(f"HTTP/1.1 over {CONNECTION_CAP} connections: {http1:.2f}s")  # noqa: T201
+    print(  # noqa: T201
+        f"HTTP/2 over 1 connection:  {http2:.2f}s ({http1 / http2:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Scanning large page bodies for file links, the per-page regex extract_files_from_html
+used to build against the single-pass LinkExtractor. The extractor skips ahead to the
+rarer files segment, so it comes out faster while also finding the relative, API and
+cross-course links the regex missed. Run with `python benchmarks/bench_links.py`
+"""
+
+import random
+import re
+import time
+
+from canvy.links import LinkExtractor
+
+URL = "https://university.instructure.com"
+PAGES = 300
+COURSES = 40
+PARAGRAPHS = 600
+LINKS = 40
+ROUNDS = 10
+
+
+def page(rng: random.Random, course_id: int) -> str:
+    parts: list[str] = []
+    for i in range(PARAGRAPHS):
+        words = " ".join(
+            rng.choice(["lecture", "notes", "week", "exam", "see"]) for _ in range(40)
+        )
+        parts.append(
+            f'<p class="p{i}">{words} <a href="{URL}/courses/{course_id}/pages/week-{i}">'
+            f'week {i}</a> <img src="{URL}/images/{i}.png"></p>'
+        )
+    for _ in range(LINKS):
+        file_id = rng.randrange(1, 10**6)
+        link = rng.choice(
+            [
+                f'<a href="{URL}/courses/{course_id}/files/{file_id}/download">f</a>',
+                f'<a href="/courses/{course_id}/files/{file_id}?wrap=1">f</a>',
+                f'<img data-api-endpoint="{URL}/api/v1/courses/{course_id}/files/{file_id}">',
+            ]
+        )
+        parts.insert(rng.randrange(len(parts)), link)
+    return "\n".join(parts)
+
+
+def per_page_regex(body: str, course_id: int) -> list[str]:
+    regex = rf"{URL}/(?:api/v1/)?courses/{course_id}/files/([0-9]+)"
+    return re.findall(regex, body)
+
+
+def main():
+    rng = random.Random(0)  # noqa: S311
+    corpus = [
+        (page(rng, course_id := rng.randrange(COURSES)), course_id)
+        for _ in range(PAGES)
+    ]
+    size = sum(len(body) for body, _ in corpus)
+    extractor = LinkExtractor([URL])
+
+    def timed(fn) -> tuple[float, int]:
+        best, found = float("inf"), 0
+        for _ in range(ROUNDS):
+            # INFO: Patterns built from the URL and course id are compiled afresh per run
+            re.purge()
+            started = time.perf_counter()
+            found = sum(len(fn(body, course_id)) for body, course_id in corpus)
+            best = min(best, time.perf_counter() - started)
+        return best, found
+
+    old, old_found = timed(per_page_regex)
+    new, new_found = timed(lambda body, _: extractor.extract(body))
+    print(f"{PAGES} pages, {size / 1024**2:.1f}MiB of HTML")  # noqa: T201
+    print(f"Per-page regex:   {old * 1000:.1f}ms, {old_found} links")  # noqa: T201
+    print(f"LinkExtractor:    {new * 1000:.1f}ms, {new_found} links")  # noqa: T201
+    print(f"Speedup:          {old / new:.2f}x")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
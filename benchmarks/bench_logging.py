@@ -0,0 +1,79 @@
+"""
+Per-file logging overhead on download worker threads, before and after moving
+log I/O onto a queue listener. Run with `python benchmarks/bench_logging.py`
+"""
+
+import copy
+import logging
+import logging.config
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import QueueHandler
+from pathlib import Path
+
+from canvy.const import DOWNLOAD_WORKERS, LOGGING_CONFIG
+
+FILES = 20_000
+logger = logging.getLogger("canvy.bench")
+
+
+def eager_file(i: int) -> None:
+    key = f"Course/Module {i % 7}/slides-{i}.pdf"
+    logger.info(f"Scanned file({i}) from Page(week-{i % 12})")
+    logger.info(f"Found file: slides-{i}.pdf ({i})")
+    logger.debug(f"Creating directory Course/Module {i % 7} if not existing")
+    logger.info(f"Downloading {key} into /storage/{key}")
+
+
+def lazy_file(i: int) -> None:
+    key = f"Course/Module {i % 7}/slides-{i}.pdf"
+    logger.info("Scanned file(%s) from Page(week-%s)", i, i % 12)
+    logger.info("Found file: slides-%s.pdf (%s)", i, i)
+    logger.debug("Creating directory Course/Module %s if not existing", i % 7)
+    logger.info("Downloading %s into /storage/%s", key, key)
+
+
+def configure(log_fn: Path, *, queued: bool) -> QueueHandler | None:
+    config = copy.deepcopy(LOGGING_CONFIG)
+    config["handlers"]["file"]["filename"] = log_fn
+    if not queued:
+        del config["handlers"]["queue"]
+        config["loggers"]["root"]["handlers"] = ["stderr", "file"]
+    logging.config.dictConfig(config)
+    handler = logging.getHandlerByName("queue")
+    if isinstance(handler, QueueHandler) and handler.listener is not None:
+        handler.listener.start()
+        return handler
+    return None
+
+
+def measure(work, *, queued: bool) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        handler = configure(Path(tmp) / "canvy.log", queued=queued)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(DOWNLOAD_WORKERS) as pool:
+            list(pool.map(work, range(FILES)))
+        elapsed = time.perf_counter() - started
+        if handler is not None and handler.listener is not None:
+            handler.listener.stop()
+        logging.shutdown()
+    return elapsed / FILES * 1e6
+
+
+def main():
+    before = measure(eager_file, queued=False)
+    after = measure(lazy_file, queued=True)
+    print(  # noqa: T201
+        f"{FILES} files, {DOWNLOAD_WORKERS} worker threads, 4 records per file"
+    )
+    print(  # noqa: T201
+        f"before (file handler on workers, f-strings): {before:7.1f} us/file"
+    )
+    print(  # noqa: T201
+        f"after  (queue listener, %-style):            {after:7.1f} us/file"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# pyright: reportAny=false
+# pyright: reportUnknownMemberType=false
+import logging
+from http import HTTPStatus
+
+from canvasapi.canvas import Canvas
+from canvasapi.exceptions import (
+    CanvasException,
+    Forbidden,
+    RateLimitExceeded,
+    ResourceDoesNotExist,
+    Unauthorized,
+)
+from canvasapi.file import File
+from canvasapi.requester import Requester
+from requests import Response, Session
+
+from canvy.coalesce import CoalescingAdapter
+from canvy.retry import RetryAdapter
+from canvy.types import CanvyConfig, RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+
+def requester_of(canvas: Canvas) -> Requester:
+    requester = canvas._Canvas__requester  # pyright: ignore[reportAttributeAccessIssue]
+    return requester
+
+
+def session_of(canvas: Canvas) -> Session:
+    """
+    The requests session canvasapi sends everything through, files included
+    """
+    return requester_of(canvas)._session
+
+
+def coalescer_of(canvas: Canvas) -> CoalescingAdapter | None:
+    """
+    The adapter sharing identical requests of a client, if it was built with one
+    """
+    adapter = session_of(canvas).get_adapter(requester_of(canvas).original_url)
+    return adapter if isinstance(adapter, CoalescingAdapter) else None
+
+
+def build_canvas(config: CanvyConfig) -> Canvas:
+    """
+    Create a Canvas client whose transport retries transient failures and shares
+    identical GETs, over HTTP/2 if the config asks for it
+    """
+    canvas = Canvas(config.canvas_url, config.canvas_key)
+    inner = None
+    if config.http2:
+        try:
+            # INFO: httpx is optional, so the transport is only loaded when asked for
+            from canvy.http2 import HTTP2Adapter  # noqa: PLC0415
+        except ImportError as e:
+            msg = "The HTTP/2 transport needs httpx, install canvy[http2]"
+            raise ImportError(msg) from e
+        inner = HTTP2Adapter()
+    adapter = CoalescingAdapter(
+        RetryAdapter(config.retry or RetryPolicy(), inner=inner)
+    )
+    session = session_of(canvas)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return canvas
+
+
+def stream_file(file: File) -> Response:
+    """
+    Open a streaming download of a file through its client's session, rather than
+    File.download which buffers the whole body in memory
+
+    Raises:
+        The same canvasapi exceptions a buffered request would for error statuses
+    """
+    requester = file._requester
+    response = requester._session.get(
+        file.url,
+        headers={"Authorization": f"Bearer {requester.access_token}"},
+        stream=True,
+    )
+    if response.status_code >= HTTPStatus.BAD_REQUEST:
+        with response:
+            raise_for_canvas_status(response)
+    return response
+
+
+def raise_for_canvas_status(response: Response) -> None:
+    """
+    Mirror how canvasapi's requester turns error statuses into exceptions
+    """
+    status = response.status_code
+    if status == HTTPStatus.UNAUTHORIZED:
+        raise Unauthorized(response.reason)
+    if status == HTTPStatus.FORBIDDEN:
+        raise Forbidden(response.text)
+    if status == HTTPStatus.NOT_FOUND:
+        e = "Not Found"
+        raise ResourceDoesNotExist(e)
+    if status == HTTPStatus.TOO_MANY_REQUESTS:
+        e = "Rate Limit Exceeded"
+        raise RateLimitExceeded(e)
+    if status >= HTTPStatus.BAD_REQUEST:
+        e = f"Encountered an error: status code {status}"
+        raise CanvasException(e)
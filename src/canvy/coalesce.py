@@ -0,0 +1,170 @@
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import timedelta
+from threading import Event, Lock
+from typing import Any
+
+from requests import PreparedRequest, Response
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from canvy.const import COALESCE_CACHE_SIZE, COALESCE_CACHE_TTL, COALESCE_MAX_BODY
+
+logger = logging.getLogger(__name__)
+
+type _Key = tuple[str, tuple[tuple[str, str | bytes], ...]]
+
+
+@dataclass(frozen=True, slots=True)
+class _Stored:
+    """
+    Everything a response needs to be handed out again to another caller
+    """
+
+    status_code: int
+    headers: CaseInsensitiveDict[str]
+    content: bytes
+    encoding: str | None
+    reason: str
+    url: str
+
+    @staticmethod
+    def of(response: Response) -> "_Stored":
+        return _Stored(
+            response.status_code,
+            CaseInsensitiveDict(response.headers),
+            response.content,
+            response.encoding,
+            response.reason,
+            response.url,
+        )
+
+    def response(self, request: PreparedRequest) -> Response:
+        built = Response()
+        built.status_code = self.status_code
+        built.headers = CaseInsensitiveDict(self.headers)
+        built._content = self.content
+        built.encoding = self.encoding
+        built.reason = self.reason
+        built.url = self.url
+        built.request = request
+        built.elapsed = timedelta(0)
+        return built
+
+    def cacheable(self) -> bool:
+        # INFO: API objects only, file bodies would crowd out everything else
+        return (
+            self.status_code == 200  # noqa: PLR2004
+            and "json" in self.headers.get("Content-Type", "")
+            and len(self.content) <= COALESCE_MAX_BODY
+        )
+
+
+class _Flight:
+    """
+    A request on its way, whoever asks for the same thing meanwhile waits for it
+    """
+
+    def __init__(self) -> None:
+        self.done = Event()
+        self.stored: _Stored | None = None
+        self.error: BaseException | None = None
+
+
+class CoalescingAdapter(BaseAdapter):
+    """
+    Transport adapter sending identical GETs that overlap only once, every caller
+    gets its own copy of the response. Successful API responses are also kept in a
+    small LRU cache for a short while, anything but GET and HEAD empties it
+
+    Args:
+        inner: Adapter actually sending requests
+        size: Responses kept at most
+        ttl: Seconds a response is served from the cache
+    """
+
+    def __init__(
+        self,
+        inner: BaseAdapter | None = None,
+        size: int = COALESCE_CACHE_SIZE,
+        ttl: float = COALESCE_CACHE_TTL,
+    ):
+        super().__init__()
+        self.inner = inner or HTTPAdapter()
+        self.size = size
+        self.ttl = ttl
+        self.clock = time.monotonic
+        self.hits = 0
+        self.misses = 0
+        self._cache: OrderedDict[_Key, tuple[float, _Stored]] = OrderedDict()
+        self._flights: dict[_Key, _Flight] = {}
+        self._lock = Lock()
+
+    def send(  # type: ignore[override]
+        self, request: PreparedRequest, *, stream: bool = False, **kwargs: Any
+    ) -> Response:
+        if request.method not in ("GET", "HEAD"):
+            with self._lock:
+                self._cache.clear()
+        # INFO: Streams are read by one caller as they arrive, ranges are partial
+        if request.method != "GET" or stream or "Range" in request.headers:
+            return self.inner.send(request, stream=stream, **kwargs)
+        key = (request.url or "", tuple(sorted(request.headers.items())))
+        with self._lock:
+            if (stored := self._cached(key)) is not None:
+                self.hits += 1
+                return stored.response(request)
+            flight = self._flights.get(key)
+            if leader := flight is None:
+                flight = self._flights[key] = _Flight()
+                self.misses += 1
+            else:
+                self.hits += 1
+        if not leader:
+            return self._follow(flight, request)
+        try:
+            response = self.inner.send(request, stream=False, **kwargs)
+            flight.stored = _Stored.of(response)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+                if flight.stored is not None and flight.stored.cacheable():
+                    self._store(key, flight.stored)
+            flight.done.set()
+        return response
+
+    def _cached(self, key: _Key) -> _Stored | None:
+        if (entry := self._cache.get(key)) is None:
+            return None
+        expires, stored = entry
+        if expires <= self.clock():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return stored
+
+    def _store(self, key: _Key, stored: _Stored) -> None:
+        self._cache[key] = (self.clock() + self.ttl, stored)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.size:
+            self._cache.popitem(last=False)
+
+    def _follow(self, flight: _Flight, request: PreparedRequest) -> Response:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        if flight.stored is None:
+            e = f"Shared request for {request.url} ended without a response"
+            raise RuntimeError(e)
+        logger.debug("Shared an in-flight response for %s", request.url)
+        return flight.stored.response(request)
+
+    def close(self) -> None:
+        with self._lock:
+            self._cache.clear()
+        self.inner.close()
@@ -33,11 +33,121 @@ STORAGE_PATH_DESC: Final[str] = "Where to store files"
 SELECTED_COURSES_DESC: Final[str] = (
     "Select courses to download instead of all of them at once."
 )
+STORAGE_DESC: Final[str] = (
+    "Where downloaded files end up, the local storage path by default"
+)
+STORAGE_BACKEND_DESC: Final[str] = (
+    "Either local or s3 for any S3-compatible object store"
+)
+BUCKET_DESC: Final[str] = "Bucket to upload files into"
+PREFIX_DESC: Final[str] = "Key prefix prepended to every uploaded file"
+ENDPOINT_URL_DESC: Final[str] = (
+    "Endpoint of a non-AWS object store such as MinIO, credentials come from the "
+    "usual AWS environment variables and files"
+)
+PART_SIZE_DESC: Final[str] = "Size in bytes of each part of a multipart upload"
+UPLOAD_CONCURRENCY_DESC: Final[str] = "Parts of a single file uploaded at once"
+FILTERS_DESC: Final[str] = "Which files to sync, everything by default"
+INCLUDE_TYPES_DESC: Final[str] = (
+    "Only sync files with these MIME types, globs like video/* are fine"
+)
+EXCLUDE_TYPES_DESC: Final[str] = "Never sync files with these MIME types"
+INCLUDE_EXTENSIONS_DESC: Final[str] = "Only sync files with these extensions"
+EXCLUDE_EXTENSIONS_DESC: Final[str] = "Never sync files with these extensions"
+MIN_SIZE_DESC: Final[str] = (
+    "Skip files smaller than this, in bytes or with a K/M/G suffix"
+)
+MAX_SIZE_DESC: Final[str] = (
+    "Skip files larger than this, in bytes or with a K/M/G suffix"
+)
+INCLUDE_COURSES_DESC: Final[str] = (
+    "Only sync courses whose name matches one of these globs"
+)
+EXCLUDE_COURSES_DESC: Final[str] = (
+    "Never sync courses whose name matches one of these globs"
+)
+INCLUDE_MODULES_DESC: Final[str] = (
+    "Only sync modules whose name matches one of these globs"
+)
+EXCLUDE_MODULES_DESC: Final[str] = (
+    "Never sync modules whose name matches one of these globs"
+)
+SEGMENTS_DESC: Final[str] = "How large files are split over several connections"
+SEGMENT_THRESHOLD_DESC: Final[str] = (
+    "Files at least this many bytes are downloaded in segments"
+)
+SEGMENT_SIZE_DESC: Final[str] = "Bytes fetched by each ranged request"
+SEGMENT_CONNECTIONS_DESC: Final[str] = (
+    "Most connections a single file may use, extra ones are only taken while "
+    "other downloads leave them free"
+)
+HTTP2_DESC: Final[str] = (
+    "Send requests over HTTP/2 so they share a connection, needs canvy[http2]"
+)
+PROCESSING_DESC: Final[str] = "Steps run on every newly downloaded file"
+PROCESSORS_DESC: Final[str] = (
+    "Processors as module:function import paths, such as canvy.processors:unzip"
+)
+PROCESSING_WORKERS_DESC: Final[str] = "Processes running processors at once"
+CANVAS_ALIASES_DESC: Final[str] = (
+    "Other hostnames the same Canvas answers on, links to them are followed too"
+)
+TRAVERSAL_DESC: Final[str] = (
+    "How courses are walked, rest by default or graphql to fetch module items and "
+    "pages in a few batched queries"
+)
+LAYOUT_DESC: Final[str] = (
+    "How files are laid out, modules by default or folders to mirror the Files tab"
+)
+RETRY_DESC: Final[str] = (
+    "How to retry failed requests and when to stop hammering a host"
+)
+RETRIES_DESC: Final[str] = "Attempts made after the first one before a request fails"
+BACKOFF_DESC: Final[str] = "Base delay in seconds, doubled on every attempt"
+BACKOFF_MAX_DESC: Final[str] = "Upper bound in seconds for a single backoff delay"
+BREAKER_THRESHOLD_DESC: Final[str] = (
+    "Consecutive failures against a host before we stop sending it requests"
+)
+BREAKER_COOLDOWN_DESC: Final[str] = (
+    "Seconds to leave a failing host alone before trying it again"
+)
 
 LOG_FN: Final[Path] = user_log_path(APP_NAME) / "canvy.log"
 CONFIG_PATH: Final[Path] = user_config_path(APP_NAME) / "config.toml"
 DEFAULT_DOWNLOAD_DIR: Final[Path] = user_documents_path() / APP_NAME
 PS_DIRNAME: Final[str] = "Problem Sheets"
+# INFO: Kept inside the storage path so state follows the files it describes
+STATE_DIRNAME: Final[str] = ".canvy"
+FINGERPRINTS_FN: Final[str] = "fingerprints.json"
+SNAPSHOT_FN: Final[str] = "snapshot.db"
+# INFO: Older snapshots are pruned, enough to diff against a few syncs back
+SNAPSHOTS_KEPT: Final[int] = 10
+
+# INFO: S3 refuses multipart parts smaller than this, bar the last
+MIN_PART_SIZE: Final[int] = 5 * 1024**2
+DOWNLOAD_CHUNK_SIZE: Final[int] = 1024**2
+
+# INFO: Linked files of one course past which listing the course beats fetching each
+LINK_LISTING_THRESHOLD: Final[int] = 10
+# INFO: API responses kept for identical GETs, briefly so a run never sees stale data
+# from a previous one and never file bodies
+COALESCE_CACHE_SIZE: Final[int] = 512
+COALESCE_CACHE_TTL: Final[float] = 60.0
+COALESCE_MAX_BODY: Final[int] = 1024**2
+
+# INFO: Modules per GraphQL query, each carries all of its items and page bodies
+GRAPHQL_MODULES_PER_QUERY: Final[int] = 20
+
+DOWNLOAD_WORKERS: Final[int] = 5
+# INFO: Shared by every transfer, segments of large files only borrow idle ones
+DOWNLOAD_CONNECTIONS: Final[int] = DOWNLOAD_WORKERS
+# INFO: Files discovered but not yet downloaded, discovery blocks past this
+DOWNLOAD_QUEUE_SIZE: Final[int] = 4 * DOWNLOAD_WORKERS
+
+# INFO: Canvas throttles with 403 and this body rather than a 429
+THROTTLED_MESSAGE: Final[str] = "Rate Limit Exceeded"
+RETRY_STATUSES: Final[frozenset[int]] = frozenset({429, 500, 502, 503, 504})
+RETRY_METHODS: Final[frozenset[str]] = frozenset({"GET", "HEAD", "OPTIONS"})
 
 LOGGING_CONFIG = {
     "version": 1,
@@ -64,6 +174,13 @@ LOGGING_CONFIG = {
             "maxBytes": 10 * 1024**2,
             "backupCount": 3,
         },
+        # INFO: Records are only queued by the threads logging them, a listener
+        # thread started in setup_logging does the formatting and file writes
+        "queue": {
+            "class": "logging.handlers.QueueHandler",
+            "handlers": ["stderr", "file"],
+            "respect_handler_level": True,
+        },
     },
-    "loggers": {"root": {"level": "DEBUG", "handlers": ["stderr", "file"]}},
+    "loggers": {"root": {"level": "DEBUG", "handlers": ["queue"]}},
 }
@@ -0,0 +1,227 @@
+# pyright: reportAny=false
+# pyright: reportUnknownVariableType=false
+# pyright: reportUnknownArgumentType=false
+# pyright: reportUnknownMemberType=false
+import logging
+from collections.abc import Generator
+from dataclasses import dataclass
+from typing import Any
+
+from canvasapi.canvas import Canvas
+from canvasapi.canvas_object import CanvasObject
+from canvasapi.course import Course
+from canvasapi.exceptions import CanvasException
+from canvasapi.file import File
+from canvasapi.module import Module, ModuleItem
+from canvasapi.page import Page
+
+from canvy.const import PS_DIRNAME
+from canvy.filters import FileFilter
+from canvy.links import LinkResolver
+from canvy.retry import is_transient
+from canvy.types import ModuleItemType
+from canvy.utils import better_course_name, get_config
+
+logger = logging.getLogger(__name__)
+
+# INFO: Attribute holding the HTML body and the title of each kind of content
+CONTENT_ATTRIBUTES: dict[ModuleItemType, tuple[str, str]] = {
+    ModuleItemType.ASSIGNMENT: ("description", "name"),
+    ModuleItemType.DISCUSSION: ("message", "title"),
+    ModuleItemType.QUIZ: ("description", "title"),
+}
+
+
+class CourseContent:
+    """
+    Assignments, discussions and quizzes of a course, each listed in bulk the first
+    time a module item needs one so further items cost no requests of their own.
+    Pages are fetched one by one unless they were added up front
+
+    Args:
+        links: Resolver for files linked from their HTML and files in modules
+    """
+
+    def __init__(self, course: Course, links: LinkResolver | None = None):
+        self.course = course
+        self.links = links
+        self._listings: dict[ModuleItemType, dict[int, CanvasObject]] = {}
+        self._pages: dict[int, Page] = {}
+
+    def add_page(self, item_id: int, page: Page) -> None:
+        """
+        Keep a page fetched some other way for the module item pointing at it
+        """
+        self._pages[item_id] = page
+
+    def page(self, item: ModuleItem) -> Page:
+        if (page := self._pages.get(item.id)) is not None:
+            return page
+        return self.course.get_page(item.page_url)
+
+    def _list(self, type: ModuleItemType) -> dict[int, CanvasObject]:
+        listers = {
+            ModuleItemType.ASSIGNMENT: self.course.get_assignments,
+            ModuleItemType.DISCUSSION: self.course.get_discussion_topics,
+            ModuleItemType.QUIZ: self.course.get_quizzes,
+        }
+        try:
+            return {obj.id: obj for obj in listers[type](per_page=100)}
+        except CanvasException as e:
+            if is_transient(e):
+                raise
+            logger.warning("Can't list %s items of %s: %s", type, self.course, e)
+            return {}
+
+    def get(self, type: ModuleItemType, id: int) -> CanvasObject | None:
+        if type not in self._listings:
+            self._listings[type] = self._list(type)
+        return self._listings[type].get(id)
+
+
+@dataclass(frozen=True, slots=True)
+class CourseWalk:
+    """
+    What every module item of a course is looked up with
+
+    Args:
+        url: Institution URL where the Canvas server is hosted, the configured one
+            by default
+        content: Bulk listings of the course, without which assignments,
+            discussions and quizzes are skipped
+        filters: Skips fetching attached files whose title already rules them out
+    """
+
+    canvas: Canvas
+    course: Course
+    url: str = ""
+    content: CourseContent | None = None
+    filters: FileFilter | None = None
+
+    def links(self) -> LinkResolver:
+        """
+        Resolver shared across a sync when there's one, so no file is fetched twice
+        """
+        if self.content is not None and self.content.links is not None:
+            return self.content.links
+        return LinkResolver.for_url(self.canvas, self.url or get_config().canvas_url)
+
+
+def extract_files_from_html(
+    walk: CourseWalk, body: str, names: list[str], source: str
+) -> Generator[tuple[list[str], File], None, None]:
+    """
+    Scrape canvas file links out of some HTML and add them to the download queue,
+    including links into other courses
+
+    Args:
+        body: HTML of a page, assignment description, discussion message, etc.
+        names: Directories to download the linked files into
+        source: What the HTML came from, for logs
+
+    Returns:
+        download_structured arguments
+    """
+    for file in walk.links().files(body, source):
+        yield (names, file)
+
+
+def extract_files_from_page(walk: CourseWalk, module: Module, page: Page):
+    """
+    Scrape canvas file links from a page. We do this because there can be many
+    unmarked or arbitrarily organised files on Canvas, depending on the module
+    organiser.
+
+    Returns:
+        download_structured arguments
+    """
+    page_title = getattr(page, "title", "No Title")
+    names = [better_course_name(walk.course.name), module.name, page_title]
+    if getattr(page, "body", None) is None:
+        return
+    logger.info("Found page: %s", page)
+    yield from extract_files_from_html(walk, page.body, names, f"Page({page.page_id})")
+
+
+def content_item_files(
+    walk: CourseWalk, module: Module, item: ModuleItem
+) -> Generator[tuple[list[str], File], None, None]:
+    """
+    Files linked from the HTML of an assignment, discussion or quiz, and
+    those attached to discussions
+
+    Returns:
+        download_structured arguments
+    """
+    type = ModuleItemType(item.type)
+    if walk.content is None:
+        return
+    if (content_id := getattr(item, "content_id", None)) is None:
+        return
+    if (obj := walk.content.get(type, content_id)) is None:
+        return
+    html_attr, title_attr = CONTENT_ATTRIBUTES[type]
+    title = getattr(obj, title_attr, None) or getattr(item, "title", "No Title")
+    names = [better_course_name(walk.course.name), module.name]
+    names += [PS_DIRNAME, title] if type is ModuleItemType.ASSIGNMENT else [title]
+    logger.info("Found %s: %s", type, title)
+    if body := getattr(obj, html_attr, None):
+        yield from extract_files_from_html(walk, body, names, f"{type}({obj.id})")
+    for attachment in getattr(obj, "attachments", None) or []:
+        yield (names, File(obj._requester, attachment))
+
+
+def module_item_files(
+    walk: CourseWalk, module: Module, item: ModuleItem
+) -> Generator[tuple[list[str], File], None, None]:
+    """
+    Process module items into the file queue for downloads
+
+    Returns:
+        download_structured arguments - directly and through page scanning
+    """
+    course, content = walk.course, walk.content
+    if (type := ModuleItemType(item.type)) == ModuleItemType.PAGE:
+        page = (
+            content.page(item)
+            if content is not None
+            else course.get_page(item.page_url)
+        )
+        yield from extract_files_from_page(walk, module, page)
+    elif type is ModuleItemType.ATTACHMENT:
+        if walk.filters and not walk.filters.name_allowed(getattr(item, "title", "")):
+            logger.info("Filtered out %s before fetching it", item.title)
+            return
+        if content is not None and content.links is not None:
+            # INFO: Shares fetches with links to the same file and bulk listings
+            if (file := content.links.file(item.content_id)) is None:
+                return
+        else:
+            file = walk.canvas.get_file(item.content_id)
+        names = [better_course_name(course.name), module.name]
+        logger.info("Found file: %s", file)
+        yield (names, file)
+    elif type in CONTENT_ATTRIBUTES:
+        yield from content_item_files(walk, module, item)
+
+
+def folder_files(course: Course, **params: Any) -> dict[tuple[str, ...], list[File]]:
+    """
+    Files of a course grouped by the folder they're in, from a paginated listing
+    of its folders and one of its files
+
+    Args:
+        params: Extra filters for the file listing
+
+    Returns:
+        Files by folder path below the root "course files" folder, sorted by path
+    """
+    # INFO: Full names all start with the root folder, which the course name replaces
+    paths = {
+        folder.id: tuple(folder.full_name.split("/")[1:])
+        for folder in course.get_folders(per_page=100)
+    }
+    grouped: dict[tuple[str, ...], list[File]] = {}
+    for file in course.get_files(per_page=100, **params):
+        grouped.setdefault(paths.get(file.folder_id, ()), []).append(file)
+    return dict(sorted(grouped.items()))
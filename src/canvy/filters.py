@@ -0,0 +1,123 @@
+# pyright: reportAny=false
+import hashlib
+import logging
+import mimetypes
+from fnmatch import fnmatch
+from pathlib import PurePosixPath
+from typing import Any
+
+from canvasapi.file import File
+
+from canvy.types import FilterConfig
+
+logger = logging.getLogger(__name__)
+
+
+def _matches(value: str, patterns: list[str]) -> bool:
+    return any(fnmatch(value, pattern) for pattern in patterns)
+
+
+def _allowed(value: str, include: list[str], exclude: list[str]) -> bool:
+    if include and not _matches(value, include):
+        return False
+    return not _matches(value, exclude)
+
+
+def _extension(name: str) -> str:
+    return PurePosixPath(name).suffix.lower().removeprefix(".")
+
+
+def _pushable(pattern: str) -> str | None:
+    """
+    Canvas filters listings by whole MIME types or their major part, nothing fancier
+    """
+    major, _, minor = pattern.partition("/")
+    if any(c in major for c in "*?[") or not major:
+        return None
+    if minor in ("*", ""):
+        return major
+    return None if any(c in minor for c in "*?[") else pattern
+
+
+class FileFilter:
+    """
+    Decides what a sync should bother with, each check runs as early as the
+    information it needs is available so filtered files cost as little as possible
+    """
+
+    def __init__(self, config: FilterConfig | None = None):
+        self.config = config or FilterConfig()
+
+    def __bool__(self) -> bool:
+        return self.config != FilterConfig()
+
+    def digest(self) -> str:
+        """
+        Short stable id of these filters, to tell syncs with different ones apart
+        """
+        return hashlib.sha256(self.config.model_dump_json().encode()).hexdigest()[:12]
+
+    def course_allowed(self, name: str) -> bool:
+        return _allowed(name, self.config.include_courses, self.config.exclude_courses)
+
+    def module_allowed(self, name: str) -> bool:
+        return _allowed(name, self.config.include_modules, self.config.exclude_modules)
+
+    def name_allowed(self, name: str) -> bool:
+        """
+        Check a name before fetching the metadata of the file it belongs to,
+        names without a recognisable extension are let through to be checked later
+        """
+        ext = _extension(name)
+        if not ext or mimetypes.guess_type(f"x.{ext}")[0] is None:
+            return True
+        if not self._extension_allowed(ext):
+            return False
+        if (type := mimetypes.guess_type(name)[0]) is None:
+            return True
+        return _allowed(type, self.config.include_types, self.config.exclude_types)
+
+    def _extension_allowed(self, ext: str) -> bool:
+        include, exclude = (
+            self.config.include_extensions,
+            self.config.exclude_extensions,
+        )
+        return (not include or ext in include) and ext not in exclude
+
+    def file_allowed(self, file: File) -> bool:
+        """
+        Check a file against every filter now that its metadata is known
+        """
+        if not self._extension_allowed(_extension(file.filename)):
+            return False
+        type = (
+            getattr(file, "content-type", None)
+            or mimetypes.guess_type(file.filename)[0]
+        )
+        if (self.config.include_types or self.config.exclude_types) and not _allowed(
+            (type or "").lower(), self.config.include_types, self.config.exclude_types
+        ):
+            return False
+        if (size := getattr(file, "size", None)) is None:
+            return True
+        if self.config.min_size is not None and size < self.config.min_size:
+            return False
+        return self.config.max_size is None or size <= self.config.max_size
+
+    def listing_params(self) -> dict[str, Any]:
+        """
+        Keyword arguments for file listings so Canvas leaves out what it can itself,
+        anything it can't express is still caught by file_allowed
+        """
+        params: dict[str, Any] = {}
+        include = [_pushable(pattern) for pattern in self.config.include_types]
+        # INFO: A partial include list would drop files the full one allows
+        if include and None not in include:
+            params["content_types"] = include
+        if exclude := [
+            pushed
+            for pattern in self.config.exclude_types
+            if (pushed := _pushable(pattern)) is not None
+        ]:
+            params["exclude_content_types"] = exclude
+        return params
@@ -0,0 +1,118 @@
+# pyright: reportAny=false
+# pyright: reportUnknownMemberType=false
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any
+
+from canvasapi.course import Course
+from canvasapi.exceptions import CanvasException
+from canvasapi.module import Module
+
+from canvy.const import FINGERPRINTS_FN, STATE_DIRNAME
+from canvy.utils import locked
+
+logger = logging.getLogger(__name__)
+
+
+def newest_file_timestamp(course: Course, **params: Any) -> str | None:
+    """
+    Timestamp of the most recently updated file in a course, costs one request
+
+    Args:
+        params: Extra listing filters, so files we'd never sync don't count
+    """
+    try:
+        files = course.get_files(sort="updated_at", order="desc", per_page=1, **params)
+        newest = next(iter(files), None)
+    except CanvasException as e:
+        # INFO: Students often can't list the Files tab, modules still count
+        logger.debug("Can't list files of course %s: %s", course.id, e)
+        return None
+    return getattr(newest, "updated_at", None)
+
+
+def newest_page_timestamp(course: Course) -> str | None:
+    """
+    Timestamp of the most recently edited page in a course, costs one request.
+    Files newly linked from a page show up here when the Files tab is hidden
+    """
+    try:
+        pages = course.get_pages(sort="updated_at", order="desc", per_page=1)
+        newest = next(iter(pages), None)
+    except CanvasException as e:
+        logger.debug("Can't list pages of course %s: %s", course.id, e)
+        return None
+    return getattr(newest, "updated_at", None)
+
+
+def course_fingerprint(
+    course: Course,
+    modules: list[Module],
+    newest_file: str | None,
+    newest_page: str | None = None,
+) -> str:
+    """
+    Cheap summary of a course that changes whenever its downloadable content
+    is likely to have changed
+
+    Args:
+        course: Course to summarise
+        modules: Module listing of the course, which carries item counts
+        newest_file: Timestamp of its most recently updated file, if it can be listed
+        newest_page: Timestamp of its most recently edited page, if it was looked up
+    """
+    summary = {
+        "course": [course.id, getattr(course, "updated_at", None)],
+        "modules": [
+            [module.id, module.name, getattr(module, "items_count", None)]
+            for module in modules
+        ],
+        "newest_file": newest_file,
+        "newest_page": newest_page,
+    }
+    return hashlib.sha256(json.dumps(summary).encode()).hexdigest()
+
+
+class FingerprintStore:
+    """
+    Fingerprints of courses as of their last complete sync, shared between shards
+
+    Args:
+        storage_dir: Storage path the fingerprints describe
+        scope: Prefix for keys, so shards that only see part of a course keep
+            their own fingerprints
+    """
+
+    def __init__(self, storage_dir: Path, scope: str = ""):
+        self.path = storage_dir / STATE_DIRNAME / FINGERPRINTS_FN
+        self.scope = scope
+        self._fingerprints = self._read()
+        self._updates: dict[str, str] = {}
+
+    def _read(self) -> dict[str, str]:
+        if not self.path.is_file():
+            return {}
+        try:
+            return json.loads(self.path.read_text())
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable fingerprints at %s: %s", self.path, e)
+            return {}
+
+    def unchanged(self, course_id: int, fingerprint: str) -> bool:
+        return self._fingerprints.get(f"{self.scope}{course_id}") == fingerprint
+
+    def update(self, course_id: int, fingerprint: str) -> None:
+        self._updates[f"{self.scope}{course_id}"] = fingerprint
+
+    def save(self) -> None:
+        """
+        Merge our updates into whatever other processes have written meanwhile
+        """
+        with locked(self.path.with_suffix(".lock")):
+            self._fingerprints = self._read() | self._updates
+            tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_text(json.dumps(self._fingerprints, indent=2))
+            os.replace(tmp_path, self.path)
@@ -0,0 +1,205 @@
+# pyright: reportAny=false
+# pyright: reportUnknownMemberType=false
+# pyright: reportUnknownVariableType=false
+# pyright: reportUnknownArgumentType=false
+import logging
+from typing import Any, Final
+
+from canvasapi.canvas import Canvas
+from canvasapi.course import Course
+from canvasapi.exceptions import CanvasException
+from canvasapi.module import ModuleItem
+from canvasapi.page import Page
+
+from canvy.client import requester_of
+from canvy.const import GRAPHQL_MODULES_PER_QUERY
+from canvy.discovery import CourseContent
+from canvy.filters import FileFilter
+from canvy.types import ModuleItemType
+
+logger = logging.getLogger(__name__)
+
+# INFO: File metadata still comes from REST, GraphQL has neither the stored
+# filename nor the size in bytes so the files would land under other names
+MODULE_ITEMS_QUERY: Final = """
+query CourseModuleItems($courseId: ID!, $first: Int!, $after: String) {
+  course(id: $courseId) {
+    modulesConnection(first: $first, after: $after) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        _id
+        moduleItems {
+          _id
+          content {
+            __typename
+            ... on File { _id displayName }
+            ... on Page { _id title body }
+            ... on Assignment { _id name }
+            ... on Discussion { _id title }
+            ... on Quiz { _id title }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+# INFO: Field holding the title of each kind of content we sync, the rest are skipped
+TITLE_FIELDS: Final = {
+    ModuleItemType.ATTACHMENT: "displayName",
+    ModuleItemType.PAGE: "title",
+    ModuleItemType.ASSIGNMENT: "name",
+    ModuleItemType.DISCUSSION: "title",
+    ModuleItemType.QUIZ: "title",
+}
+
+
+class GraphQLError(CanvasException):
+    """
+    Canvas answered a GraphQL query with errors instead of data
+    """
+
+
+def query(canvas: Canvas, text: str, variables: dict[str, Any]) -> dict[str, Any]:
+    """
+    Run a GraphQL query
+
+    Returns:
+        The data of the response
+
+    Raises:
+        GraphQLError: If the response carries errors or isn't GraphQL at all
+    """
+    try:
+        response = canvas.graphql(text, variables)
+    except ValueError as e:
+        msg = f"Not a GraphQL response: {e}"
+        raise GraphQLError(msg) from e
+    if errors := response.get("errors"):
+        msg = "; ".join(str(error.get("message", error)) for error in errors)
+        raise GraphQLError(msg)
+    if (data := response.get("data")) is None:
+        msg = "GraphQL response without data"
+        raise GraphQLError(msg)
+    return data
+
+
+def module_items(
+    canvas: Canvas,
+    course: Course,
+    content: CourseContent,
+    filters: FileFilter | None = None,
+) -> dict[int, list[ModuleItem]]:
+    """
+    Items of every module of a course in a few queries, rather than a listing per
+    module and a request per page. Pages are added to content, and the files in
+    modules or linked from pages are handed to its resolver to list in bulk
+
+    Args:
+        filters: Files in modules whose title rules them out aren't prefetched
+
+    Returns:
+        Module items by module id, in module order
+
+    Raises:
+        GraphQLError: If GraphQL is disabled or the course can't be queried
+    """
+    requester = requester_of(canvas)
+    items: dict[int, list[ModuleItem]] = {}
+    files: dict[int, int] = {}
+    after: str | None = None
+    while True:
+        variables = {
+            "courseId": str(course.id),
+            "first": GRAPHQL_MODULES_PER_QUERY,
+            "after": after,
+        }
+        if (data := query(canvas, MODULE_ITEMS_QUERY, variables)["course"]) is None:
+            msg = f"No course {course.id} in GraphQL"
+            raise GraphQLError(msg)
+        connection = data["modulesConnection"]
+        for node in connection["nodes"]:
+            module_id = int(node["_id"])
+            items[module_id] = []
+            for item_node in node.get("moduleItems") or []:
+                if (
+                    item := _module_item(requester, course, module_id, item_node)
+                ) is None:
+                    continue
+                items[module_id].append(item)
+                found = _files_of(requester, item, item_node, content, filters)
+                for file_id, course_id in found.items():
+                    files.setdefault(file_id, course_id)
+        page_info = connection["pageInfo"]
+        if not page_info["hasNextPage"]:
+            break
+        after = page_info["endCursor"]
+    count = sum(map(len, items.values()))
+    logger.info("Fetched %s items of %s over GraphQL", count, course)
+    if content.links is not None:
+        content.links.prefetch(files)
+    return items
+
+
+def _module_item(
+    requester: Any, course: Course, module_id: int, node: dict[str, Any]
+) -> ModuleItem | None:
+    """
+    Shape a GraphQL module item like the REST one, None for kinds we don't sync
+    """
+    content = node.get("content") or {}
+    try:
+        type = ModuleItemType(content.get("__typename", ""))
+    except ValueError:
+        return None
+    if type not in TITLE_FIELDS:
+        return None
+    return ModuleItem(
+        requester,
+        {
+            "id": int(node["_id"]),
+            "module_id": module_id,
+            "course_id": course.id,
+            "type": str(type),
+            "title": content.get(TITLE_FIELDS[type]) or "",
+            "content_id": int(content["_id"]),
+        },
+    )
+
+
+def _files_of(
+    requester: Any,
+    item: ModuleItem,
+    node: dict[str, Any],
+    content: CourseContent,
+    filters: FileFilter | None,
+) -> dict[int, int]:
+    """
+    Files an item brings along, by id with the course they belong to. Its page is
+    added to content on the way
+
+    Returns:
+        Course ids by file id
+    """
+    if item.type == ModuleItemType.PAGE:
+        page = _page(requester, item.course_id, node["content"])
+        content.add_page(item.id, page)
+        if page.body and content.links is not None:
+            return content.links.extractor.extract(page.body)
+    elif item.type == ModuleItemType.ATTACHMENT:
+        if filters is None or filters.name_allowed(item.title):
+            return {item.content_id: item.course_id}
+    return {}
+
+
+def _page(requester: Any, course_id: int, content: dict[str, Any]) -> Page:
+    return Page(
+        requester,
+        {
+            "page_id": int(content["_id"]),
+            "course_id": course_id,
+            "title": content.get("title"),
+            "body": content.get("body"),
+        },
+    )
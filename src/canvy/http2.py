@@ -0,0 +1,188 @@
+# pyright: reportAny=false
+# pyright: reportUnknownMemberType=false
+# pyright: reportUnknownVariableType=false
+import logging
+import os
+import ssl
+from threading import Lock
+from typing import Any
+
+import httpx
+import requests
+from requests import PreparedRequest, Response
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import (
+    DEFAULT_CA_BUNDLE_PATH,
+    get_encoding_from_headers,
+    select_proxy,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class _RawBody:
+    """
+    File-like view of an httpx response body standing in for the urllib3 response
+    requests normally keeps in Response.raw, content encodings are always decoded
+    """
+
+    def __init__(self, response: httpx.Response):
+        self._response = response
+        self._chunks = response.iter_bytes()
+        self._buffer = bytearray()
+        self.decode_content = True
+        self.status = response.status_code
+        self.reason = response.reason_phrase
+        self.headers = response.headers
+
+    def read(self, amt: int | None = None, **_: Any) -> bytes:
+        """
+        Up to amt bytes, fewer only once the body runs out, everything if amt is None
+        """
+        try:
+            while amt is None or len(self._buffer) < amt:
+                if (chunk := next(self._chunks, None)) is None:
+                    break
+                self._buffer += chunk
+        except httpx.TransportError as e:
+            raise requests.ConnectionError(e) from e
+        size = len(self._buffer) if amt is None else amt
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def close(self) -> None:
+        self._response.close()
+
+
+def _timeout(timeout: Any) -> httpx.Timeout:
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return httpx.Timeout(read, connect=connect)
+    return httpx.Timeout(timeout)
+
+
+def _headers(request: PreparedRequest) -> dict[str, str]:
+    # INFO: requests takes bytes values too, httpx wants all of one kind
+    return {
+        name: value.decode("latin-1") if isinstance(value, bytes) else value
+        for name, value in request.headers.items()
+    }
+
+
+# INFO: What requests asks of a connection, TLS verification, client cert and proxy
+type _Transport = tuple[bool | str, str | tuple[str, str] | None, str | None]
+
+
+def _ssl_context(
+    *, verify: bool | str, cert: str | tuple[str, str] | None
+) -> ssl.SSLContext:
+    """
+    TLS settings matching what requests does with the same verify and cert
+    """
+    if verify is False:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    elif verify is True:
+        context = ssl.create_default_context(cafile=DEFAULT_CA_BUNDLE_PATH)
+    elif os.path.isdir(verify):
+        context = ssl.create_default_context(capath=verify)
+    else:
+        context = ssl.create_default_context(cafile=verify)
+    if isinstance(cert, str):
+        context.load_cert_chain(cert)
+    elif cert is not None:
+        context.load_cert_chain(*cert)
+    return context
+
+
+class HTTP2Adapter(BaseAdapter):
+    """
+    Transport adapter sending requests through httpx, so concurrent requests to a
+    host share one multiplexed HTTP/2 connection instead of a connection each
+
+    The verify, cert and proxies requests passes along are honoured with an httpx
+    client for each combination, proxies and CA bundles from the environment
+    included since requests has already merged them in
+
+    Args:
+        client: httpx client to send everything through, its own TLS and proxy
+            settings apply instead. Clients speaking HTTP/2 over TLS if missing
+    """
+
+    def __init__(self, client: httpx.Client | None = None):
+        super().__init__()
+        self._client = client
+        self._clients: dict[_Transport, httpx.Client] = {}
+        self._lock = Lock()
+
+    def client(self, transport: _Transport) -> httpx.Client:
+        """
+        httpx client for a combination of verify, cert and proxy, made on first use
+        """
+        if self._client is not None:
+            return self._client
+        with self._lock:
+            if (client := self._clients.get(transport)) is None:
+                verify, cert, proxy = transport
+                # INFO: requests already applied the environment, httpx mustn't again
+                client = self._clients[transport] = httpx.Client(
+                    http2=True,
+                    verify=_ssl_context(verify=verify, cert=cert),
+                    proxy=proxy,
+                    trust_env=False,
+                )
+            return client
+
+    def send(  # type: ignore[override]  # noqa: PLR0913
+        self,
+        request: PreparedRequest,
+        *,
+        stream: bool = False,
+        timeout: Any = None,
+        verify: bool | str = True,
+        cert: str | tuple[str, str] | None = None,
+        proxies: dict[str, str] | None = None,
+    ) -> Response:
+        url = request.url or ""
+        client = self.client((verify, cert, select_proxy(url, proxies or {})))
+        outgoing = client.build_request(
+            request.method or "GET",
+            url,
+            headers=_headers(request),
+            # INFO: Prepared bodies are bytes, str or an iterable of bytes
+            content=request.body,  # type: ignore[arg-type]
+            timeout=_timeout(timeout),
+        )
+        # INFO: Always streamed, requests reads the body itself unless asked not to
+        try:
+            response = client.send(outgoing, stream=True)
+        except httpx.TimeoutException as e:
+            raise requests.Timeout(e, request=request) from e
+        except httpx.TransportError as e:
+            raise requests.ConnectionError(e, request=request) from e
+        return self.build_response(request, response)
+
+    def build_response(
+        self, request: PreparedRequest, response: httpx.Response
+    ) -> Response:
+        built = Response()
+        built.status_code = response.status_code
+        built.headers = CaseInsensitiveDict(response.headers)
+        built.encoding = get_encoding_from_headers(built.headers)
+        built.raw = _RawBody(response)
+        built.reason = response.reason_phrase
+        built.url = request.url or ""
+        built.request = request
+        built.connection = self  # type: ignore[assignment]
+        return built
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
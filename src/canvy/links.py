@@ -0,0 +1,187 @@
+# pyright: reportAny=false
+# pyright: reportUnknownMemberType=false
+import logging
+import re
+from collections.abc import Generator, Iterable
+from typing import Final
+from urllib.parse import urlsplit
+
+from canvasapi.canvas import Canvas
+from canvasapi.course import Course
+from canvasapi.exceptions import CanvasException, ResourceDoesNotExist
+from canvasapi.file import File
+
+from canvy.client import requester_of
+from canvy.const import LINK_LISTING_THRESHOLD
+from canvy.retry import is_transient
+
+logger = logging.getLogger(__name__)
+
+# INFO: Starts with the rare files segment so the scan skips ahead quickly, the
+# course in front of it is only looked at for the matches
+FILE_LINK_REGEX: Final = re.compile(r"/files/([0-9]+)")
+COURSES_SEGMENT: Final = "/courses/"
+COURSES_SEGMENT_LEN: Final = len(COURSES_SEGMENT)
+# INFO: How far back the courses segment can start, room for any real course id
+COURSE_WINDOW: Final = 40
+API_PREFIX: Final = "/api/v1"
+API_PREFIX_LEN: Final = len(API_PREFIX)
+# INFO: How far back a host can start, anything longer isn't a hostname
+PREFIX_WINDOW: Final = 256
+RELATIVE_BOUNDARIES: Final = frozenset("\"'=( \t\r\n")
+
+
+def host_of(url: str) -> str:
+    """
+    Host of a URL or of a bare hostname, lowercased
+    """
+    return (urlsplit(url).netloc or urlsplit(f"//{url}").netloc).lower()
+
+
+class LinkExtractor:
+    """
+    Finds links to Canvas files in HTML in a single pass, absolute ones to any
+    of hosts, relative ones, API endpoints (as in data-api-endpoint) and links
+    into other courses
+
+    Args:
+        hosts: Hostnames Canvas answers on, the configured one and any aliases
+    """
+
+    def __init__(self, hosts: Iterable[str]):
+        self.hosts = frozenset(host_of(host) for host in hosts)
+        # INFO: What usually comes before the courses segment, checked in one call
+        prefixes = [*RELATIVE_BOUNDARIES, *(f"//{host}" for host in self.hosts)]
+        self._prefixes = (*prefixes, *(prefix + API_PREFIX for prefix in prefixes))
+
+    def extract(self, body: str) -> dict[int, int]:
+        """
+        Returns:
+            Course id of each linked file id, in the order they're first linked
+        """
+        links: dict[int, int] = {}
+        prefixes = self._prefixes
+        for match in FILE_LINK_REGEX.finditer(body):
+            # INFO: Read backwards with string methods, only paths need the checks
+            segment = match.start()
+            lowest = segment - COURSE_WINDOW if segment > COURSE_WINDOW else 0
+            start = body.rfind(COURSES_SEGMENT, lowest, segment)
+            course_id = body[start + COURSES_SEGMENT_LEN : segment]
+            if start < 0 or not (course_id.isascii() and course_id.isdigit()):
+                continue
+            if (
+                start
+                and not body.endswith(prefixes, 0, start)
+                and not self._on_host(body, start)
+            ):
+                continue
+            links.setdefault(int(match.group(1)), int(course_id))
+        return links
+
+    def _on_host(self, body: str, start: int) -> bool:
+        """
+        Whether the path at start is relative or on one of the hosts, in any case
+        """
+        end = start
+        if (
+            body.startswith(API_PREFIX, start - API_PREFIX_LEN)
+            and start >= API_PREFIX_LEN
+        ):
+            end -= API_PREFIX_LEN
+        if not end or body[end - 1] in RELATIVE_BOUNDARIES:
+            return True
+        slashes = body.rfind("//", max(0, end - PREFIX_WINDOW), end)
+        return slashes >= 0 and body[slashes + 2 : end].lower() in self.hosts
+
+
+class LinkResolver:
+    """
+    Turns file links into File objects, each file is fetched at most once and
+    courses with many linked files are listed in bulk instead
+
+    Args:
+        canvas: Client to fetch files with
+        extractor: What counts as a link
+        listing_threshold: Unresolved links into one course that make listing all
+            of its files cheaper than fetching each of them
+    """
+
+    def __init__(
+        self,
+        canvas: Canvas,
+        extractor: LinkExtractor,
+        listing_threshold: int = LINK_LISTING_THRESHOLD,
+    ):
+        self.canvas = canvas
+        self.extractor = extractor
+        self.listing_threshold = listing_threshold
+        self._files: dict[int, File | None] = {}
+        self._listed: set[int] = set()
+
+    @staticmethod
+    def for_url(
+        canvas: Canvas, url: str, aliases: Iterable[str] = ()
+    ) -> "LinkResolver":
+        return LinkResolver(canvas, LinkExtractor([url, *aliases]))
+
+    def files(self, body: str, source: str = "") -> Generator[File, None, None]:
+        """
+        Files linked from some HTML, skipping those we can't access
+
+        Args:
+            body: HTML of a page, assignment description, discussion message, etc.
+            source: What the HTML came from, for logs
+        """
+        links = self.extractor.extract(body)
+        self.prefetch(links)
+        for file_id in links:
+            logger.info("Scanned file(%s) from %s", file_id, source)
+            if (file := self.file(file_id)) is not None:
+                yield file
+
+    def file(self, file_id: int) -> File | None:
+        """
+        A file by id, None if we can't access it
+        """
+        if file_id not in self._files:
+            self._files[file_id] = self._fetch(file_id)
+        return self._files[file_id]
+
+    def prefetch(self, links: dict[int, int]) -> None:
+        """
+        List the courses that enough of these files belong to in bulk, the rest
+        are left to be fetched one by one
+
+        Args:
+            links: Course id of each file id
+        """
+        wanted: dict[int, int] = {}
+        for file_id, course_id in links.items():
+            if file_id not in self._files and course_id not in self._listed:
+                wanted[course_id] = wanted.get(course_id, 0) + 1
+        for course_id, count in wanted.items():
+            if count >= self.listing_threshold:
+                self._list_course(course_id)
+
+    def _list_course(self, course_id: int) -> None:
+        self._listed.add(course_id)
+        course = Course(requester_of(self.canvas), {"id": course_id})
+        try:
+            for file in course.get_files(per_page=100):
+                self._files.setdefault(file.id, file)
+        except CanvasException as e:
+            if is_transient(e):
+                raise
+            # INFO: Files tab hidden, the linked files may still be reachable one by one
+            logger.debug("Can't list files of course %s: %s", course_id, e)
+
+    def _fetch(self, file_id: int) -> File | None:
+        try:
+            return self.canvas.get_file(file_id)
+        except ResourceDoesNotExist as e:
+            logger.warning("No access to scrape page: %s", e)
+        except Exception as e:
+            if is_transient(e):
+                raise
+            logger.error("Unknown error downloading file %s", file_id)
+        return None
@@ -2,22 +2,37 @@ import logging
 import sys
 from getpass import getpass
 from pathlib import Path
+from typing import Annotated
 
 from canvasapi.canvas import Canvas, Course
 from canvasapi.requester import ResourceDoesNotExist
 from pydantic import ValidationError
 from rich import print as pprint
 from rich.console import Console
+from rich.filesize import decimal
 from rich.table import Table
 from rich.prompt import Confirm, Prompt
-from typer import Typer
+from rich.tree import Tree
+from typer import Argument, Typer
 
+from canvy.client import build_canvas
 from canvy.const import (
     CONFIG_PATH,
     DEFAULT_DOWNLOAD_DIR,
     LOG_FN,
 )
-from canvy.types import CanvyConfig, CLIClearFile
+from canvy.snapshot import SnapshotStore
+from canvy.storage import make_storage
+from canvy.sync import SyncSummary
+from canvy.types import (
+    CanvyConfig,
+    CLIClearFile,
+    FilterConfig,
+    Layout,
+    Shard,
+    ShardBy,
+    Traversal,
+)
 from canvy.utils import (
     better_course_name,
     create_dir,
@@ -63,10 +78,10 @@ def requires_config() -> CanvyConfig:
     sys.exit(1)
 
 
-def requires_canvas() -> tuple[Canvas, CanvyConfig]:
+def requires_canvas(*, http2: bool = False) -> tuple[Canvas, CanvyConfig]:
     config = requires_config()
-    canvas = Canvas(config.canvas_url, config.canvas_key)
-    return canvas, config
+    config.http2 = config.http2 or http2
+    return build_canvas(config), config
 
 
 def fancy_print_courses(
@@ -90,15 +105,108 @@ def fancy_print_courses(
     console.print(table)
 
 
+def with_cli_options(
+    config: CanvyConfig,
+    *,
+    http2: bool,
+    filters: FilterConfig,
+    traversal: Traversal | None,
+    layout: Layout | None,
+) -> CanvyConfig:
+    """
+    Copy of a config with the options given on the command line on top
+    """
+    return config.model_copy(
+        update={
+            "http2": config.http2 or http2,
+            "filters": (config.filters or FilterConfig()).merge(filters),
+            "traversal": traversal or config.traversal,
+            "layout": layout or config.layout,
+        }
+    )
+
+
 @cli.command(short_help="Download files from Canvas")
-def download(*, force: bool = False):
-    from canvy.scripts import download
+def download(  # noqa: PLR0913
+    *,
+    force: bool = False,
+    shard: str | None = None,
+    shard_by: ShardBy = ShardBy.COURSE,
+    workers: int = 1,
+    include_type: list[str] | None = None,
+    exclude_type: list[str] | None = None,
+    include_ext: list[str] | None = None,
+    exclude_ext: list[str] | None = None,
+    min_size: str | None = None,
+    max_size: str | None = None,
+    include_course: list[str] | None = None,
+    exclude_course: list[str] | None = None,
+    include_module: list[str] | None = None,
+    exclude_module: list[str] | None = None,
+    http2: bool = False,
+    traversal: Traversal | None = None,
+    layout: Layout | None = None,
+):
+    from canvy.scripts import download, download_sharded, print_summary
 
-    canvas, config = requires_canvas()
+    if shard and workers > 1:
+        pprint("[bold red]--shard and --workers can't be used together[/bold red]")
+        sys.exit(1)
+    try:
+        selected_shard = Shard.parse(shard) if shard else None
+    except ValueError as e:
+        pprint(f"[bold red]Bad shard[/bold red]: {e}")
+        sys.exit(1)
     try:
-        count = download(
-            canvas, config.storage_path, force=force, courses=config.selected_courses
+        cli_filters = FilterConfig(
+            include_types=include_type or [],
+            exclude_types=exclude_type or [],
+            include_extensions=include_ext or [],
+            exclude_extensions=exclude_ext or [],
+            min_size=min_size,  # type: ignore[arg-type]
+            max_size=max_size,  # type: ignore[arg-type]
+            include_courses=include_course or [],
+            exclude_courses=exclude_course or [],
+            include_modules=include_module or [],
+            exclude_modules=exclude_module or [],
         )
+    except ValidationError as e:
+        pprint(f"[bold red]Bad filters[/bold red]: {e}")
+        sys.exit(1)
+    try:
+        if workers > 1:
+            config = with_cli_options(
+                requires_config(),
+                http2=http2,
+                filters=cli_filters,
+                traversal=traversal,
+                layout=layout,
+            )
+            summaries = download_sharded(config, workers, shard_by, force=force)
+            for name, summary in summaries.items():
+                pprint(f"Shard {name}: {summary.downloaded} new files")
+            total = sum(summaries.values(), SyncSummary())
+            print_summary(Console(), total)
+            count = total.downloaded
+        else:
+            canvas, config = requires_canvas(http2=http2)
+            config = with_cli_options(
+                config,
+                http2=http2,
+                filters=cli_filters,
+                traversal=traversal,
+                layout=layout,
+            )
+            count = download(
+                canvas,
+                config.storage_path,
+                force=force,
+                courses=config.selected_courses,
+                shard=selected_shard,
+                shard_by=shard_by,
+                storage=make_storage(config),
+                config=config,
+            )
         pprint(f"[bold]{count}[/bold] new files! :speaking_head: :fire:")
     except (KeyboardInterrupt, EOFError):
         pprint("[bold red]Download stopping[/bold red]...")
@@ -106,6 +214,9 @@ def download(*, force: bool = False):
     except ResourceDoesNotExist as e:
         pprint(f"We likely don't have access to courses no more :sad_cat:: {e}")
         sys.exit(1)
+    except ImportError as e:
+        pprint(f"[bold red]Missing dependency[/bold red]: {e}")
+        sys.exit(1)
 
 
 @cli.command(short_help="List available courses")
@@ -129,6 +240,99 @@ def courses(*, detailed: bool = True):
         pprint(f"Unknown error: {e}")
 
 
+def requires_snapshot(snapshot: int | None = None) -> tuple[SnapshotStore, int]:
+    config = requires_config()
+    store = SnapshotStore(Path(config.storage_path).expanduser())
+    if (snapshot_id := snapshot or store.latest()) is None:
+        pprint("No snapshot yet, run [bold]canvy download[/bold] first")
+        sys.exit(1)
+    return store, snapshot_id
+
+
+@cli.command(short_help="List courses or files as of the last sync, offline")
+def ls(
+    course: Annotated[str | None, Argument()] = None,
+    *,
+    snapshot: int | None = None,
+    history: bool = False,
+):
+    store, snapshot_id = requires_snapshot(snapshot)
+    console = Console()
+    if history:
+        table = Table(title="Snapshots")
+        for column in ("ID", "Taken at", "Files", "Size"):
+            table.add_column(column)
+        for taken in store.snapshots():
+            table.add_row(
+                str(taken.id), taken.taken_at, str(taken.files), decimal(taken.bytes)
+            )
+        console.print(table)
+    elif course is None:
+        table = Table(title=f"Courses (snapshot {snapshot_id})")
+        for column in ("ID", "Title", "Files", "Size"):
+            table.add_column(column)
+        for synced in store.courses(snapshot_id):
+            table.add_row(
+                str(synced.course_id),
+                synced.course,
+                str(synced.files),
+                decimal(synced.bytes),
+            )
+        console.print(table)
+    else:
+        table = Table(title=f"Files (snapshot {snapshot_id})")
+        for column in ("Path", "Size", "Updated"):
+            table.add_column(column)
+        for entry in store.entries(snapshot_id, course):
+            table.add_row(entry.path, decimal(entry.size or 0), entry.updated_at or "")
+        console.print(table)
+
+
+@cli.command(short_help="Show courses, modules, items and files as of the last sync")
+def tree(
+    course: Annotated[str | None, Argument()] = None, *, snapshot: int | None = None
+):
+    store, snapshot_id = requires_snapshot(snapshot)
+    root = Tree(f"[bold]Snapshot {snapshot_id}[/bold]")
+    branches: dict[tuple[str, ...], Tree] = {}
+    for entry in store.entries(snapshot_id, course):
+        parent = root
+        for depth, name in enumerate((entry.course, entry.module, entry.item), 1):
+            # INFO: Folder layouts and root folder files have no module or item
+            if not name:
+                continue
+            key = (entry.course, entry.module, entry.item)[:depth]
+            if key not in branches:
+                branches[key] = parent.add(
+                    f"[bold]{name}[/bold]" if depth == 1 else name
+                )
+            parent = branches[key]
+        parent.add(f"{entry.filename} [dim]{decimal(entry.size or 0)}[/dim]")
+    Console().print(root)
+
+
+@cli.command(short_help="Show what changed between two syncs")
+def diff(
+    old: Annotated[int | None, Argument()] = None,
+    new: Annotated[int | None, Argument()] = None,
+):
+    store, new_id = requires_snapshot(new)
+    old_id = old or store.latest(offset=1)
+    if old_id is None:
+        pprint("Only one snapshot so far, nothing to compare it with")
+        sys.exit(1)
+    changes = store.diff(old_id, new_id)
+    pprint(f"Snapshot {old_id} -> {new_id}")
+    if not changes:
+        pprint("Nothing changed")
+    for entry in changes.added:
+        pprint(f"[green]+ {entry.path}[/green]")
+    for entry in changes.removed:
+        pprint(f"[red]- {entry.path}[/red]")
+    for _, entry in changes.changed:
+        pprint(f"[yellow]~ {entry.path}[/yellow]")
+
+
 @cli.command(short_help="Edit config")
 def edit_config():
     from canvy.utils import set_config
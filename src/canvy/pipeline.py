@@ -0,0 +1,95 @@
+import logging
+import multiprocessing
+from collections.abc import Callable, Generator
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from threading import BoundedSemaphore, Condition
+
+logger = logging.getLogger(__name__)
+
+
+class _BoundedSubmit(Executor):
+    """
+    Makes submit block once max_pending tasks are queued or running, so a fast
+    producer can't buffer an unbounded amount of work ahead of the workers
+    """
+
+    def _bound(self, max_pending: int) -> None:
+        self._slots = BoundedSemaphore(max_pending)
+
+    def submit[T](  # pyright: ignore[reportIncompatibleMethodOverride]
+        self, fn: Callable[..., T], /, *args, **kwargs
+    ) -> Future[T]:
+        self._slots.acquire()
+        try:
+            future = super().submit(fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+
+class BoundedExecutor(_BoundedSubmit, ThreadPoolExecutor):
+    """
+    Thread pool whose submit blocks once max_pending tasks are queued or running
+    """
+
+    def __init__(self, max_workers: int, max_pending: int):
+        super().__init__(max_workers=max_workers)
+        self._bound(max(max_pending, max_workers))
+
+
+class BoundedProcessExecutor(_BoundedSubmit, ProcessPoolExecutor):
+    """
+    Process pool whose submit blocks once max_pending tasks are queued or running,
+    workers are spawned so they start from a clean interpreter on every platform
+    """
+
+    def __init__(self, max_workers: int, max_pending: int):
+        super().__init__(
+            max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        self._bound(max(max_pending, max_workers))
+
+
+class ConnectionSlots:
+    """
+    Connections every transfer draws from. A transfer waits for the one it needs,
+    extra ones are only handed out while nobody is waiting, so a few large files
+    can use idle capacity without holding up everything else
+    """
+
+    def __init__(self, count: int):
+        self._free = count
+        self._waiting = 0
+        self._condition = Condition()
+
+    def acquire(self) -> None:
+        with self._condition:
+            self._waiting += 1
+            try:
+                self._condition.wait_for(lambda: self._free > 0)
+            finally:
+                self._waiting -= 1
+            self._free -= 1
+
+    def try_acquire(self) -> bool:
+        with self._condition:
+            if self._waiting or not self._free:
+                return False
+            self._free -= 1
+            return True
+
+    def release(self) -> None:
+        with self._condition:
+            self._free += 1
+            self._condition.notify()
+
+    @contextmanager
+    def slot(self) -> Generator[None, None, None]:
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
@@ -0,0 +1,99 @@
+"""
+Processors run on each newly downloaded file, in worker processes. A processor
+is any importable function taking the local path and SnapshotEntry of a file and
+returning a short description of what it did, or None if it had nothing to do
+"""
+
+import importlib
+import logging
+import zipfile
+from collections.abc import Callable
+from concurrent.futures import Future
+from functools import cache
+from pathlib import Path
+from typing import NamedTuple
+
+from canvy.pipeline import BoundedProcessExecutor
+from canvy.snapshot import SnapshotEntry
+from canvy.types import ProcessingConfig
+
+logger = logging.getLogger(__name__)
+
+type Processor = Callable[[Path, SnapshotEntry], str | None]
+
+
+class ProcessorResult(NamedTuple):
+    processor: str
+    ok: bool
+    message: str | None = None
+
+
+@cache
+def load_processor(spec: str) -> Processor:
+    """
+    Import a processor from its module:function path
+
+    Raises:
+        ImportError: If the module or function doesn't exist
+    """
+    module_name, _, function = spec.partition(":")
+    module = importlib.import_module(module_name)
+    try:
+        return getattr(module, function)
+    except AttributeError as e:
+        msg = f"{module_name} has no processor called {function}"
+        raise ImportError(msg) from e
+
+
+def run_processors(
+    specs: tuple[str, ...], path: Path, entry: SnapshotEntry
+) -> list[ProcessorResult]:
+    """
+    Run every processor on a file in order, a failing one doesn't stop the rest
+    """
+    results: list[ProcessorResult] = []
+    for spec in specs:
+        try:
+            message = load_processor(spec)(path, entry)
+        except Exception as e:
+            logger.warning("Processor %s failed on %s: %s", spec, path, e)
+            results.append(ProcessorResult(spec, ok=False, message=str(e)))
+            continue
+        results.append(ProcessorResult(spec, ok=True, message=message))
+    return results
+
+
+class ProcessingStage:
+    """
+    Hands downloaded files to processors in a bounded process pool, so transfer
+    threads only ever wait when processing falls far behind
+
+    Raises:
+        ImportError: If a configured processor can't be imported
+    """
+
+    def __init__(self, config: ProcessingConfig):
+        self.specs = tuple(config.processors)
+        for spec in self.specs:
+            load_processor(spec)
+        self.executor = BoundedProcessExecutor(config.workers, 4 * config.workers)
+
+    def submit(self, path: Path, entry: SnapshotEntry) -> Future[list[ProcessorResult]]:
+        return self.executor.submit(run_processors, self.specs, path, entry)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(cancel_futures=True)
+
+
+def unzip(path: Path, entry: SnapshotEntry) -> str | None:
+    """
+    Extract zip archives into a directory named after them, beside the archive
+    """
+    if not zipfile.is_zipfile(path):
+        return None
+    target = path.with_suffix("")
+    # INFO: extractall drops absolute paths and .. so members stay inside target
+    with zipfile.ZipFile(path) as archive:
+        members = archive.namelist()
+        archive.extractall(target)
+    return f"Extracted {len(members)} files into {target.name}"
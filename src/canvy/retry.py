@@ -0,0 +1,258 @@
+import logging
+import random
+import time
+from collections import deque
+from collections.abc import Callable
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+from http import HTTPStatus
+from threading import Lock
+from urllib.parse import urlsplit
+
+import requests
+from canvasapi.exceptions import CanvasException, Forbidden
+from requests import PreparedRequest, Response
+from requests.adapters import BaseAdapter, HTTPAdapter
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
+
+from canvy.const import RETRY_METHODS, RETRY_STATUSES, THROTTLED_MESSAGE
+from canvy.types import RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """
+    Raised instead of sending a request to a host that keeps failing
+    """
+
+    def __init__(self, host: str, retry_in: float):
+        super().__init__(f"Circuit open for {host}, retrying in {retry_in:.1f}s")
+        self.host = host
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker, after enough consecutive failures the host is left
+    alone for a cooldown and then a single request is let through to probe it
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures: dict[str, int] = {}
+        self._opened_at: dict[str, float] = {}
+        self._probing: dict[str, float] = {}
+        self._lock = Lock()
+
+    def check(self, host: str) -> None:
+        """
+        Raises:
+            CircuitOpenError: If the host is still cooling down or being probed
+        """
+        with self._lock:
+            now = time.monotonic()
+            if (probed := self._probing.get(host)) is not None:
+                # INFO: A probe that never reports back only holds the others off
+                # for another cooldown
+                if (remaining := probed + self.cooldown - now) > 0:
+                    raise CircuitOpenError(host, remaining)
+            elif (opened := self._opened_at.get(host)) is None:
+                return
+            elif (remaining := opened + self.cooldown - now) > 0:
+                raise CircuitOpenError(host, remaining)
+            # INFO: Half-open, one failure from here re-opens it straight away
+            self._failures[host] = self.threshold - 1
+            self._opened_at.pop(host, None)
+            self._probing[host] = now
+
+    def record_success(self, host: str) -> None:
+        with self._lock:
+            self._failures.pop(host, None)
+            self._probing.pop(host, None)
+
+    def record_failure(self, host: str) -> None:
+        with self._lock:
+            self._probing.pop(host, None)
+            self._failures[host] = failures = self._failures.get(host, 0) + 1
+            if failures >= self.threshold and host not in self._opened_at:
+                logger.warning("Too many failures from %s, backing off", host)
+                self._opened_at[host] = time.monotonic()
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """
+    Retry-After is either a number of seconds or an HTTP date
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (when - datetime.now(UTC)).total_seconds())
+
+
+def backoff_delay(
+    policy: RetryPolicy, attempt: int, retry_after: str | None = None
+) -> float:
+    """
+    Exponential backoff with equal jitter, unless the server told us how long to wait
+
+    Args:
+        policy: Retry settings
+        attempt: Zero-based number of the attempt that just failed
+        retry_after: Retry-After header of the failed response, if any
+    """
+    if (delay := parse_retry_after(retry_after)) is not None:
+        return min(delay, policy.backoff_max)
+    capped = min(policy.backoff_max, policy.backoff * 2**attempt)
+    return capped / 2 + random.uniform(0, capped / 2)  # noqa: S311
+
+
+def is_transient(e: BaseException) -> bool:
+    """
+    Whether an error is worth trying again later rather than giving up on
+    """
+    # INFO: Streams read straight from response.raw, as S3 uploads do, see urllib3's
+    # own errors rather than requests' when the connection drops partway
+    if isinstance(
+        e,
+        requests.ConnectionError | requests.Timeout | ProtocolError | ReadTimeoutError,
+    ):
+        return True
+    if isinstance(e, Forbidden):
+        # INFO: Covers RateLimitExceeded (429) and Canvas' own 403 throttling
+        return THROTTLED_MESSAGE in str(e)
+    # INFO: canvasapi flattens 5xx into this with the status code in the message
+    return type(e) is CanvasException and "status code 5" in str(e)
+
+
+def should_retry(response: Response) -> bool:
+    if response.status_code in RETRY_STATUSES:
+        return True
+    return (
+        response.status_code == HTTPStatus.FORBIDDEN
+        and THROTTLED_MESSAGE in response.text
+    )
+
+
+class RetryAdapter(BaseAdapter):
+    """
+    Transport adapter retrying transient failures of the wrapped adapter
+    """
+
+    def __init__(
+        self,
+        policy: RetryPolicy,
+        breaker: CircuitBreaker | None = None,
+        inner: BaseAdapter | None = None,
+    ):
+        super().__init__()
+        self.policy = policy
+        self.breaker = breaker or CircuitBreaker(
+            policy.breaker_threshold, policy.breaker_cooldown
+        )
+        self.inner = inner or HTTPAdapter()
+        self.sleep: Callable[[float], None] = time.sleep
+
+    def send(  # type: ignore[override]
+        self, request: PreparedRequest, **kwargs
+    ) -> Response:
+        host = urlsplit(request.url or "").netloc
+        retries = self.policy.retries if request.method in RETRY_METHODS else 0
+        for attempt in range(retries + 1):
+            self.breaker.check(host)
+            last = attempt == retries
+            try:
+                response = self.inner.send(request, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.breaker.record_failure(host)
+                if last:
+                    raise
+                delay = backoff_delay(self.policy, attempt)
+                logger.info(
+                    "%s %s failed (%s), retry in %.1fs",
+                    request.method,
+                    request.url,
+                    e,
+                    delay,
+                )
+                self.sleep(delay)
+                continue
+            if not should_retry(response):
+                self.breaker.record_success(host)
+                return response
+            if response.status_code >= HTTPStatus.INTERNAL_SERVER_ERROR:
+                self.breaker.record_failure(host)
+            if last:
+                return response
+            delay = backoff_delay(
+                self.policy, attempt, response.headers.get("Retry-After")
+            )
+            logger.info(
+                "%s %s gave %s, retry in %.1fs",
+                request.method,
+                request.url,
+                response.status_code,
+                delay,
+            )
+            response.close()
+            self.sleep(delay)
+        msg = "Retry loop exited without a response"
+        raise RuntimeError(msg)
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+class RetryQueue[T]:
+    """
+    Work that failed for transient reasons, given another go at the end of the run,
+    each item is tagged with whatever describes it to the caller
+    """
+
+    def __init__(self):
+        self._items: deque[tuple[T, Callable[[], int]]] = deque()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def push(self, tag: T, fn: Callable[[], int]) -> None:
+        logger.info("Queued %s for retry", tag)
+        with self._lock:
+            self._items.append((tag, fn))
+
+    def drain(
+        self, sleep: Callable[[float], None] = time.sleep
+    ) -> tuple[int, list[tuple[T, Exception]]]:
+        """
+        Run every queued item once more, waiting out open circuits once per item
+
+        Returns:
+            Sum of the results of successful items and the tags and errors of
+            failed ones
+        """
+        total: int = 0
+        failed: list[tuple[T, Exception]] = []
+        while True:
+            with self._lock:
+                if not self._items:
+                    break
+                tag, fn = self._items.popleft()
+            try:
+                try:
+                    total += fn()
+                except CircuitOpenError as e:
+                    sleep(e.retry_in)
+                    total += fn()
+            except Exception as e:
+                logger.error("Giving up on %s: %s", tag, e)
+                failed.append((tag, e))
+        return total, failed
@@ -0,0 +1,63 @@
+# pyright: reportAny=false
+# pyright: reportUnknownMemberType=false
+# pyright: reportUnknownVariableType=false
+import logging
+from pathlib import PurePosixPath
+from typing import Any
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+from canvasapi.file import File
+
+from canvy.client import stream_file
+from canvy.storage import StorageBackend
+from canvy.types import StorageConfig
+
+logger = logging.getLogger(__name__)
+
+
+class S3Storage(StorageBackend):
+    """
+    Any S3-compatible object store, Canvas responses are streamed straight into
+    multipart uploads with parts sent in parallel so nothing is staged on disk
+
+    Args:
+        client: boto3 S3 client, made from the default credential chain if missing
+    """
+
+    def __init__(self, config: StorageConfig, client: Any = None):
+        self.bucket = config.bucket
+        self.prefix = config.prefix.strip("/")
+        self.client = client or boto3.client("s3", endpoint_url=config.endpoint_url)
+        self.transfer_config = TransferConfig(
+            multipart_threshold=config.part_size,
+            multipart_chunksize=config.part_size,
+            max_concurrency=config.concurrency,
+        )
+
+    def object_key(self, key: PurePosixPath) -> str:
+        return str(PurePosixPath(self.prefix, key)) if self.prefix else str(key)
+
+    def exists(self, key: PurePosixPath) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.object_key(key))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in {
+                "404",
+                "NoSuchKey",
+                "NotFound",
+            }:
+                return False
+            raise
+        return True
+
+    def write(self, file: File, key: PurePosixPath, *, force: bool = False) -> bool:
+        object_key = self.object_key(key)
+        logger.info("Uploading %s to s3://%s/%s", key, self.bucket, object_key)
+        with stream_file(file) as response:
+            response.raw.decode_content = True
+            self.client.upload_fileobj(
+                response.raw, self.bucket, object_key, Config=self.transfer_config
+            )
+        return True
@@ -1,4 +1,10 @@
-from canvy.scripts.downloader import download
+from canvy.scripts.downloader import download, download_sharded, print_summary
 from canvy.scripts.grades import grades, grades_by_course
 
-__all__ = ["download", "grades", "grades_by_course"]
+__all__ = [
+    "download",
+    "download_sharded",
+    "grades",
+    "grades_by_course",
+    "print_summary",
+]
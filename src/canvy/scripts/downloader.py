@@ -3,153 +3,201 @@
 # pyright: reportUnknownArgumentType=false
 # pyright: reportUnknownMemberType=false
 import logging
-import re
-from collections.abc import Generator
-from concurrent.futures import ThreadPoolExecutor
+import multiprocessing
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from logging.handlers import QueueListener
 from pathlib import Path
 
 from canvasapi.canvas import Canvas
-from canvasapi.course import Course
-from canvasapi.exceptions import ResourceDoesNotExist
-from canvasapi.file import File
-from canvasapi.module import Module, ModuleItem
-from canvasapi.page import Page
-
-from canvy.types import ModuleItemType
-from canvy.utils import better_course_name, download_structured, get_config
+from rich.console import Console
+
+from canvy.client import requester_of
+from canvy.storage import StorageBackend
+from canvy.sync import (
+    CourseSkipped,
+    CourseStarted,
+    Discovered,
+    Downloaded,
+    Failed,
+    Finished,
+    ModuleStarted,
+    Processed,
+    Skipped,
+    Syncer,
+    SyncSummary,
+)
+from canvy.types import CanvyConfig, Shard, ShardBy
+from canvy.utils import forward_logging, get_config
 
 logger = logging.getLogger(__name__)
 
 
-def extract_files_from_page(
-    canvas: Canvas, course: Course, module: Module, page: Page, url: str = ""
-):
-    """
-    Use a regex generated from the id of the course to scrape canvas file links
-    and add them to the download queue. We do this because there can be many unmarked
-    or arbitrarily organised files on Canvas, depending on the module organiser.
-
-    Returns:
-        download_structured arguments
-    """
-    # INFO: There has to be a better way bro
-    regex = rf"{url or get_config().canvas_url}/(?:api/v1/)?courses/{course.id}/files/([0-9]+)"
-    page_title = getattr(page, "title", "No Title")
-    names = [better_course_name(course.name), module.name, page_title]
-    if getattr(page, "body", None) is None:
-        return
-    logging.info(f"Found page: {page}")
-    for id in re.findall(regex, page.body):
-        if id is None:
-            continue
-        logger.info(f"Scanned file({id}) from Page({page.page_id})")
-        try:
-            yield (names, canvas.get_file(id))
-        except ResourceDoesNotExist as e:
-            logger.warning(f"No access to scrape page: {e}")
-        except Exception:
-            logger.error(f"Unknown error downloading file {id}")
-
-
-def module_item_files(
-    canvas: Canvas, course: Course, module: Module, item: ModuleItem, url: str = ""
-) -> Generator[tuple[list[str], File], None, None]:
-    """
-    Process module items into the file queue for downloads
-
-    Returns:
-        download_structured arguments - directly and through page scanning
-    """
-    course_name = better_course_name(course.name)
-    if (type := ModuleItemType(item.type)) == ModuleItemType.PAGE:
-        page = course.get_page(item.page_url)
-        yield from extract_files_from_page(canvas, course, module, page, url)
-    elif type is ModuleItemType.ATTACHMENT:
-        file = canvas.get_file(item.content_id)
-        names = [course_name, module.name]
-        logging.info(f"Found file: {file}")
-        yield (names, file)
-
-
-def download(
+def download(  # noqa: PLR0913
     canvas: Canvas,
     storage_dir: Path | None = None,
     *,
     force: bool = False,
     url: str = "",
     courses: list[int] | None = None,
+    shard: Shard | None = None,
+    shard_by: ShardBy = ShardBy.COURSE,
+    show_progress: bool = True,
+    storage: StorageBackend | None = None,
+    config: CanvyConfig | None = None,
 ) -> int:
     # TODO: Define behaviour for canvas files that are more recent than ours
     """
-    Download every file accessible through a Canvas account on courses and modules
+    Download every file accessible through a Canvas account on courses and modules,
+    drawing the events of a Syncer as progress bars
 
     Args:
         canvas: Canvas instance
+        storage_dir: Where files go, the configured storage path by default
         url: Institution URL where the Canvas server is hosted
-        force: Override existing files?
+        courses: Course ids to download, all of them when empty
+        force: Override existing files and walk unchanged courses anyway?
+        shard: Only sync the courses or files belonging to this shard
+        shard_by: Whether shards own whole courses or individual files
+        show_progress: Draw progress bars, off when several shards share a terminal
+        storage: Where files go, local storage under storage_dir by default
+        config: Every other setting of the sync, such as filters, processors and
+            aliases, the defaults for this account when not given
 
     Returns:
         Downloaded file count - not including skipped downloads
     """
-    from threading import Lock
-
-    from rich.console import Console
     from rich.live import Live
     from rich.panel import Panel
     from rich.progress import Progress
 
-    count_lock = Lock()
-    download_count = 0
-
-    def safe_download(file: File, paths: list[str]):
-        def inner():
-            res = download_structured(
-                file, *paths, storage_dir=storage_dir, force=force
-            )
-            with count_lock:
-                nonlocal download_count
-                download_count += res
-
-        return inner
+    # INFO: Describe the account this client is logged into for the syncer
+    requester = requester_of(canvas)
+    base = config or CanvyConfig(
+        canvas_url=requester.original_url,
+        canvas_key=requester.access_token,
+        storage_path=storage_dir or get_config().storage_path,
+    )
+    config = base.model_copy(
+        update={
+            "canvas_url": url or requester.original_url,
+            "canvas_key": requester.access_token,
+            "storage_path": storage_dir or base.storage_path,
+            "selected_courses": courses or [],
+        }
+    )
+    syncer = Syncer(config, canvas=canvas, storage=storage)
 
     console = Console()
     progress = Progress(expand=True)
     panel = Panel(progress, title="Downloading...", border_style="green", width=100)
+    summary = SyncSummary()
 
     with (
-        Live(panel, refresh_per_second=5, console=console),
-        ThreadPoolExecutor(max_workers=5) as executor,
+        Live(panel, refresh_per_second=5, console=console)
+        if show_progress
+        else nullcontext()
     ):
-        user_courses = list(canvas.get_courses(enrollment_state="active"))
-        progress_course = progress.add_task("Course", total=len(user_courses))
-        progress_module = progress.add_task("Module")
-        progress_items = progress.add_task("Downloading files...")
-        for course in user_courses:
-            if courses is not None and course.id not in courses:
-                logger.info(f"Skipping {course} as specified")
-                continue
-            progress.update(
-                progress_course, description=f"Course: {course.course_code:30.30}"
-            )
-            for module in (modules := list(course.get_modules())):
-                progress.update(
-                    progress_module,
-                    description=f"Module: {module.name:30.30}",
-                    total=len(modules),
-                )
-                for item in (items := list(module.get_module_items())):
-                    for paths, file in module_item_files(
-                        canvas, course, module, item, url
-                    ):
-                        progress.update(
-                            progress_items,
-                            description=f"  File: {file.filename:30.30}",
-                            total=len(items),
-                        )
-                        executor.submit(safe_download(file, paths))
+        # INFO: Totals stay unknown, nothing is materialised up front to count it
+        progress_course = progress.add_task("Course", total=None)
+        progress_module = progress.add_task("Module", total=None)
+        progress_items = progress.add_task("Downloading files...", total=None)
+        for event in syncer.run(force=force, shard=shard, shard_by=shard_by):
+            match event:
+                case CourseStarted(name=name):
+                    progress.update(
+                        progress_course, description=f"Course: {name:30.30}", advance=1
+                    )
+                    progress.reset(progress_module, total=None)
+                case CourseSkipped():
+                    progress.update(progress_course, advance=1)
+                case ModuleStarted(name=name):
+                    progress.update(
+                        progress_module, description=f"Module: {name:30.30}", advance=1
+                    )
+                case Discovered(filename=filename):
+                    progress.update(
+                        progress_items, description=f"  File: {filename:30.30}"
+                    )
+                case Downloaded() | Skipped() | Failed():
                     progress.update(progress_items, advance=1)
-                progress.update(progress_module, advance=1)
-                progress.reset(progress_items)
-            progress.update(progress_course, advance=1)
-            progress.reset(progress_module)
-    return download_count
+                case Processed(filename=filename):
+                    progress.update(
+                        progress_items, description=f"  Processed: {filename:25.25}"
+                    )
+                case Finished(summary=summary):
+                    pass
+    print_summary(console, summary)
+    return summary.downloaded
+
+
+def print_summary(console: Console, summary: SyncSummary) -> None:
+    """
+    Print what a sync did beyond downloading files
+    """
+    if summary.cache_hits:
+        console.print(
+            f"{summary.cache_hits} of {summary.cache_hits + summary.cache_misses} "
+            "API requests shared with identical ones"
+        )
+    for processor in summary.processed.keys() | summary.processing_failed.keys():
+        console.print(
+            f"{processor}: {summary.processed.get(processor, 0)} processed, "
+            f"{summary.processing_failed.get(processor, 0)} failed"
+        )
+
+
+def download_shard(
+    config: CanvyConfig,
+    shard: Shard,
+    shard_by: ShardBy,
+    *,
+    force: bool = False,
+    run_id: str | None = None,
+) -> SyncSummary:
+    """
+    Run one shard of a sync with its own client, for use in a worker process
+    """
+    return Syncer(config).sync(
+        force=force, shard=shard, shard_by=shard_by, run_id=run_id
+    )
+
+
+def download_sharded(
+    config: CanvyConfig,
+    workers: int,
+    shard_by: ShardBy = ShardBy.COURSE,
+    *,
+    force: bool = False,
+) -> dict[str, SyncSummary]:
+    """
+    Split a sync into as many shards as workers and run each in its own process
+
+    Returns:
+        Summary of each shard, add them up for the whole sync
+    """
+    shards = [Shard(index=i, count=workers) for i in range(1, workers + 1)]
+    # INFO: The shards record a single snapshot between them
+    run_id = uuid.uuid4().hex
+    context = multiprocessing.get_context("spawn")
+    # INFO: Workers log through this process, the only one writing the log file
+    records = context.Queue()
+    forwarder = QueueListener(records, *logging.getLogger().handlers)
+    forwarder.start()
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=forward_logging,
+            initargs=(records,),
+        ) as pool:
+            futures = {
+                str(shard): pool.submit(
+                    download_shard, config, shard, shard_by, force=force, run_id=run_id
+                )
+                for shard in shards
+            }
+            return {name: future.result() for name, future in futures.items()}
+    finally:
+        forwarder.stop()
@@ -0,0 +1,206 @@
+# pyright: reportAny=false
+# pyright: reportUnknownMemberType=false
+import logging
+import os
+import re
+from collections import deque
+from collections.abc import Callable, Generator, Iterable
+from http import HTTPStatus
+from pathlib import Path
+from threading import Event, Lock, Thread
+from typing import BinaryIO
+from urllib.parse import urlsplit
+
+import requests
+from canvasapi.file import File
+from requests import Response, Session
+
+from canvy.client import raise_for_canvas_status
+from canvy.const import DOWNLOAD_CHUNK_SIZE
+from canvy.pipeline import ConnectionSlots
+from canvy.types import SegmentConfig
+
+logger = logging.getLogger(__name__)
+
+CONTENT_RANGE_REGEX = re.compile(r"bytes \d+-\d+/(\d+)")
+
+
+class IncompleteSegmentError(requests.ConnectionError):
+    """
+    A ranged response didn't carry the bytes it was asked for, worth retrying
+    """
+
+
+def _copy(response: Response, out: BinaryIO) -> int:
+    written = 0
+    for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+        out.write(chunk)
+        written += len(chunk)
+    return written
+
+
+def _preallocate(path: Path, size: int) -> None:
+    with path.open("wb") as out:
+        if hasattr(os, "posix_fallocate"):
+            os.posix_fallocate(out.fileno(), 0, size)
+        else:
+            out.truncate(size)
+
+
+def _ranges(size: int, segment_size: int) -> Generator[tuple[int, int], None, None]:
+    """
+    Inclusive byte ranges covering size bytes, segment_size at a time
+    """
+    for start in range(0, size, segment_size):
+        yield (start, min(start + segment_size, size) - 1)
+
+
+class _Segments:
+    """
+    Byte ranges of one file handed out to whichever connection asks next
+    """
+
+    def __init__(
+        self,
+        session: Session,
+        url: str,
+        headers: dict[str, str],
+        path: Path,
+        ranges: Iterable[tuple[int, int]],
+    ):
+        self.session = session
+        self.url = url
+        self.headers = headers
+        self.path = path
+        self._ranges = deque(ranges)
+        self._lock = Lock()
+        self.failed = Event()
+        self.errors: list[Exception] = []
+
+    def take(self) -> tuple[int, int] | None:
+        with self._lock:
+            if self.failed.is_set() or not self._ranges:
+                return None
+            return self._ranges.popleft()
+
+    def __len__(self) -> int:
+        return len(self._ranges)
+
+    def fetch(self, start: int, end: int, out: BinaryIO) -> None:
+        headers = self.headers | {"Range": f"bytes={start}-{end}"}
+        with self.session.get(self.url, headers=headers, stream=True) as response:
+            if response.status_code != HTTPStatus.PARTIAL_CONTENT:
+                raise_for_canvas_status(response)
+                e = f"Asked for bytes {start}-{end}, got status {response.status_code}"
+                raise IncompleteSegmentError(e)
+            out.seek(start)
+            written = _copy(response, out)
+        if written != end - start + 1:
+            e = f"Asked for bytes {start}-{end}, got {written} bytes"
+            raise IncompleteSegmentError(e)
+
+    def work(
+        self,
+        *,
+        before: Callable[[], bool] = lambda: True,
+        after: Callable[[], None] = lambda: None,
+    ) -> None:
+        """
+        Fetch ranges until they run out, something fails or before declines
+        """
+        try:
+            with self.path.open("r+b") as out:
+                while before():
+                    try:
+                        if (segment := self.take()) is None:
+                            return
+                        self.fetch(*segment, out)
+                    finally:
+                        after()
+        except Exception as e:
+            self.errors.append(e)
+            self.failed.set()
+
+
+class _Borrowed:
+    """
+    Extra connection of a helper, given back after every segment and only taken
+    again if it's still free, so transfers waiting on one get it first
+    """
+
+    def __init__(self, slots: ConnectionSlots):
+        self.slots = slots
+        self.held = True
+
+    def renew(self) -> bool:
+        self.held = self.held or self.slots.try_acquire()
+        return self.held
+
+    def give_back(self) -> None:
+        self.slots.release()
+        self.held = False
+
+    def work(self, segments: _Segments) -> None:
+        try:
+            segments.work(before=self.renew, after=self.give_back)
+        finally:
+            if self.held:
+                self.slots.release()
+
+
+def download_segmented(
+    file: File, path: Path, config: SegmentConfig, slots: ConnectionSlots
+) -> None:
+    """
+    Download a file as byte ranges fetched in parallel and written at their offsets,
+    the caller's connection always takes part and further ones are borrowed from
+    slots only while they're free. Servers that ignore ranges get a plain download
+
+    Args:
+        file: File to download
+        path: Where to write it, preallocated to the full size
+        config: Segment size and connection limit per file
+        slots: Connections shared with other transfers, the caller holds one already
+    """
+    requester = file._requester
+    session: Session = requester._session
+    auth = {"Authorization": f"Bearer {requester.access_token}"}
+    # INFO: The first byte follows Canvas' redirect and tells us if ranges work
+    probe = session.get(file.url, headers=auth | {"Range": "bytes=0-0"}, stream=True)
+    with probe:
+        if probe.status_code >= HTTPStatus.BAD_REQUEST:
+            raise_for_canvas_status(probe)
+        if probe.status_code == HTTPStatus.OK:
+            logger.info("%s doesn't do ranges, downloading it whole", file.filename)
+            with path.open("wb") as out:
+                _copy(probe, out)
+            return
+        match = CONTENT_RANGE_REGEX.fullmatch(probe.headers.get("Content-Range", ""))
+        url = probe.url
+    # INFO: The probe only carries a byte, without the total size start over
+    if probe.status_code != HTTPStatus.PARTIAL_CONTENT or match is None:
+        logger.info(
+            "%s gave no size for its ranges, downloading it whole", file.filename
+        )
+        file.download(path)
+        return
+    size = int(match.group(1))
+    # INFO: Storage targets are signed URLs and reject credentials meant for Canvas
+    same_host = urlsplit(url).netloc == urlsplit(file.url).netloc
+    _preallocate(path, size)
+    headers = auth if same_host else {}
+    segments = _Segments(session, url, headers, path, _ranges(size, config.size))
+    logger.info("Downloading %s in %d segments", file.filename, len(segments))
+
+    helpers: list[Thread] = []
+    for _ in range(min(config.connections, len(segments)) - 1):
+        if not slots.try_acquire():
+            break
+        helper = Thread(target=_Borrowed(slots).work, args=(segments,))
+        helper.start()
+        helpers.append(helper)
+    segments.work()
+    for helper in helpers:
+        helper.join()
+    if segments.errors:
+        raise segments.errors[0]
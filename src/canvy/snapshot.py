@@ -0,0 +1,316 @@
+import logging
+import sqlite3
+from collections.abc import Iterable
+from contextlib import closing, suppress
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import NamedTuple
+
+from canvy.const import SNAPSHOT_FN, SNAPSHOTS_KEPT, STATE_DIRNAME
+from canvy.types import Shard, ShardBy
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    taken_at TEXT NOT NULL,
+    run TEXT
+);
+CREATE TABLE IF NOT EXISTS files (
+    snapshot_id INTEGER NOT NULL,
+    course_id INTEGER NOT NULL,
+    course TEXT NOT NULL,
+    module TEXT NOT NULL,
+    item TEXT NOT NULL,
+    file_id INTEGER NOT NULL,
+    filename TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS files_by_course ON files (snapshot_id, course_id);
+"""
+# INFO: Snapshots from before shards of a sync could share one
+MIGRATION = "ALTER TABLE snapshots ADD COLUMN run TEXT"
+RUN_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS snapshots_by_run ON snapshots (run)"
+COLUMNS = "course_id, course, module, item, file_id, filename, path, size, updated_at"
+
+
+class SnapshotEntry(NamedTuple):
+    course_id: int
+    course: str
+    module: str
+    item: str
+    file_id: int
+    filename: str
+    path: str
+    size: int | None
+    updated_at: str | None
+
+
+class SnapshotInfo(NamedTuple):
+    id: int
+    taken_at: str
+    files: int
+    bytes: int
+
+
+class CourseInfo(NamedTuple):
+    course_id: int
+    course: str
+    files: int
+    bytes: int
+
+
+@dataclass(slots=True)
+class SnapshotDiff:
+    added: list[SnapshotEntry] = field(default_factory=list)
+    removed: list[SnapshotEntry] = field(default_factory=list)
+    changed: list[tuple[SnapshotEntry, SnapshotEntry]] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+
+class SnapshotStore:
+    """
+    SQLite record of the tree each sync discovered, answers questions about an
+    account without going near the network
+
+    Args:
+        storage_dir: Storage path the snapshots describe
+    """
+
+    def __init__(self, storage_dir: Path):
+        self.path = storage_dir / STATE_DIRNAME / SNAPSHOT_FN
+
+    def connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # INFO: Syncs are driven from whichever thread asks for the next event
+        connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        connection.executescript(SCHEMA)
+        columns = {row[1] for row in connection.execute("PRAGMA table_info(snapshots)")}
+        if "run" not in columns:
+            # INFO: Another process may have just migrated it
+            with suppress(sqlite3.OperationalError):
+                connection.execute(MIGRATION)
+        connection.execute(RUN_INDEX)
+        return connection
+
+    def begin(
+        self,
+        shard: Shard | None = None,
+        shard_by: ShardBy = ShardBy.COURSE,
+        run: str | None = None,
+    ) -> "SnapshotWriter":
+        """
+        Start recording a sync, nothing is visible to readers until it's committed
+
+        Args:
+            shard: Shard doing the sync, what other shards own is carried over from
+                the previous snapshot
+            shard_by: Whether shards own whole courses or individual files
+            run: Sync the shard is part of, its shards share one snapshot
+        """
+        return SnapshotWriter(self.connect(), shard, shard_by, run)
+
+    def _query(self, sql: str, params: Iterable[object] = ()) -> list[tuple]:
+        if not self.path.is_file():
+            return []
+        with closing(self.connect()) as connection:
+            return connection.execute(sql, tuple(params)).fetchall()
+
+    def snapshots(self) -> list[SnapshotInfo]:
+        """
+        Every kept snapshot, oldest first
+        """
+        rows = self._query(
+            "SELECT s.id, s.taken_at, COUNT(f.file_id), COALESCE(SUM(f.size), 0) "
+            "FROM snapshots s LEFT JOIN files f ON f.snapshot_id = s.id "
+            "GROUP BY s.id ORDER BY s.id"
+        )
+        return [SnapshotInfo(*row) for row in rows]
+
+    def latest(self, offset: int = 0) -> int | None:
+        """
+        Id of the newest snapshot, or of the one offset syncs before it
+        """
+        rows = self._query(
+            "SELECT id FROM snapshots ORDER BY id DESC LIMIT 1 OFFSET ?", [offset]
+        )
+        return rows[0][0] if rows else None
+
+    def courses(self, snapshot_id: int) -> list[CourseInfo]:
+        rows = self._query(
+            "SELECT course_id, course, COUNT(*), COALESCE(SUM(size), 0) FROM files "
+            "WHERE snapshot_id = ? GROUP BY course_id ORDER BY course",
+            [snapshot_id],
+        )
+        return [CourseInfo(*row) for row in rows]
+
+    def entries(
+        self, snapshot_id: int, course: str | None = None
+    ) -> list[SnapshotEntry]:
+        """
+        Files of a snapshot in tree order
+
+        Args:
+            snapshot_id: Snapshot to read
+            course: Course id or part of its name, every course if missing
+        """
+        sql = f"SELECT {COLUMNS} FROM files WHERE snapshot_id = ?"  # noqa: S608
+        params: list[object] = [snapshot_id]
+        if course is not None:
+            sql += " AND (CAST(course_id AS TEXT) = ? OR course LIKE ?)"
+            params += [course, f"%{course}%"]
+        rows = self._query(f"{sql} ORDER BY course, rowid", params)
+        return [SnapshotEntry(*row) for row in rows]
+
+    def diff(self, old_id: int, new_id: int) -> SnapshotDiff:
+        """
+        What changed between two snapshots, a file moved elsewhere counts as
+        removed from one place and added to another
+        """
+        old = {(e.file_id, e.path): e for e in self.entries(old_id)}
+        new = {(e.file_id, e.path): e for e in self.entries(new_id)}
+        diff = SnapshotDiff()
+        for key, entry in new.items():
+            if (before := old.get(key)) is None:
+                diff.added.append(entry)
+            elif (before.size, before.updated_at) != (entry.size, entry.updated_at):
+                diff.changed.append((before, entry))
+        diff.removed = [entry for key, entry in old.items() if key not in new]
+        return diff
+
+
+class SnapshotWriter:
+    """
+    Rows of a sync in progress, kept in a temporary table so other processes
+    aren't locked out of the database for the length of a sync
+    """
+
+    def __init__(
+        self,
+        connection: sqlite3.Connection,
+        shard: Shard | None = None,
+        shard_by: ShardBy = ShardBy.COURSE,
+        run: str | None = None,
+    ):
+        self.connection = connection
+        self.shard = shard
+        self.by_file = shard_by is ShardBy.FILE
+        self.run = run
+        self.carried: set[int] = set()
+        self.walked: set[int] = set()
+        self.connection.execute(
+            f"CREATE TEMP TABLE pending AS SELECT {COLUMNS} FROM files WHERE 0"  # noqa: S608
+        )
+
+    def add(self, entry: SnapshotEntry) -> None:
+        self.connection.execute(
+            "INSERT INTO pending VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", entry
+        )
+
+    def walk(self, course_id: int) -> None:
+        """
+        Note a course this sync is walking, even if it turns up no files
+        """
+        self.walked.add(course_id)
+
+    def carry_over(self, course_id: int) -> None:
+        """
+        Keep what the previous snapshot knew about a course this sync didn't walk
+        """
+        self.carried.add(course_id)
+
+    def commit(self) -> int:
+        """
+        Publish the snapshot and prune old ones, the shards of a run add to the
+        snapshot whichever of them commits first made
+
+        Returns:
+            Id of the snapshot
+        """
+        connection = self.connection
+        with connection:
+            previous, snapshot_id = self._snapshot_ids()
+            connection.execute(
+                f"INSERT INTO files SELECT ?, {COLUMNS} FROM pending",  # noqa: S608
+                [snapshot_id],
+            )
+            if previous is not None:
+                self._carry(previous, snapshot_id)
+            connection.execute(
+                "DELETE FROM snapshots WHERE id <= ?", [snapshot_id - SNAPSHOTS_KEPT]
+            )
+            connection.execute(
+                "DELETE FROM files WHERE snapshot_id NOT IN (SELECT id FROM snapshots)"
+            )
+        logger.info("Saved snapshot %s", snapshot_id)
+        return snapshot_id
+
+    def _snapshot_ids(self) -> tuple[int | None, int]:
+        """
+        Returns:
+            Id of the last snapshot before this run and of the one to write into
+        """
+        connection = self.connection
+        if self.run is None:
+            previous = connection.execute("SELECT MAX(id) FROM snapshots").fetchone()
+        else:
+            previous = connection.execute(
+                "SELECT MAX(id) FROM snapshots WHERE run IS NOT ?", [self.run]
+            ).fetchone()
+        taken_at = datetime.now(UTC).isoformat(timespec="seconds")
+        connection.execute(
+            "INSERT OR IGNORE INTO snapshots (taken_at, run) VALUES (?, ?)",
+            [taken_at, self.run],
+        )
+        if self.run is None:
+            current = connection.execute("SELECT last_insert_rowid()").fetchone()
+        else:
+            current = connection.execute(
+                "SELECT id FROM snapshots WHERE run = ?", [self.run]
+            ).fetchone()
+        return previous[0], current[0]
+
+    def _carry(self, previous: int, snapshot_id: int) -> None:
+        copy = f"INSERT INTO files SELECT ?, {COLUMNS} FROM files WHERE snapshot_id = ?"  # noqa: S608
+        if self.run is not None and self.shard is not None:
+            # INFO: Sibling shards write their own part of the snapshot
+            owner = "file_id" if self.by_file else "course_id"
+            for course_id in self.carried:
+                self.connection.execute(
+                    f"{copy} AND course_id = ? AND {owner} % ? = ?",
+                    [
+                        snapshot_id,
+                        previous,
+                        course_id,
+                        self.shard.count,
+                        self.shard.index - 1,
+                    ],
+                )
+            return
+        for course_id in self.carried:
+            self.connection.execute(
+                f"{copy} AND course_id = ?", [snapshot_id, previous, course_id]
+            )
+        if self.shard is None or not self.by_file:
+            return
+        # INFO: Walked courses only list this shard's files, the rest are still there
+        for course_id in self.walked:
+            self.connection.execute(
+                f"{copy} AND course_id = ? AND file_id % ? != ?",
+                [
+                    snapshot_id,
+                    previous,
+                    course_id,
+                    self.shard.count,
+                    self.shard.index - 1,
+                ],
+            )
+
+    def close(self) -> None:
+        self.connection.close()
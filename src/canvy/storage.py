@@ -0,0 +1,118 @@
+# pyright: reportAny=false
+# pyright: reportUnknownMemberType=false
+# pyright: reportUnknownVariableType=false
+import logging
+import os
+from abc import ABC, abstractmethod
+from pathlib import Path, PurePosixPath
+
+import requests
+from canvasapi.file import File
+
+from canvy.const import DOWNLOAD_CONNECTIONS
+from canvy.pipeline import ConnectionSlots
+from canvy.segmented import download_segmented
+from canvy.types import CanvyConfig, SegmentConfig, StorageBackendKind, StorageConfig
+from canvy.utils import claim_file, create_dir
+
+logger = logging.getLogger(__name__)
+
+
+class IncompleteDownloadError(requests.ConnectionError):
+    """
+    A download came out another size than Canvas has for the file, worth retrying
+    """
+
+
+def _check_size(file: File, path: Path) -> None:
+    if (size := getattr(file, "size", None)) is None:
+        return
+    if (written := path.stat().st_size) != size:
+        e = f"Expected {size} bytes of {file.filename}, got {written}"
+        raise IncompleteDownloadError(e)
+
+
+class StorageBackend(ABC):
+    """
+    Somewhere downloaded files are kept, addressed by paths relative to its root
+    """
+
+    @abstractmethod
+    def exists(self, key: PurePosixPath) -> bool: ...
+
+    @abstractmethod
+    def write(self, file: File, key: PurePosixPath, *, force: bool = False) -> bool:
+        """
+        Transfer a Canvas file to key
+
+        Returns:
+            If the file was transferred, false when someone else got there first
+        """
+
+
+class LocalStorage(StorageBackend):
+    """
+    Files on disk under root, large ones are downloaded in parallel segments
+
+    Args:
+        segments: When and how to split files, the defaults if missing
+        slots: Connections shared by every transfer into this storage
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        segments: SegmentConfig | None = None,
+        slots: ConnectionSlots | None = None,
+    ):
+        self.root = root
+        self.segments = segments or SegmentConfig()
+        self.slots = slots or ConnectionSlots(DOWNLOAD_CONNECTIONS)
+
+    def path(self, key: PurePosixPath) -> Path:
+        return self.root.joinpath(*key.parts)
+
+    def exists(self, key: PurePosixPath) -> bool:
+        return self.path(key).is_file()
+
+    def write(self, file: File, key: PurePosixPath, *, force: bool = False) -> bool:
+        file_path = self.path(key)
+        create_dir(file_path.parent)
+        # INFO: Claimed so threads and other shards writing the same tree never
+        # download the same file at once, and written aside so nobody sees half a file
+        part_path = file_path.with_name(f".{file_path.name}.part")
+        with claim_file(file_path.with_name(f".{file_path.name}.lock")) as claimed:
+            if not claimed:
+                logger.info("%s is being downloaded elsewhere, skipping", key)
+                return False
+            if file_path.is_file() and not force:
+                logger.info("%s finished elsewhere, skipping", key)
+                return False
+            logger.info("Downloading %s%s into %s", key, " (forced)" * force, file_path)
+            try:
+                with self.slots.slot():
+                    self._download(file, part_path)
+                _check_size(file, part_path)
+                os.replace(part_path, file_path)
+            finally:
+                part_path.unlink(missing_ok=True)
+            return True
+
+    def _download(self, file: File, path: Path) -> None:
+        if (getattr(file, "size", None) or 0) >= self.segments.threshold:
+            download_segmented(file, path, self.segments, self.slots)
+        else:
+            file.download(path)
+
+
+def make_storage(config: CanvyConfig) -> StorageBackend:
+    storage = config.storage or StorageConfig()
+    if storage.backend is StorageBackendKind.S3:
+        try:
+            # INFO: boto3 is optional, so the backend is only loaded when asked for
+            from canvy.s3 import S3Storage  # noqa: PLC0415
+        except ImportError as e:
+            msg = "The s3 storage backend needs boto3, install canvy[s3]"
+            raise ImportError(msg) from e
+        return S3Storage(storage)
+    return LocalStorage(Path(config.storage_path).expanduser(), config.segments)
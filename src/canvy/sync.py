@@ -0,0 +1,751 @@
+# pyright: reportAny=false
+# pyright: reportUnknownVariableType=false
+# pyright: reportUnknownArgumentType=false
+# pyright: reportUnknownMemberType=false
+import asyncio
+import logging
+import time
+from collections.abc import AsyncGenerator, Generator
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path, PurePosixPath
+from queue import Empty, SimpleQueue
+from threading import Lock
+from typing import Any
+
+import requests
+from canvasapi.canvas import Canvas
+from canvasapi.course import Course
+from canvasapi.exceptions import CanvasException
+from canvasapi.file import File
+from canvasapi.module import Module, ModuleItem
+
+from canvy.client import build_canvas, coalescer_of
+from canvy.const import DOWNLOAD_QUEUE_SIZE, DOWNLOAD_WORKERS
+from canvy.discovery import (
+    CourseContent,
+    CourseWalk,
+    folder_files,
+    module_item_files,
+)
+from canvy.filters import FileFilter
+from canvy.fingerprint import (
+    FingerprintStore,
+    course_fingerprint,
+    newest_file_timestamp,
+    newest_page_timestamp,
+)
+from canvy.graphql import GraphQLError, module_items
+from canvy.links import LinkResolver
+from canvy.pipeline import BoundedExecutor
+from canvy.processors import ProcessingStage, ProcessorResult
+from canvy.retry import RetryQueue, is_transient
+from canvy.snapshot import SnapshotEntry, SnapshotStore
+from canvy.storage import LocalStorage, StorageBackend, make_storage
+from canvy.types import (
+    CanvyConfig,
+    FilterConfig,
+    Layout,
+    Shard,
+    ShardBy,
+    SkipReason,
+    Traversal,
+)
+from canvy.utils import better_course_name, structured_key
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class SyncEvent:
+    """
+    Something that happened during a sync
+    """
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class CourseStarted(SyncEvent):
+    course_id: int
+    name: str
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class CourseSkipped(SyncEvent):
+    course_id: int
+    name: str
+    reason: SkipReason
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class ModuleStarted(SyncEvent):
+    course_id: int
+    name: str
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class FileEvent(SyncEvent):
+    file_id: int
+    filename: str
+    path: str
+    size: int | None
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class Discovered(FileEvent):
+    pass
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class Skipped(FileEvent):
+    reason: SkipReason
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class Downloaded(FileEvent):
+    seconds: float
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class Failed(FileEvent):
+    error: str
+    will_retry: bool
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class ItemFailed(SyncEvent):
+    """
+    A module item whose files couldn't be listed, even when retried
+    """
+
+    course_id: int
+    module: str
+    item_id: int
+    title: str
+    error: str
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class Processed(FileEvent):
+    results: tuple[ProcessorResult, ...]
+
+
+@dataclass(slots=True)
+class SyncSummary:
+    discovered: int = 0
+    downloaded: int = 0
+    skipped: int = 0
+    failed: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    # INFO: API requests answered by another identical one and those sent for real
+    cache_hits: int = 0
+    cache_misses: int = 0
+    # INFO: Per processor, how many files it handled and how many it failed on
+    processed: dict[str, int] = field(default_factory=dict)
+    processing_failed: dict[str, int] = field(default_factory=dict)
+
+    def record(self, event: SyncEvent) -> None:
+        match event:
+            case Processed(results=results):
+                for result in results:
+                    tally = self.processed if result.ok else self.processing_failed
+                    tally[result.processor] = tally.get(result.processor, 0) + 1
+            case Discovered():
+                self.discovered += 1
+            case Downloaded(size=size):
+                self.downloaded += 1
+                self.bytes += size or 0
+            case Skipped():
+                self.skipped += 1
+            case Failed(will_retry=False) | ItemFailed():
+                self.failed += 1
+
+    def __add__(self, other: "SyncSummary") -> "SyncSummary":
+        """
+        Merge the results of shards that ran side by side
+        """
+        return SyncSummary(
+            discovered=self.discovered + other.discovered,
+            downloaded=self.downloaded + other.downloaded,
+            skipped=self.skipped + other.skipped,
+            failed=self.failed + other.failed,
+            bytes=self.bytes + other.bytes,
+            seconds=max(self.seconds, other.seconds),
+            cache_hits=self.cache_hits + other.cache_hits,
+            cache_misses=self.cache_misses + other.cache_misses,
+            processed=_merge_counts(self.processed, other.processed),
+            processing_failed=_merge_counts(
+                self.processing_failed, other.processing_failed
+            ),
+        )
+
+
+def _merge_counts(a: dict[str, int], b: dict[str, int]) -> dict[str, int]:
+    return {key: a.get(key, 0) + b.get(key, 0) for key in a.keys() | b.keys()}
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class Finished(SyncEvent):
+    summary: SyncSummary
+
+
+@dataclass(frozen=True, slots=True)
+class _Work:
+    course_id: int
+    file: File
+    key: PurePosixPath
+    module: str = ""
+    item: str = ""
+
+    def __str__(self) -> str:
+        return str(self.key)
+
+    def fields(self) -> dict[str, Any]:
+        return {
+            "file_id": self.file.id,
+            "filename": self.file.filename,
+            "path": str(self.key),
+            "size": getattr(self.file, "size", None),
+        }
+
+    def entry(self, course: str) -> SnapshotEntry:
+        return SnapshotEntry(
+            course_id=self.course_id,
+            course=course,
+            module=self.module,
+            item=self.item,
+            file_id=self.file.id,
+            filename=self.file.filename,
+            path=str(self.key),
+            size=getattr(self.file, "size", None),
+            updated_at=getattr(self.file, "updated_at", None),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class _Item:
+    course_id: int
+    module: str
+    item_id: int
+    title: str
+
+    def __str__(self) -> str:
+        return f"item {self.item_id} of {self.module}"
+
+    def fields(self) -> dict[str, Any]:
+        return {
+            "course_id": self.course_id,
+            "module": self.module,
+            "item_id": self.item_id,
+            "title": self.title,
+        }
+
+
+class Syncer:
+    """
+    Syncs the files of a Canvas account into storage, reporting what happens as
+    events. One instance can run any number of syncs, reusing its client and storage
+
+    Args:
+        config: Account, storage and retry settings
+        canvas: Client to use instead of building one from config
+        storage: Backend to use instead of making one from config
+    """
+
+    def __init__(
+        self,
+        config: CanvyConfig,
+        canvas: Canvas | None = None,
+        storage: StorageBackend | None = None,
+    ):
+        self.config = config
+        self.canvas = canvas or build_canvas(config)
+        self.storage = storage or make_storage(config)
+
+    def run(  # noqa: PLR0913
+        self,
+        *,
+        force: bool = False,
+        courses: list[int] | None = None,
+        shard: Shard | None = None,
+        shard_by: ShardBy = ShardBy.COURSE,
+        filters: FilterConfig | None = None,
+        traversal: Traversal | None = None,
+        layout: Layout | None = None,
+        run_id: str | None = None,
+    ) -> Generator[SyncEvent, None, None]:
+        """
+        Sync lazily, transfers happen in the background while events are consumed
+        and the last event is always Finished
+
+        Args:
+            force: Overwrite existing files and walk unchanged courses anyway
+            courses: Course ids to sync, the configured selection (or all) if missing
+            shard: Only sync the courses or files belonging to this shard
+            shard_by: Whether shards own whole courses or individual files
+            filters: What to sync, the configured filters if missing
+            traversal: How to walk courses, the configured way (or REST) if missing
+            layout: Whether files are laid out by module or by folder, the configured
+                way (or by module) if missing
+            run_id: Sync this shard is part of, the shards of one share a snapshot
+        """
+        options = _RunOptions(
+            force=force,
+            courses=self.config.selected_courses if courses is None else courses,
+            shard=shard,
+            shard_by=shard_by,
+            filters=FileFilter(self.config.filters if filters is None else filters),
+            traversal=traversal or self.config.traversal or Traversal.REST,
+            layout=layout or self.config.layout or Layout.MODULES,
+            run_id=run_id,
+        )
+        return _SyncRun(self, options).events()
+
+    async def arun(self, **options: Any) -> AsyncGenerator[SyncEvent, None]:
+        """
+        Same as run, driven from worker threads so the event loop stays free
+        """
+        events = self.run(**options)
+        try:
+            while (event := await asyncio.to_thread(next, events, None)) is not None:
+                yield event
+        finally:
+            await asyncio.to_thread(events.close)
+
+    def sync(self, **options: Any) -> SyncSummary:
+        """
+        Run a sync to completion, for when nobody is watching the events
+        """
+        summary = SyncSummary()
+        for event in self.run(**options):
+            if isinstance(event, Finished):
+                summary = event.summary
+        return summary
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class _RunOptions:
+    """
+    What Syncer.run was asked for, with the configured defaults filled in
+    """
+
+    force: bool
+    courses: list[int]
+    shard: Shard | None
+    shard_by: ShardBy
+    filters: FileFilter
+    traversal: Traversal
+    layout: Layout
+    run_id: str | None
+
+
+class _SyncRun:
+    """
+    State of a single sync, discovery happens on the consuming thread and
+    transfers on a bounded pool that reports back through a queue
+    """
+
+    def __init__(self, syncer: Syncer, options: _RunOptions):
+        self.canvas = syncer.canvas
+        self.storage = syncer.storage
+        self.url = syncer.config.canvas_url
+        self.processing_config = syncer.config.processing
+        self.links = LinkResolver.for_url(
+            self.canvas, self.url, syncer.config.canvas_aliases or []
+        )
+        self.force = options.force
+        self.courses = options.courses
+        self.shard = shard = options.shard
+        self.shard_by = options.shard_by
+        self.run_id = options.run_id
+        self.filters = filters = options.filters
+        self.traversal = options.traversal
+        self.layout = layout = options.layout
+        # INFO: A file shard only sees part of each course so can't vouch for all of it
+        self.by_file = shard is not None and options.shard_by is ShardBy.FILE
+        storage_dir = Path(syncer.config.storage_path).expanduser()
+        # INFO: Files filtered out last time weren't downloaded, so a course synced
+        # with other filters hasn't been synced as far as these ones are concerned
+        scope = f"{shard}@" if self.by_file else ""
+        scope += f"{filters.digest()}#" if filters else ""
+        # INFO: Files end up elsewhere in another layout, so it starts from scratch
+        scope += f"{layout}#" if layout is not Layout.MODULES else ""
+        self.fingerprints = FingerprintStore(storage_dir, scope=scope)
+        self.snapshot_store = SnapshotStore(storage_dir)
+        self.course_names: dict[int, str] = {}
+        self.synced: dict[int, str] = {}
+        self.dirty_courses: set[int] = set()
+        self.retry_queue: RetryQueue[_Work | _Item] = RetryQueue()
+        self.summary = SyncSummary()
+        self._events: SimpleQueue[SyncEvent] = SimpleQueue()
+        self._finished = 0
+        self._dispatched = 0
+        self._processed = 0
+        self._lock = Lock()
+
+    def events(self) -> Generator[SyncEvent, None, None]:
+        self.snapshot = self.snapshot_store.begin(
+            self.shard, self.shard_by, self.run_id
+        )
+        self.processing = self._processing_stage()
+        try:
+            yield from self._events_recorded()
+        finally:
+            self.snapshot.close()
+            if self.processing is not None:
+                self.processing.shutdown()
+
+    def _processing_stage(self) -> ProcessingStage | None:
+        if self.processing_config is None or not self.processing_config.processors:
+            return None
+        if not isinstance(self.storage, LocalStorage):
+            logger.warning(
+                "Processors only run on files in local storage, skipping them"
+            )
+            return None
+        return ProcessingStage(self.processing_config)
+
+    def _events_recorded(self) -> Generator[SyncEvent, None, None]:
+        started = time.monotonic()
+        # INFO: The client outlives the run, only count what it did meanwhile
+        coalescer = coalescer_of(self.canvas)
+        hits, misses = (coalescer.hits, coalescer.misses) if coalescer else (0, 0)
+        yield from self._transfers()
+        if self.retry_queue:
+            yield from self._retries()
+        while self._processed < self._dispatched:
+            yield self._outcome(self._events.get())
+        self._save()
+        self.summary.seconds = time.monotonic() - started
+        if coalescer is not None:
+            self.summary.cache_hits = coalescer.hits - hits
+            self.summary.cache_misses = coalescer.misses - misses
+        yield Finished(summary=self.summary)
+
+    def _transfers(self) -> Generator[SyncEvent, None, None]:
+        submitted = 0
+        executor = BoundedExecutor(DOWNLOAD_WORKERS, DOWNLOAD_QUEUE_SIZE)
+        try:
+            for event, work in self._discover():
+                if work is not None:
+                    executor.submit(self._transfer, work)
+                    submitted += 1
+                yield self._record(event)
+                yield from self._drain_events()
+            while self._finished < submitted:
+                yield self._outcome(self._events.get())
+        finally:
+            # INFO: Only cancels anything when the consumer stopped early
+            executor.shutdown(cancel_futures=True)
+
+    def _retries(self) -> Generator[SyncEvent, None, None]:
+        logger.info("Retrying %s failed downloads", len(self.retry_queue))
+        _, failed = self.retry_queue.drain()
+        yield from self._drain_events()
+        for work, e in failed:
+            if isinstance(work, _Work):
+                yield self._record(
+                    Failed(**work.fields(), error=str(e), will_retry=False)
+                )
+            else:
+                yield self._record(ItemFailed(**work.fields(), error=str(e)))
+        if failed:
+            logger.warning(
+                "%s downloads failed, run again to pick them up", len(failed)
+            )
+
+    def _save(self) -> None:
+        # INFO: Courses with anything retried are walked again next time to be safe
+        for course_id, fingerprint in self.synced.items():
+            if course_id not in self.dirty_courses:
+                self.fingerprints.update(course_id, fingerprint)
+        self.fingerprints.save()
+        self.snapshot.commit()
+
+    def _record(self, event: SyncEvent) -> SyncEvent:
+        self.summary.record(event)
+        return event
+
+    def _outcome(self, event: SyncEvent) -> SyncEvent:
+        """
+        Record an event reported by a transfer, each of which ends with one
+        """
+        if isinstance(event, Skipped | Downloaded | Failed):
+            self._finished += 1
+        elif isinstance(event, Processed):
+            self._processed += 1
+        return self._record(event)
+
+    def _discovered(self, work: _Work) -> Discovered:
+        self.snapshot.add(work.entry(self.course_names[work.course_id]))
+        return Discovered(**work.fields())
+
+    def _filtered(self, work: _Work) -> Skipped:
+        logger.info("%s filtered out", work.key)
+        return Skipped(**work.fields(), reason=SkipReason.FILTERED)
+
+    def _drain_events(self) -> Generator[SyncEvent, None, None]:
+        while True:
+            try:
+                yield self._outcome(self._events.get_nowait())
+            except Empty:
+                return
+
+    def _discover(self) -> Generator[tuple[SyncEvent, _Work | None], None, None]:
+        for course in self.canvas.get_courses(enrollment_state="active"):
+            name = better_course_name(course.name)
+            if self.courses and course.id not in self.courses:
+                logger.info("Skipping %s as specified", course)
+                self.snapshot.carry_over(course.id)
+                yield CourseSkipped(
+                    course_id=course.id, name=name, reason=SkipReason.NOT_SELECTED
+                ), None
+                continue
+            if not self.filters.course_allowed(name):
+                logger.info("Skipping %s, filtered out", course)
+                self.snapshot.carry_over(course.id)
+                yield CourseSkipped(
+                    course_id=course.id, name=name, reason=SkipReason.FILTERED
+                ), None
+                continue
+            if (
+                self.shard is not None
+                and not self.by_file
+                and not self.shard.owns(course.id)
+            ):
+                logger.info("Skipping %s, it belongs to another shard", course)
+                self.snapshot.carry_over(course.id)
+                yield CourseSkipped(
+                    course_id=course.id, name=name, reason=SkipReason.OTHER_SHARD
+                ), None
+                continue
+            # INFO: A course has few modules, the listing is reused for the walk. The
+            # folder layout only needs them when the Files tab is hidden, and then
+            # they and the pages are all that can tell whether the course changed
+            folders = self.layout is Layout.FOLDERS
+            newest = newest_file_timestamp(course, **self.filters.listing_params())
+            hidden = newest is None
+            modules = list(course.get_modules()) if hidden or not folders else []
+            page = newest_page_timestamp(course) if hidden else None
+            fingerprint = course_fingerprint(course, modules, newest, page)
+            if not self.force and self.fingerprints.unchanged(course.id, fingerprint):
+                logger.info("%s hasn't changed since the last sync, skipping", course)
+                self.snapshot.carry_over(course.id)
+                yield CourseSkipped(
+                    course_id=course.id, name=name, reason=SkipReason.UNCHANGED
+                ), None
+                continue
+            self.synced[course.id] = fingerprint
+            self.course_names[course.id] = name
+            self.snapshot.walk(course.id)
+            yield CourseStarted(course_id=course.id, name=name), None
+            if folders and (grouped := self._folder_files(course)) is not None:
+                yield from self._walk_folders(course, grouped)
+                continue
+            if folders and not hidden:
+                modules = list(course.get_modules())
+                self.synced[course.id] = course_fingerprint(course, modules, newest)
+            yield from self._walk_modules(course, modules)
+
+    def _owns_file(self, file_id: int) -> bool:
+        """
+        Whether a file is ours to sync, always unless files are sharded
+        """
+        return not self.by_file or self.shard is None or self.shard.owns(file_id)
+
+    def _found(
+        self, work: _Work
+    ) -> Generator[tuple[SyncEvent, _Work | None], None, None]:
+        if self.filters.file_allowed(work.file):
+            yield self._discovered(work), work
+            return
+        yield self._discovered(work), None
+        yield self._filtered(work), None
+
+    def _walk_modules(
+        self, course: Course, modules: list[Module]
+    ) -> Generator[tuple[SyncEvent, _Work | None], None, None]:
+        content = CourseContent(course, self.links)
+        tree = self._module_items(course, content)
+        for module in modules:
+            if not self.filters.module_allowed(module.name):
+                logger.info("Skipping module %s, filtered out", module.name)
+                continue
+            yield ModuleStarted(course_id=course.id, name=module.name), None
+            items = tree.get(module.id) if tree is not None else None
+            for item in module.get_module_items() if items is None else items:
+                try:
+                    for work in self._item_work(course, module, item, content):
+                        yield from self._found(work)
+                except Exception as e:
+                    if not is_transient(e):
+                        raise
+                    self.dirty_courses.add(course.id)
+                    self.retry_queue.push(
+                        _Item(
+                            course.id, module.name, item.id, getattr(item, "title", "")
+                        ),
+                        partial(self._retry_item, course, module, item, content),
+                    )
+
+    def _folder_files(self, course: Course) -> dict[tuple[str, ...], list[File]] | None:
+        """
+        Files of a course by folder for the folder layout
+
+        Returns:
+            Files by folder path, None to walk the modules instead
+        """
+        try:
+            return folder_files(course, **self.filters.listing_params())
+        except CanvasException as e:
+            if is_transient(e):
+                raise
+            # INFO: Students often can't see the Files tab, modules still list files
+            logger.warning(
+                "Can't list the folders of %s, walking modules: %s", course, e
+            )
+            return None
+
+    def _walk_folders(
+        self, course: Course, grouped: dict[tuple[str, ...], list[File]]
+    ) -> Generator[tuple[SyncEvent, _Work | None], None, None]:
+        name = self.course_names[course.id]
+        for folder, files in grouped.items():
+            path = "/".join(folder)
+            if folder and not self.filters.module_allowed(path):
+                logger.info("Skipping folder %s, filtered out", path)
+                continue
+            yield ModuleStarted(course_id=course.id, name=path or name), None
+            for file in files:
+                if not self._owns_file(file.id):
+                    continue
+                key = structured_key(file, name, *folder)
+                yield from self._found(_Work(course.id, file, key, module=path))
+
+    def _module_items(
+        self, course: Course, content: CourseContent
+    ) -> dict[int, list[ModuleItem]] | None:
+        """
+        Items of every module at once when walking over GraphQL
+
+        Returns:
+            Module items by module id, None to list them over REST instead
+        """
+        if self.traversal is not Traversal.GRAPHQL:
+            return None
+        try:
+            return module_items(self.canvas, course, content, self.filters)
+        except (CanvasException, requests.RequestException) as e:
+            logger.warning(
+                "Can't walk %s over GraphQL, falling back to REST: %s", course, e
+            )
+            # INFO: Without the endpoint itself no other course will fare better
+            if not isinstance(e, GraphQLError) and not is_transient(e):
+                self.traversal = Traversal.REST
+            return None
+
+    def _item_work(
+        self, course: Course, module: Module, item: ModuleItem, content: CourseContent
+    ) -> Generator[_Work, None, None]:
+        walk = CourseWalk(self.canvas, course, self.url, content, self.filters)
+        for paths, file in module_item_files(walk, module, item):
+            if not self._owns_file(file.id):
+                continue
+            yield _Work(
+                course.id,
+                file,
+                structured_key(file, *paths),
+                module=module.name,
+                item=getattr(item, "title", ""),
+            )
+
+    def _retry_item(
+        self, course: Course, module: Module, item: ModuleItem, content: CourseContent
+    ) -> int:
+        count = 0
+        for work in self._item_work(course, module, item, content):
+            self._events.put(self._discovered(work))
+            if not self.filters.file_allowed(work.file):
+                self._events.put(self._filtered(work))
+                continue
+            count += self._transfer(work, retrying=True)
+        return count
+
+    def _transfer(self, work: _Work, *, retrying: bool = False) -> int:
+        """
+        Move one file into storage, always reporting exactly one outcome unless
+        a retry fails transiently again, which is left to the retry queue
+
+        Returns:
+            If the file was downloaded
+        """
+        try:
+            if self.storage.exists(work.key) and not self.force:
+                logger.info("%s already present, skipping", work.key)
+                self._events.put(Skipped(**work.fields(), reason=SkipReason.EXISTS))
+                return 0
+            started = time.monotonic()
+            if not self.storage.write(work.file, work.key, force=self.force):
+                self._events.put(Skipped(**work.fields(), reason=SkipReason.ELSEWHERE))
+                return 0
+        except Exception as e:
+            if not is_transient(e):
+                logger.warning(
+                    "Tried to download %s but we likely don't have access (%s)",
+                    work.key,
+                    e,
+                )
+                self._events.put(
+                    Failed(**work.fields(), error=str(e), will_retry=False)
+                )
+                return 0
+            if retrying:
+                raise
+            self.dirty_courses.add(work.course_id)
+            self.retry_queue.push(work, partial(self._transfer, work, retrying=True))
+            self._events.put(Failed(**work.fields(), error=str(e), will_retry=True))
+            return 0
+        seconds = time.monotonic() - started
+        if (stage := self.processing) is None:
+            self._events.put(Downloaded(**work.fields(), seconds=seconds))
+            return 1
+        # INFO: Counted before the download is reported so the run can't finish
+        # between the last download and its processing being dispatched
+        with self._lock:
+            self._dispatched += 1
+        self._events.put(Downloaded(**work.fields(), seconds=seconds))
+        self._process(work, stage)
+        return 1
+
+    def _process(self, work: _Work, stage: ProcessingStage) -> None:
+        """
+        Hand a downloaded file to the processing stage, its results come back
+        as a Processed event
+        """
+        # INFO: There's only a processing stage over local storage
+        path = self.storage.path(work.key)  # type: ignore[attr-defined]
+        try:
+            future = stage.submit(path, work.entry(self.course_names[work.course_id]))
+        except Exception as e:
+            self._events.put(self._processing_failed(work, stage, e))
+            return
+
+        def done(future: Future[list[ProcessorResult]]) -> None:
+            try:
+                results = tuple(future.result())
+            except Exception as e:
+                self._events.put(self._processing_failed(work, stage, e))
+                return
+            self._events.put(Processed(**work.fields(), results=results))
+
+        future.add_done_callback(done)
+
+    def _processing_failed(
+        self, work: _Work, stage: ProcessingStage, e: Exception
+    ) -> Processed:
+        logger.warning("Couldn't process %s: %s", work.key, e)
+        results = tuple(
+            ProcessorResult(spec, ok=False, message=str(e)) for spec in stage.specs
+        )
+        return Processed(**work.fields(), results=results)
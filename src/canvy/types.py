@@ -3,21 +3,192 @@ import logging
 from enum import StrEnum
 from pathlib import Path
 
-from pydantic import BaseModel, Field, field_serializer, field_validator
+from pydantic import (
+    BaseModel,
+    Field,
+    field_serializer,
+    field_validator,
+    model_validator,
+)
 
 from canvy.const import (
     API_KEY_DESC,
     API_KEY_REGEX,
+    BACKOFF_DESC,
+    BACKOFF_MAX_DESC,
+    BREAKER_COOLDOWN_DESC,
+    BREAKER_THRESHOLD_DESC,
+    BUCKET_DESC,
+    CANVAS_ALIASES_DESC,
     DEFAULT_DOWNLOAD_DIR,
     EDU_URL_DESC,
+    ENDPOINT_URL_DESC,
+    EXCLUDE_COURSES_DESC,
+    EXCLUDE_EXTENSIONS_DESC,
+    EXCLUDE_MODULES_DESC,
+    EXCLUDE_TYPES_DESC,
+    FILTERS_DESC,
+    HTTP2_DESC,
+    INCLUDE_COURSES_DESC,
+    INCLUDE_EXTENSIONS_DESC,
+    INCLUDE_MODULES_DESC,
+    INCLUDE_TYPES_DESC,
+    LAYOUT_DESC,
+    MAX_SIZE_DESC,
+    MIN_PART_SIZE,
+    MIN_SIZE_DESC,
+    PART_SIZE_DESC,
+    PREFIX_DESC,
+    PROCESSING_DESC,
+    PROCESSING_WORKERS_DESC,
+    PROCESSORS_DESC,
+    RETRIES_DESC,
+    RETRY_DESC,
+    SEGMENT_CONNECTIONS_DESC,
+    SEGMENT_SIZE_DESC,
+    SEGMENT_THRESHOLD_DESC,
+    SEGMENTS_DESC,
     SELECTED_COURSES_DESC,
+    STORAGE_BACKEND_DESC,
+    STORAGE_DESC,
     STORAGE_PATH_DESC,
+    TRAVERSAL_DESC,
+    UPLOAD_CONCURRENCY_DESC,
     URL_REGEX,
 )
 
 logger = logging.getLogger(__name__)
 
 
+class RetryPolicy(BaseModel):
+    retries: int = Field(default=4, ge=0, description=RETRIES_DESC)
+    backoff: float = Field(default=0.5, ge=0, description=BACKOFF_DESC)
+    backoff_max: float = Field(default=30.0, ge=0, description=BACKOFF_MAX_DESC)
+    breaker_threshold: int = Field(default=5, ge=1, description=BREAKER_THRESHOLD_DESC)
+    breaker_cooldown: float = Field(
+        default=30.0, ge=0, description=BREAKER_COOLDOWN_DESC
+    )
+
+
+class StorageBackendKind(StrEnum):
+    LOCAL = "local"
+    S3 = "s3"
+
+
+class Traversal(StrEnum):
+    REST = "rest"
+    GRAPHQL = "graphql"
+
+
+class Layout(StrEnum):
+    MODULES = "modules"
+    FOLDERS = "folders"
+
+
+class StorageConfig(BaseModel):
+    backend: StorageBackendKind = Field(
+        default=StorageBackendKind.LOCAL, description=STORAGE_BACKEND_DESC
+    )
+    bucket: str | None = Field(default=None, description=BUCKET_DESC)
+    prefix: str = Field(default="", description=PREFIX_DESC)
+    endpoint_url: str | None = Field(default=None, description=ENDPOINT_URL_DESC)
+    part_size: int = Field(
+        default=8 * 1024**2, ge=MIN_PART_SIZE, description=PART_SIZE_DESC
+    )
+    concurrency: int = Field(default=4, ge=1, description=UPLOAD_CONCURRENCY_DESC)
+
+    @model_validator(mode="after")
+    def bucket_for_s3(self) -> "StorageConfig":
+        if self.backend is StorageBackendKind.S3 and not self.bucket:
+            e = "The s3 storage backend needs a bucket"
+            raise ValueError(e)
+        return self
+
+
+class SegmentConfig(BaseModel):
+    threshold: int = Field(
+        default=64 * 1024**2, ge=1, description=SEGMENT_THRESHOLD_DESC
+    )
+    size: int = Field(default=8 * 1024**2, ge=1, description=SEGMENT_SIZE_DESC)
+    connections: int = Field(default=4, ge=1, description=SEGMENT_CONNECTIONS_DESC)
+
+
+class ProcessingConfig(BaseModel):
+    processors: list[str] = Field(default=[], description=PROCESSORS_DESC)
+    workers: int = Field(default=2, ge=1, description=PROCESSING_WORKERS_DESC)
+
+    @field_validator("processors")
+    @staticmethod
+    def import_paths(value: list[str]) -> list[str]:
+        for spec in value:
+            module, sep, function = spec.partition(":")
+            if not (sep and module and function.isidentifier()):
+                e = f"Expected a processor like package.module:function, got '{spec}'"
+                raise ValueError(e)
+        return value
+
+
+SIZE_UNITS = {"K": 1024, "M": 1024**2, "G": 1024**3}
+
+
+class FilterConfig(BaseModel):
+    include_types: list[str] = Field(default=[], description=INCLUDE_TYPES_DESC)
+    exclude_types: list[str] = Field(default=[], description=EXCLUDE_TYPES_DESC)
+    include_extensions: list[str] = Field(
+        default=[], description=INCLUDE_EXTENSIONS_DESC
+    )
+    exclude_extensions: list[str] = Field(
+        default=[], description=EXCLUDE_EXTENSIONS_DESC
+    )
+    min_size: int | None = Field(default=None, ge=0, description=MIN_SIZE_DESC)
+    max_size: int | None = Field(default=None, ge=0, description=MAX_SIZE_DESC)
+    include_courses: list[str] = Field(default=[], description=INCLUDE_COURSES_DESC)
+    exclude_courses: list[str] = Field(default=[], description=EXCLUDE_COURSES_DESC)
+    include_modules: list[str] = Field(default=[], description=INCLUDE_MODULES_DESC)
+    exclude_modules: list[str] = Field(default=[], description=EXCLUDE_MODULES_DESC)
+
+    @field_validator("include_extensions", "exclude_extensions")
+    @staticmethod
+    def normalise_extensions(value: list[str]) -> list[str]:
+        return [ext.lower().removeprefix(".") for ext in value]
+
+    @field_validator("include_types", "exclude_types")
+    @staticmethod
+    def normalise_types(value: list[str]) -> list[str]:
+        return [type.lower() for type in value]
+
+    @field_validator("min_size", "max_size", mode="before")
+    @staticmethod
+    def parse_size(value: int | str | None) -> int | None:
+        """
+        Accept sizes like 500K or 1.5G as well as plain byte counts
+        """
+        if not isinstance(value, str):
+            return value
+        number = value.strip().upper().removesuffix("B")
+        unit = SIZE_UNITS.get(number[-1:], 1)
+        if unit > 1:
+            number = number[:-1]
+        try:
+            return int(float(number) * unit)
+        except ValueError:
+            e = f"Expected a size like 200M, got '{value}'"
+            raise ValueError(e) from None
+
+    def merge(self, other: "FilterConfig") -> "FilterConfig":
+        """
+        Combine with another set of filters, such as those given on the command line,
+        lists add up and the other's size limits win
+        """
+        merged = self.model_dump()
+        for name, value in other.model_dump().items():
+            if isinstance(value, list):
+                merged[name] = [*merged[name], *value]
+            elif value is not None:
+                merged[name] = value
+        return FilterConfig(**merged)
+
+
 class CanvyConfig(BaseModel):
     canvas_key: str = Field(description=API_KEY_DESC, pattern=API_KEY_REGEX)
     canvas_url: str = Field(description=EDU_URL_DESC, pattern=URL_REGEX)
@@ -25,6 +196,20 @@ class CanvyConfig(BaseModel):
         default=DEFAULT_DOWNLOAD_DIR, description=STORAGE_PATH_DESC
     )
     selected_courses: list[int] = Field(default=[], description=SELECTED_COURSES_DESC)
+    # INFO: Optional sections stay None so they're left out of the config file
+    http2: bool | None = Field(default=None, description=HTTP2_DESC)
+    canvas_aliases: list[str] | None = Field(
+        default=None, description=CANVAS_ALIASES_DESC
+    )
+    retry: RetryPolicy | None = Field(default=None, description=RETRY_DESC)
+    storage: StorageConfig | None = Field(default=None, description=STORAGE_DESC)
+    filters: FilterConfig | None = Field(default=None, description=FILTERS_DESC)
+    segments: SegmentConfig | None = Field(default=None, description=SEGMENTS_DESC)
+    processing: ProcessingConfig | None = Field(
+        default=None, description=PROCESSING_DESC
+    )
+    traversal: Traversal | None = Field(default=None, description=TRAVERSAL_DESC)
+    layout: Layout | None = Field(default=None, description=LAYOUT_DESC)
 
     @field_validator("canvas_url")
     @staticmethod
@@ -48,7 +233,7 @@ class CanvyConfig(BaseModel):
             logger.error(e)
             raise e
         except Exception as e:
-            logger.error(f"Unknown path resolution error: '{e}'")
+            logger.error("Unknown path resolution error: '%s'", e)
             raise e
         return value
 
@@ -60,6 +245,53 @@ class CanvyConfig(BaseModel):
         return str(value)
 
 
+class ShardBy(StrEnum):
+    COURSE = "course"
+    FILE = "file"
+
+
+class Shard(BaseModel):
+    """
+    One of count deterministic slices of a sync, index starts from 1
+    """
+
+    index: int = Field(ge=1)
+    count: int = Field(ge=1)
+
+    @model_validator(mode="after")
+    def index_in_range(self) -> "Shard":
+        if self.index > self.count:
+            e = f"Shard {self.index} doesn't exist out of {self.count}"
+            raise ValueError(e)
+        return self
+
+    @staticmethod
+    def parse(value: str) -> "Shard":
+        """
+        Read the i/n notation used on the command line
+        """
+        index, sep, count = value.partition("/")
+        if not sep or not index.strip().isdigit() or not count.strip().isdigit():
+            e = f"Expected a shard like 1/4, got '{value}'"
+            raise ValueError(e)
+        return Shard(index=int(index), count=int(count))
+
+    def owns(self, key: int) -> bool:
+        return key % self.count == self.index - 1
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+
+class SkipReason(StrEnum):
+    EXISTS = "already downloaded"
+    ELSEWHERE = "being downloaded elsewhere"
+    UNCHANGED = "unchanged since the last sync"
+    NOT_SELECTED = "not selected"
+    OTHER_SHARD = "belongs to another shard"
+    FILTERED = "filtered out"
+
+
 class CLIClearFile(StrEnum):
     LOGS = "logs"
     CONFIG = "config"
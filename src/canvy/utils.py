@@ -1,13 +1,19 @@
 from __future__ import annotations
 
+import atexit
+import errno
 import logging.config
 import os
-import platform
 import re
 import subprocess
-from collections.abc import Iterable
+import sys
+from collections.abc import Generator, Iterable
+from contextlib import contextmanager, suppress
 from functools import reduce
-from pathlib import Path
+from logging.handlers import QueueHandler, QueueListener
+from multiprocessing.queues import Queue
+from pathlib import Path, PurePosixPath
+from typing import TYPE_CHECKING
 
 import toml
 from canvasapi.file import File
@@ -17,20 +23,52 @@ from canvy.const import (
     LOG_FN,
     LOGGING_CONFIG,
 )
+from canvy.retry import is_transient
 from canvy.types import CanvyConfig
 
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+if TYPE_CHECKING:
+    from canvy.storage import StorageBackend
+
 logger = logging.getLogger(__name__)
 
 
+# INFO: Listeners setup_logging has started, so none of them is started twice
+_started_listeners: set[QueueListener] = set()
+
+
 def setup_logging() -> None:
     """
     Setup logging using logging config defined in const.py because it's
-    quite good
+    quite good, then start the thread that writes queued records out
     """
     create_dir(LOG_FN.parent)
     canvas_logger = logging.getLogger("canvasapi")
     canvas_logger.setLevel(logging.WARNING)
-    return logging.config.dictConfig(LOGGING_CONFIG)
+    logging.config.dictConfig(LOGGING_CONFIG)
+    handler = logging.getHandlerByName("queue")
+    if not isinstance(handler, QueueHandler) or handler.listener is None:
+        return
+    if (listener := handler.listener) not in _started_listeners:
+        listener.start()
+        _started_listeners.add(listener)
+        atexit.register(listener.stop)
+
+
+def forward_logging(queue: Queue[logging.LogRecord]) -> None:
+    """
+    Hand every record of a worker process to the queue its parent writes the log
+    from, so only one process ever rotates the log file
+    """
+    canvas_logger = logging.getLogger("canvasapi")
+    canvas_logger.setLevel(logging.WARNING)
+    root = logging.getLogger()
+    root.setLevel(logging.DEBUG)
+    root.addHandler(QueueHandler(queue))
 
 
 def better_course_name(name: str) -> str:
@@ -41,7 +79,7 @@ def better_course_name(name: str) -> str:
 
 
 def create_dir(directory: Path) -> None:
-    logger.debug(f"Creating directory {directory} if not existing")
+    logger.debug("Creating directory %s if not existing", directory)
     os.makedirs(directory, exist_ok=True)
 
 
@@ -50,14 +88,14 @@ def has_config(path: Path | None = None) -> bool:
         get_config(path)
         return True
     except Exception as e:
-        logger.info(f"Config test fail: {e}")
+        logger.info("Config test fail: %s", e)
         return False
 
 
 def get_config(path: Path | None = None) -> CanvyConfig:
     path = path or CONFIG_PATH
     with open(path) as fp:
-        logger.debug(f"Retrieving config from {path}")
+        logger.debug("Retrieving config from %s", path)
         config = CanvyConfig(**toml.load(fp))  # pyright: ignore[reportAny]
     return config
 
@@ -66,7 +104,7 @@ def set_config(config: CanvyConfig, dest: Path = CONFIG_PATH) -> None:
     dest = dest if dest else CONFIG_PATH
     with open(dest, "w") as fp:
         logger.debug("Writing config")
-        toml.dump(config.model_dump(), fp)
+        toml.dump(config.model_dump(mode="json"), fp)
 
 
 def delete_config(path: Path = CONFIG_PATH):
@@ -74,7 +112,11 @@ def delete_config(path: Path = CONFIG_PATH):
 
 
 def download_structured(
-    file: File, *dirs: str, storage_dir: Path | None = None, force: bool = False
+    file: File,
+    *dirs: str,
+    storage_dir: Path | None = None,
+    force: bool = False,
+    storage: StorageBackend | None = None,
 ) -> bool:
     """
     Download a canvasapi File and preserve course structure using directory names
@@ -82,31 +124,125 @@ def download_structured(
     Args:
         file: File object given by Canvas, can raise various exceptions
         dirs: Series of directory names to make and download file into
+        storage_dir: Root of local storage, when no storage backend is given
         force: Overwrite any previously existing files
+        storage: Where to put the file, local storage under storage_dir by default
 
     Returns:
         If the file was downloaded
+
+    Raises:
+        Errors worth retrying later (see retry.is_transient), others are logged
     """
-    download_dir = Path(storage_dir or get_config().storage_path).expanduser()
+    # INFO: Storage writes through claim_file, so it can only be imported here
+    from canvy.storage import LocalStorage  # noqa: PLC0415
+
+    if storage is None:
+        download_dir = Path(storage_dir or get_config().storage_path).expanduser()
+        storage = LocalStorage(download_dir)
     file_name = file.filename  # pyright: ignore[reportAny]
-    combined_dirs = (*dirs, file_name)
-    combined_dirs = (d.replace("/", "_") for d in combined_dirs)
-    file_path: Path = concat_names(download_dir, combined_dirs)
-    create_dir(file_path.parent)
-    if not file_path.is_file() or force:
-        logger.info(f"Downloading {file_name}{'(forced)' * force} into {file_path}")
-        try:
-            file.download(file_path)  # pyright: ignore[reportUnknownMemberType]
-            return True
-        except Exception as e:
-            logger.warning(
-                f"Tried to download {file_name} but we likely don't have access ({e})"
-            )
-            return False
-    else:
-        logger.info(f"{file_name} already present, skipping")
+    key = structured_key(file, *dirs)
+    if storage.exists(key) and not force:
+        logger.info("%s already present, skipping", file_name)
+        return False
+    try:
+        return storage.write(file, key, force=force)
+    except Exception as e:
+        if is_transient(e):
+            raise
+        logger.warning(
+            "Tried to download %s but we likely don't have access (%s)", file_name, e
+        )
         return False
 
 
+def structured_key(file: File, *dirs: str) -> PurePosixPath:
+    """
+    Where a file goes relative to the storage root, slashes in names can't nest
+    """
+    combined_dirs = (*dirs, file.filename)  # pyright: ignore[reportAny]
+    return PurePosixPath(*(d.replace("/", "_") for d in combined_dirs))
+
+
 def concat_names(base: Path, names: Iterable[str | Path]) -> Path:
     return reduce(lambda p, q: p / q, [base, *map(Path, names)])
+
+
+def _lock_fd(fd: int) -> None:
+    """
+    Take an exclusive lock on an open file, waiting for whoever holds it
+    """
+    if sys.platform == "win32":
+        os.lseek(fd, 0, os.SEEK_SET)
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                return
+            except OSError as e:
+                # INFO: LK_LOCK gives up after ten tries a second apart
+                if e.errno != errno.EDEADLOCK:
+                    raise
+    fcntl.flock(fd, fcntl.LOCK_EX)
+
+
+def _try_lock_fd(fd: int) -> bool:
+    """
+    Take an exclusive lock on an open file without waiting
+
+    Returns:
+        If the lock was taken, otherwise someone else holds it
+    """
+    try:
+        if sys.platform == "win32":
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+def _same_file(fd: int, path: Path) -> bool:
+    try:
+        return os.path.samestat(os.fstat(fd), path.stat())
+    except FileNotFoundError:
+        return False
+
+
+@contextmanager
+def locked(path: Path) -> Generator[None, None, None]:
+    """
+    Hold an exclusive lock on a lock file, waiting for other processes to let go
+    """
+    create_dir(path.parent)
+    with open(path, "a") as fp:
+        _lock_fd(fp.fileno())
+        yield
+
+
+@contextmanager
+def claim_file(path: Path) -> Generator[bool, None, None]:
+    """
+    Try to take an exclusive lock on a file without waiting, removing it afterwards
+
+    Returns:
+        If the lock was taken, otherwise someone else holds it
+    """
+    with open(path, "ab") as fp:
+        # INFO: Whoever held it may have removed it between our open and lock
+        if not (_try_lock_fd(fp.fileno()) and _same_file(fp.fileno(), path)):
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            # INFO: Removed while still locked so nobody can lock the old file after
+            # us. Windows won't delete open files, there it goes once closed unless
+            # someone else opened it meanwhile
+            if sys.platform == "win32":
+                fp.close()
+                with suppress(OSError):
+                    path.unlink(missing_ok=True)
+            else:
+                path.unlink(missing_ok=True)
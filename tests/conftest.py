@@ -1,11 +1,26 @@
+from collections.abc import Generator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
+from threading import Thread
 
-from canvy.types import CanvyConfig
+import pytest
+from canvasapi.assignment import Assignment
+from canvasapi.canvas import Canvas, Course
+from canvasapi.discussion_topic import DiscussionTopic
+from canvasapi.file import File
+from canvasapi.module import Module, ModuleItem
+from canvasapi.page import Page
+from canvasapi.requester import Requester
+
+from canvy.const import MIN_PART_SIZE
+from canvy.types import CanvyConfig, ModuleItemType
 
 CANVAS_TEST_KEY = (
     "1000~aaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaa"
 )
 CANVAS_TEST_URL = "https://university.canvas.com"
+# INFO: Spans a few multipart upload parts
+SERVED_BODY = bytes(range(256)) * (MIN_PART_SIZE // 256 * 2 + 7)
 
 
 def vanilla_config(path: Path) -> CanvyConfig:
@@ -22,3 +37,144 @@ def vanilla_config(path: Path) -> CanvyConfig:
         canvas_url=CANVAS_TEST_URL,
         storage_path=path,
     )
+
+
+@pytest.fixture
+def canvas(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Canvas:
+    config = vanilla_config(tmp_path)
+    file_id = 98173
+
+    def gen_module_items() -> Generator[ModuleItem, None, None]:
+        module_item_1 = ModuleItem(
+            None,
+            {"id": 1, "type": str(ModuleItemType.ATTACHMENT), "content_id": file_id},
+        )
+        module_item_2 = ModuleItem(
+            None,
+            {"id": 2, "type": str(ModuleItemType.PAGE), "page_url": "page-empty"},
+        )
+        module_item_3 = ModuleItem(
+            None,
+            {"id": 3, "type": str(ModuleItemType.PAGE), "page_url": "page-files"},
+        )
+        module_item_4 = ModuleItem(
+            None,
+            {"id": 4, "type": str(ModuleItemType.PAGE), "page_url": "page-none"},
+        )
+        module_item_5 = ModuleItem(
+            None,
+            {"id": 5, "type": str(ModuleItemType.QUIZ)},
+        )
+        module_item_6 = ModuleItem(
+            None,
+            {"id": 6, "type": str(ModuleItemType.ASSIGNMENT), "content_id": 7},
+        )
+        module_item_7 = ModuleItem(
+            None,
+            {"id": 7, "type": str(ModuleItemType.DISCUSSION), "content_id": 8},
+        )
+        yield module_item_1
+        yield module_item_2
+        yield module_item_3
+        yield module_item_4
+        yield module_item_5
+        yield module_item_6
+        yield module_item_7
+
+    def gen_modules() -> Generator[Module, None, None]:
+        module_1 = Module(None, {"id": 12, "name": "Cool 1"})
+        monkeypatch.setattr(module_1, "get_module_items", gen_module_items)
+        yield module_1
+
+    def gen_courses(*_, **_a) -> Generator[Course, None, None]:
+        course_1 = Course(
+            None, {"id": 1, "course_code": "TEST", "name": "Chill course about testing"}
+        )
+        monkeypatch.setattr(course_1, "get_modules", gen_modules)
+        yield course_1
+
+    def fake_file_retrieval(_, id: int) -> File:
+        file_1 = File(
+            None, {"id": file_id, "filename": "slides.pdf", "display_name": "slides"}
+        )
+
+        def mock_download(fn: Path):
+            fn.touch()
+
+        monkeypatch.setattr(file_1, "download", mock_download)
+        return file_1
+
+    def fake_page_retrieval(_, url: str) -> Page:
+        url_bodies = {
+            "page-empty": "hello",
+            "page-files": f"{CANVAS_TEST_URL}/api/v1/courses/1/files/1",
+            "page-none": None,
+        }
+        page_1 = Page(
+            None,
+            {
+                "id": 1,
+                "title": "Example page 1",
+                "page_id": url,
+                "url": url,
+                "body": url_bodies[url],
+            },
+        )
+        return page_1
+
+    monkeypatch.setattr(Course, "get_page", fake_page_retrieval)
+    edited = Page(None, {"url": "page-files", "updated_at": "2025-01-01T00:00:00Z"})
+    monkeypatch.setattr(Course, "get_pages", lambda *_, **_a: iter([edited]))
+    monkeypatch.setattr(Course, "get_files", lambda *_, **_a: iter([]))
+    assignment = Assignment(
+        None,
+        {
+            "id": 7,
+            "name": "Sheet 1",
+            "description": f'<a href="{CANVAS_TEST_URL}/courses/1/files/2">q</a>',
+        },
+    )
+    topic = DiscussionTopic(
+        None,
+        {
+            "id": 8,
+            "title": "Solutions",
+            "message": None,
+            "attachments": [{"id": 9, "filename": "answers.pdf"}],
+        },
+    )
+    monkeypatch.setattr(Course, "get_assignments", lambda *_, **_a: [assignment])
+    monkeypatch.setattr(Course, "get_discussion_topics", lambda *_, **_a: [topic])
+    monkeypatch.setattr(Course, "get_quizzes", lambda *_, **_a: [])
+    monkeypatch.setattr(File, "download", lambda _, fn: fn.touch())
+    monkeypatch.setattr(Canvas, "get_courses", gen_courses)
+    monkeypatch.setattr(Canvas, "get_file", fake_file_retrieval)
+    return Canvas(config.canvas_url, config.canvas_key)
+
+
+class BodyHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(SERVED_BODY)))
+        self.end_headers()
+        self.wfile.write(SERVED_BODY)
+
+    def log_message(self, *_):
+        pass
+
+
+def serve_file(handler: type[BaseHTTPRequestHandler]) -> Generator[File, None, None]:
+    """
+    File whose download is answered by handler on a local server
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    requester = Requester(base_url, CANVAS_TEST_KEY)
+    yield File(requester, {"id": 1, "filename": "rec.mp4", "url": f"{base_url}/f/1"})
+    server.shutdown()
+
+
+@pytest.fixture
+def served_file() -> Generator[File, None, None]:
+    yield from serve_file(BodyHandler)
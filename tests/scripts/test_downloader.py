@@ -1,97 +1,80 @@
-from collections.abc import Generator
 from pathlib import Path
 
 import pytest
+import requests
 from canvasapi.canvas import Canvas, Course
-from canvasapi.file import File
-from canvasapi.module import Module, ModuleItem
-from canvasapi.page import Page
+from rich import progress
 
+from canvy.const import PS_DIRNAME
 from canvy.scripts.downloader import download
-from canvy.types import ModuleItemType
-from tests.conftest import CANVAS_TEST_URL, vanilla_config
-
-
-@pytest.fixture
-def canvas(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Canvas:
-    config = vanilla_config(tmp_path)
-    file_id = 98173
-
-    def gen_module_items() -> Generator[ModuleItem, None, None]:
-        module_item_1 = ModuleItem(
-            None,
-            {"id": 1, "type": str(ModuleItemType.ATTACHMENT), "content_id": file_id},
-        )
-        module_item_2 = ModuleItem(
-            None,
-            {"id": 2, "type": str(ModuleItemType.PAGE), "page_url": "page-empty"},
-        )
-        module_item_3 = ModuleItem(
-            None,
-            {"id": 3, "type": str(ModuleItemType.PAGE), "page_url": "page-files"},
-        )
-        module_item_4 = ModuleItem(
-            None,
-            {"id": 4, "type": str(ModuleItemType.PAGE), "page_url": "page-none"},
-        )
-        module_item_5 = ModuleItem(
-            None,
-            {"id": 5, "type": str(ModuleItemType.QUIZ)},
-        )
-        yield module_item_1
-        yield module_item_2
-        yield module_item_3
-        yield module_item_4
-        yield module_item_5
-
-    def gen_modules() -> Generator[Module, None, None]:
-        module_1 = Module(None, {"id": 12, "name": "Cool 1"})
-        monkeypatch.setattr(module_1, "get_module_items", gen_module_items)
-        yield module_1
-
-    def gen_courses(*_, **_a) -> Generator[Course, None, None]:
-        course_1 = Course(
-            None, {"id": 1, "course_code": "TEST", "name": "Chill course about testing"}
-        )
-        monkeypatch.setattr(course_1, "get_modules", gen_modules)
-        yield course_1
-
-    def fake_file_retrieval(_, id: int) -> File:
-        file_1 = File(
-            None, {"id": file_id, "filename": "slides.pdf", "display_name": "slides"}
-        )
-
-        def mock_download(fn: Path):
-            fn.touch()
-
-        monkeypatch.setattr(file_1, "download", mock_download)
-        return file_1
-
-    def fake_page_retrieval(_, url: str) -> Page:
-        url_bodies = {
-            "page-empty": "hello",
-            "page-files": f"{CANVAS_TEST_URL}/api/v1/courses/1/files/1",
-            "page-none": None,
-        }
-        page_1 = Page(
-            None,
-            {
-                "id": 1,
-                "title": "Example page 1",
-                "page_id": url,
-                "url": url,
-                "body": url_bodies[url],
-            },
-        )
-        return page_1
-
-    monkeypatch.setattr(Course, "get_page", fake_page_retrieval)
-    monkeypatch.setattr(Canvas, "get_courses", gen_courses)
-    monkeypatch.setattr(Canvas, "get_file", fake_file_retrieval)
-    return Canvas(config.canvas_url, config.canvas_key)
+from canvy.storage import LocalStorage
+from canvy.types import Shard, ShardBy
+from tests.conftest import CANVAS_TEST_URL
 
 
 def test_extract_files_from_page(tmp_path: Path, canvas: Canvas):
     download(canvas, storage_dir=tmp_path, url=CANVAS_TEST_URL)
     fn_path = tmp_path / "Chill course about testing" / "Cool 1" / "slides.pdf"
     assert fn_path.exists() and fn_path.is_file()
+
+
+def test_download_retries_transient(
+    tmp_path: Path, canvas: Canvas, monkeypatch: pytest.MonkeyPatch
+):
+    real_write = LocalStorage.write
+    failures = [requests.ConnectionError("reset")]
+
+    def flaky_write(*args, **kwargs) -> bool:
+        if failures:
+            raise failures.pop()
+        return real_write(*args, **kwargs)
+
+    monkeypatch.setattr(LocalStorage, "write", flaky_write)
+    assert download(canvas, storage_dir=tmp_path, url=CANVAS_TEST_URL) >= 1
+    fn_path = tmp_path / "Chill course about testing" / "Cool 1" / "slides.pdf"
+    assert fn_path.exists() and not failures
+
+
+def test_download_skips_unchanged_courses(
+    tmp_path: Path, canvas: Canvas, monkeypatch: pytest.MonkeyPatch
+):
+    download(canvas, storage_dir=tmp_path, url=CANVAS_TEST_URL)
+    walked: list[int] = []
+    monkeypatch.setattr(Course, "get_page", lambda _, url: walked.append(url))
+    assert download(canvas, storage_dir=tmp_path, url=CANVAS_TEST_URL) == 0
+    assert not walked
+    assert download(canvas, storage_dir=tmp_path, url=CANVAS_TEST_URL, force=True) > 0
+    assert walked
+
+
+def test_download_sharded_by_file(tmp_path: Path, canvas: Canvas):
+    fn_path = tmp_path / "Chill course about testing" / "Cool 1" / "slides.pdf"
+    shard = Shard(index=1, count=2)
+    download(canvas, tmp_path, url=CANVAS_TEST_URL, shard=shard, shard_by=ShardBy.FILE)
+    assert not fn_path.exists()
+    shard = Shard(index=2, count=2)
+    download(canvas, tmp_path, url=CANVAS_TEST_URL, shard=shard, shard_by=ShardBy.FILE)
+    assert fn_path.exists()
+
+
+def test_download_assignments_and_discussions(tmp_path: Path, canvas: Canvas):
+    download(canvas, storage_dir=tmp_path, url=CANVAS_TEST_URL)
+    module_dir = tmp_path / "Chill course about testing" / "Cool 1"
+    assert (module_dir / PS_DIRNAME / "Sheet 1" / "slides.pdf").is_file()
+    assert (module_dir / "Solutions" / "answers.pdf").is_file()
+
+
+def test_download_counts_walked_courses(
+    tmp_path: Path, canvas: Canvas, monkeypatch: pytest.MonkeyPatch
+):
+    bars: list[progress.Progress] = []
+
+    class RecordedProgress(progress.Progress):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            bars.append(self)
+
+    monkeypatch.setattr(progress, "Progress", RecordedProgress)
+    download(canvas, storage_dir=tmp_path, url=CANVAS_TEST_URL, show_progress=False)
+    course = next(task for task in bars[0].tasks if task.description.startswith("C"))
+    assert course.completed == len(list(canvas.get_courses()))
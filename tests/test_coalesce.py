@@ -0,0 +1,91 @@
+import time
+from collections.abc import Generator
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import Thread
+from typing import ClassVar
+
+import pytest
+import requests
+
+from canvy.client import build_canvas, coalescer_of
+from canvy.coalesce import CoalescingAdapter
+from tests.conftest import vanilla_config
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    hits: ClassVar[list[str]] = []
+
+    def do_GET(self):
+        self.hits.append(self.path)
+        time.sleep(0.1)
+        body = b'{"id": 1}'
+        self.send_response(200)
+        kind = "text/plain" if self.path.startswith("/files") else "application/json"
+        self.send_header("Content-Type", kind)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.hits.append(self.path)
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *_):
+        pass
+
+
+@pytest.fixture
+def slow_url() -> Generator[str, None, None]:
+    SlowHandler.hits = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def session_with(adapter: CoalescingAdapter) -> requests.Session:
+    session = requests.Session()
+    session.mount("http://", adapter)
+    return session
+
+
+def test_coalesce_in_flight(slow_url: str):
+    adapter = CoalescingAdapter()
+    session = session_with(adapter)
+    url = f"{slow_url}/api/v1/courses/1"
+    with ThreadPoolExecutor(8) as pool:
+        responses = list(pool.map(lambda _: session.get(url), range(8)))
+    assert SlowHandler.hits == ["/api/v1/courses/1"]
+    assert all(response.json() == {"id": 1} for response in responses)
+    assert len({id(response) for response in responses}) == len(responses)
+    assert (adapter.hits, adapter.misses) == (7, 1)
+
+
+def test_coalesce_cache(slow_url: str):
+    adapter = CoalescingAdapter(ttl=60)
+    session = session_with(adapter)
+    course, file = "/api/v1/courses/1", "/files/1"
+    session.get(f"{slow_url}{course}")
+    session.get(f"{slow_url}{course}")
+    assert SlowHandler.hits == [course]
+    # INFO: Different auth is a different request
+    session.get(f"{slow_url}{course}", headers={"Authorization": "Bearer other"})
+    assert SlowHandler.hits == [course, course]
+    # INFO: Streams, file bodies and anything after a write always go out
+    session.get(f"{slow_url}{course}", stream=True).close()
+    session.get(f"{slow_url}{file}")
+    session.get(f"{slow_url}{file}")
+    session.post(f"{slow_url}{course}")
+    session.get(f"{slow_url}{course}")
+    assert SlowHandler.hits[2:] == [course, file, file, course, course]
+    adapter.clock = lambda: time.monotonic() + 61
+    session.get(f"{slow_url}{course}")
+    assert SlowHandler.hits[7:] == [course]
+
+
+def test_coalescer_of(tmp_path: Path):
+    config = vanilla_config(tmp_path)
+    assert isinstance(coalescer_of(build_canvas(config)), CoalescingAdapter)
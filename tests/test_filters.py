@@ -0,0 +1,81 @@
+import pytest
+from canvasapi.file import File
+from pydantic import ValidationError
+
+from canvy.filters import FileFilter
+from canvy.types import FilterConfig
+
+
+def file(filename: str, size: int | None = 100, type: str | None = None) -> File:
+    attributes: dict[str, object] = {"id": 1, "filename": filename, "size": size}
+    if type is not None:
+        attributes["content-type"] = type
+    return File(None, attributes)
+
+
+def test_filter_empty():
+    filters = FileFilter()
+    assert not filters
+    assert filters.file_allowed(file("lecture.mp4"))
+    assert filters.listing_params() == {}
+
+
+def test_filter_extensions():
+    filters = FileFilter(FilterConfig(include_extensions=[".PDF", "pptx"]))
+    assert filters.file_allowed(file("notes.pdf"))
+    assert not filters.file_allowed(file("lecture.mp4"))
+    assert not filters.name_allowed("lecture.mp4")
+    # INFO: Titles without a real extension can't be judged until the file is fetched
+    assert filters.name_allowed("Week 1 recording")
+    assert filters.name_allowed("Notes v1.2")
+
+
+def test_filter_types():
+    filters = FileFilter(FilterConfig(exclude_types=["video/*"]))
+    assert not filters.file_allowed(file("lecture", type="video/mp4"))
+    assert not filters.file_allowed(file("lecture.mp4"))
+    assert filters.file_allowed(file("notes.pdf", type="application/pdf"))
+    assert not filters.name_allowed("lecture.mp4")
+
+
+def test_filter_sizes():
+    config = FilterConfig(
+        min_size="1K", max_size="1.5M"
+    )  # pyright: ignore[reportArgumentType]
+    filters = FileFilter(config)
+    assert filters.config.max_size == int(1.5 * 1024**2)
+    assert not filters.file_allowed(file("tiny.txt", size=10))
+    assert filters.file_allowed(file("fine.txt", size=4096))
+    assert not filters.file_allowed(file("huge.txt", size=2 * 1024**2))
+    assert filters.file_allowed(file("unknown.txt", size=None))
+    with pytest.raises(ValidationError):
+        FilterConfig(max_size="lots")  # pyright: ignore[reportArgumentType]
+
+
+def test_filter_globs():
+    filters = FileFilter(
+        FilterConfig(include_courses=["MATH*"], exclude_modules=["*Recordings*"])
+    )
+    assert filters.course_allowed("MATH101 Calculus")
+    assert not filters.course_allowed("PHYS101")
+    assert not filters.module_allowed("Lecture Recordings")
+    assert filters.module_allowed("Week 1")
+
+
+def test_filter_listing_params():
+    filters = FileFilter(
+        FilterConfig(
+            include_types=["application/pdf", "image/*"], exclude_types=["*/x-*"]
+        )
+    )
+    assert filters.listing_params() == {"content_types": ["application/pdf", "image"]}
+    partial = FileFilter(FilterConfig(include_types=["application/*pdf"]))
+    assert partial.listing_params() == {}
+
+
+def test_filter_merge():
+    config = FilterConfig(exclude_extensions=["mp4"], max_size=10)
+    merged = config.merge(FilterConfig(exclude_extensions=["mov"], min_size=1))
+    assert merged.exclude_extensions == ["mp4", "mov"]
+    assert (merged.min_size, merged.max_size) == (1, 10)
+    assert FileFilter(merged).digest() != FileFilter(config).digest()
@@ -0,0 +1,81 @@
+from pathlib import Path
+
+import pytest
+from canvasapi.course import Course
+from canvasapi.exceptions import Forbidden
+from canvasapi.file import File
+from canvasapi.module import Module
+from canvasapi.page import Page
+
+from canvy.fingerprint import (
+    FingerprintStore,
+    course_fingerprint,
+    newest_file_timestamp,
+    newest_page_timestamp,
+)
+
+
+@pytest.fixture
+def course(monkeypatch: pytest.MonkeyPatch) -> Course:
+    course = Course(None, {"id": 1, "name": "Testing"})
+    newest = File(None, {"id": 2, "updated_at": "2025-01-01T00:00:00Z"})
+    monkeypatch.setattr(course, "get_files", lambda **_: iter([newest]))
+    return course
+
+
+def modules(items_count: int) -> list[Module]:
+    return [Module(None, {"id": 3, "name": "Week 1", "items_count": items_count})]
+
+
+def test_course_fingerprint_stable(course: Course):
+    newest = newest_file_timestamp(course)
+    assert course_fingerprint(course, modules(2), newest) == course_fingerprint(
+        course, modules(2), newest
+    )
+    assert course_fingerprint(course, modules(2), newest) != course_fingerprint(
+        course, modules(3), newest
+    )
+
+
+def test_course_fingerprint_tracks_files(
+    course: Course, monkeypatch: pytest.MonkeyPatch
+):
+    before = course_fingerprint(course, modules(2), newest_file_timestamp(course))
+    newer = File(None, {"id": 4, "updated_at": "2025-02-01T00:00:00Z"})
+    monkeypatch.setattr(course, "get_files", lambda **_: iter([newer]))
+    after = course_fingerprint(course, modules(2), newest_file_timestamp(course))
+    assert after != before
+
+
+def test_newest_file_hidden(course: Course, monkeypatch: pytest.MonkeyPatch):
+    def forbidden(**_):
+        e = "Files tab disabled"
+        raise Forbidden(e)
+
+    monkeypatch.setattr(course, "get_files", forbidden)
+    assert newest_file_timestamp(course) is None
+    assert course_fingerprint(course, modules(2), None)
+
+
+def test_course_fingerprint_tracks_pages(
+    course: Course, monkeypatch: pytest.MonkeyPatch
+):
+    def pages(updated_at: str) -> str:
+        page = Page(None, {"url": "notes", "updated_at": updated_at})
+        monkeypatch.setattr(course, "get_pages", lambda **_: iter([page]))
+        return course_fingerprint(
+            course, modules(2), None, newest_page_timestamp(course)
+        )
+
+    assert pages("2025-01-01T00:00:00Z") != pages("2025-02-01T00:00:00Z")
+
+
+def test_fingerprint_store(tmp_path: Path):
+    store = FingerprintStore(tmp_path)
+    assert not store.unchanged(1, "abc")
+    store.update(1, "abc")
+    store.save()
+    reloaded = FingerprintStore(tmp_path)
+    assert reloaded.unchanged(1, "abc") and not reloaded.unchanged(1, "def")
+    store.path.write_text("{not json")
+    assert not FingerprintStore(tmp_path).unchanged(1, "abc")
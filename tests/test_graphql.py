@@ -0,0 +1,148 @@
+import json
+from collections.abc import Generator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import Thread
+from typing import Any, ClassVar
+
+import pytest
+from canvasapi.canvas import Canvas
+from canvasapi.course import Course
+
+from canvy.discovery import CourseContent
+from canvy.graphql import GraphQLError, module_items
+from canvy.links import LinkResolver
+from canvy.storage import LocalStorage
+from canvy.sync import Discovered, Syncer
+from canvy.types import ModuleItemType, Traversal
+from tests.conftest import CANVAS_TEST_KEY, CANVAS_TEST_URL, vanilla_config
+
+# INFO: Canvas warns about the plain HTTP stand-in
+pytestmark = pytest.mark.filterwarnings("ignore:Canvas may respond unexpectedly")
+
+
+def item(id: int, typename: str, **content: Any) -> dict[str, Any]:
+    return {"_id": str(id), "content": {"__typename": typename, **content}}
+
+
+# INFO: The same module as the canvas fixture walks over REST
+PAGE = "Example page 1"
+LINKED = f"{CANVAS_TEST_URL}/api/v1/courses/1/files/1"
+MODULES = [
+    {
+        "_id": "12",
+        "moduleItems": [
+            item(1, "File", _id="98173", displayName="slides"),
+            item(2, "Page", _id="1", title=PAGE, body="hello"),
+            item(3, "Page", _id="2", title=PAGE, body=LINKED),
+            item(4, "Page", _id="3", title=PAGE, body=None),
+            item(5, "Quiz", _id="5", title="Quiz"),
+            item(6, "Assignment", _id="7", name="Sheet 1"),
+            item(7, "Discussion", _id="8", title="Solutions"),
+        ],
+    },
+    {
+        "_id": "13",
+        "moduleItems": [item(8, "ExternalUrl", _id="1"), item(9, "SubHeader")],
+    },
+]
+
+
+class GraphQLHandler(BaseHTTPRequestHandler):
+    # INFO: ok, errors or missing (the endpoint is turned off)
+    mode = "ok"
+    queries: ClassVar[list[dict[str, Any]]] = []
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.queries.append(request)
+        if self.path != "/api/graphql" or self.mode == "missing":
+            return self.reply(404, {"errors": [{"message": "not found"}]})
+        if self.mode == "errors":
+            return self.reply(200, {"errors": [{"message": "Field doesn't exist"}]})
+        # INFO: One module a page whatever was asked for, to exercise the cursor
+        index = int(request["variables"]["after"] or 0)
+        more = index + 1 < len(MODULES)
+        connection = {
+            "pageInfo": {"hasNextPage": more, "endCursor": str(index + 1)},
+            "nodes": [MODULES[index]],
+        }
+        return self.reply(200, {"data": {"course": {"modulesConnection": connection}}})
+
+    def reply(self, status: int, body: dict[str, Any]):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *_):
+        pass
+
+
+@pytest.fixture
+def graphql_url() -> Generator[str, None, None]:
+    GraphQLHandler.mode = "ok"
+    GraphQLHandler.queries = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), GraphQLHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def discovered(tmp_path: Path, canvas: Canvas, traversal: Traversal) -> set[str]:
+    syncer = Syncer(
+        vanilla_config(tmp_path), canvas=canvas, storage=LocalStorage(tmp_path)
+    )
+    events = syncer.run(traversal=traversal)
+    return {event.path for event in events if isinstance(event, Discovered)}
+
+
+def test_module_items(graphql_url: str):
+    canvas = Canvas(graphql_url, CANVAS_TEST_KEY)
+    course = Course(None, {"id": 1, "course_code": "TEST", "name": "Chill course"})
+    content = CourseContent(course, LinkResolver.for_url(canvas, CANVAS_TEST_URL))
+    items = module_items(canvas, course, content)
+    assert len(GraphQLHandler.queries) == len(MODULES)
+    assert list(items) == [12, 13] and items[13] == []
+    assert [item.type for item in items[12]] == [
+        ModuleItemType.ATTACHMENT,
+        *[ModuleItemType.PAGE] * 3,
+        ModuleItemType.QUIZ,
+        ModuleItemType.ASSIGNMENT,
+        ModuleItemType.DISCUSSION,
+    ]
+    assert [item.content_id for item in items[12]][-2:] == [7, 8]
+    # INFO: Pages came with the items, walking them costs nothing more
+    assert content.page(items[12][1]).body == "hello"
+
+
+def test_module_items_errors(graphql_url: str):
+    canvas = Canvas(graphql_url, CANVAS_TEST_KEY)
+    course = Course(None, {"id": 1, "course_code": "TEST", "name": "Chill course"})
+    GraphQLHandler.mode = "errors"
+    with pytest.raises(GraphQLError, match="Field doesn't exist"):
+        module_items(canvas, course, CourseContent(course))
+
+
+def test_graphql_traversal(
+    tmp_path: Path, canvas: Canvas, graphql_url: str, monkeypatch
+):
+    rest = discovered(tmp_path / "rest", canvas, Traversal.REST)
+    monkeypatch.setattr(
+        Course, "get_page", lambda *_: pytest.fail("Page fetched over REST")
+    )
+    over_graphql = Canvas(graphql_url, CANVAS_TEST_KEY)
+    graphql = discovered(tmp_path / "graphql", over_graphql, Traversal.GRAPHQL)
+    assert rest and graphql == rest
+
+
+@pytest.mark.parametrize("mode", ["missing", "errors"])
+def test_graphql_fallback(tmp_path: Path, canvas: Canvas, graphql_url: str, mode: str):
+    GraphQLHandler.mode = mode
+    rest = discovered(tmp_path / "rest", canvas, Traversal.REST)
+    over_graphql = Canvas(graphql_url, CANVAS_TEST_KEY)
+    graphql = discovered(tmp_path / "graphql", over_graphql, Traversal.GRAPHQL)
+    assert GraphQLHandler.queries
+    assert rest and graphql == rest
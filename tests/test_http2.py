@@ -0,0 +1,95 @@
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import Thread
+
+import pytest
+import requests
+
+from canvy.retry import RetryAdapter
+from canvy.types import RetryPolicy
+
+httpx = pytest.importorskip("httpx")
+
+from canvy.http2 import HTTP2Adapter  # noqa: E402
+
+BODY = bytes(range(256)) * 100
+
+
+def handler(request: "httpx.Request") -> "httpx.Response":
+    match request.url.path:
+        case "/api/v1/courses":
+            assert request.headers["Authorization"] == "Bearer key"
+            return httpx.Response(200, json=[{"id": 1}])
+        case "/files/1/download":
+            return httpx.Response(
+                302, headers={"Location": "https://storage.test/blob"}
+            )
+        case "/blob":
+            return httpx.Response(200, content=BODY)
+        case "/down":
+            e = "refused"
+            raise httpx.ConnectError(e, request=request)
+    return httpx.Response(404, text="Not Found")
+
+
+@pytest.fixture
+def session() -> requests.Session:
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+    adapter = RetryAdapter(RetryPolicy(retries=1), inner=HTTP2Adapter(client))
+    adapter.sleep = lambda _: None
+    session = requests.Session()
+    session.mount("https://", adapter)
+    return session
+
+
+def test_http2_adapter_json(session: requests.Session):
+    response = session.get(
+        "https://canvas.test/api/v1/courses", headers={"Authorization": "Bearer key"}
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == [{"id": 1}]
+    assert session.get("https://canvas.test/nope").status_code == HTTPStatus.NOT_FOUND
+
+
+def test_http2_adapter_streams_redirects(session: requests.Session):
+    with session.get("https://canvas.test/files/1/download", stream=True) as response:
+        assert response.url == "https://storage.test/blob"
+        assert response.raw.read(1000) == BODY[:1000]
+        assert b"".join(response.iter_content(4096)) == BODY[1000:]
+
+
+def test_http2_adapter_connection_errors(session: requests.Session):
+    with pytest.raises(requests.ConnectionError):
+        session.get("https://canvas.test/down")
+
+
+class ProxyHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        # INFO: Proxied requests carry the whole URL
+        body = self.path.encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_):
+        pass
+
+
+def test_http2_adapter_proxies():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ProxyHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    session = requests.Session()
+    session.mount("http://", HTTP2Adapter())
+    proxy = f"http://127.0.0.1:{server.server_port}"
+    response = session.get("http://canvas.test/api/v1/courses", proxies={"http": proxy})
+    server.shutdown()
+    assert response.text == "http://canvas.test/api/v1/courses"
+
+
+def test_http2_adapter_verify(tmp_path: Path):
+    session = requests.Session()
+    session.mount("https://", HTTP2Adapter())
+    with pytest.raises(FileNotFoundError):
+        session.get("https://canvas.test/nope", verify=str(tmp_path / "ca.pem"))
@@ -0,0 +1,53 @@
+from canvasapi.canvas import Canvas
+from canvasapi.course import Course
+from canvasapi.file import File
+
+from canvy.links import LinkExtractor, LinkResolver
+from tests.conftest import CANVAS_TEST_URL
+
+BODY = f"""
+<p><a href="{CANVAS_TEST_URL}/courses/1/files/10/download">absolute</a></p>
+<p><a href="/courses/1/files/11?wrap=1">relative</a></p>
+<img src="/courses/2/files/12/preview"
+  data-api-endpoint="{CANVAS_TEST_URL}/api/v1/courses/2/files/12">
+<a href="https://canvas.alias.edu/courses/3/files/13">alias</a>
+<a href="//UNIVERSITY.canvas.com/courses/1/files/14">protocol relative</a>
+<a href="https://elsewhere.com/courses/1/files/15">not canvas</a>
+<p>see notes/courses/1/files/16 for details</p>
+<a href="/users/1/files/17">personal</a> <a href="/courses/x/files/18">odd</a>
+{CANVAS_TEST_URL}/api/v1/courses/1/files/10
+"""
+
+
+def test_link_extractor():
+    extractor = LinkExtractor([CANVAS_TEST_URL, "canvas.alias.edu"])
+    assert extractor.extract(BODY) == {10: 1, 11: 1, 12: 2, 13: 3, 14: 1}
+    assert LinkExtractor([CANVAS_TEST_URL]).extract("/courses/4/files/5") == {5: 4}
+    assert extractor.extract("/api/v1/courses/4/files/6") == {6: 4}
+    assert extractor.extract("nothing to see") == {}
+
+
+def test_link_resolver_fetches_once(canvas: Canvas, monkeypatch):
+    fetched: list[int] = []
+
+    def get_file(_, id: int) -> File:
+        fetched.append(id)
+        return File(None, {"id": id, "filename": f"{id}.pdf"})
+
+    monkeypatch.setattr(Canvas, "get_file", get_file)
+    resolver = LinkResolver.for_url(canvas, CANVAS_TEST_URL)
+    body = '<a href="/courses/1/files/1">a</a> <a href="/courses/9/files/2">b</a>'
+    assert [f.id for f in resolver.files(body)] == [1, 2]
+    assert [f.id for f in resolver.files(body)] == [1, 2]
+    assert fetched == [1, 2]
+
+
+def test_link_resolver_lists_busy_courses(canvas: Canvas, monkeypatch):
+    listed = [File(None, {"id": id, "filename": f"{id}.pdf"}) for id in range(20)]
+    monkeypatch.setattr(Course, "get_files", lambda *_, **_a: iter(listed))
+    monkeypatch.setattr(
+        Canvas, "get_file", lambda *_: (_ for _ in ()).throw(AssertionError)
+    )
+    resolver = LinkResolver.for_url(canvas, CANVAS_TEST_URL)
+    body = " ".join(f'<a href="/courses/7/files/{id}">' for id in range(12))
+    assert [f.id for f in resolver.files(body)] == list(range(12))
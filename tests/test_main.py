@@ -0,0 +1,65 @@
+from pathlib import Path
+
+import pytest
+from canvasapi.canvas import Canvas
+from typer.testing import CliRunner
+
+from canvy import main
+from canvy.links import LinkResolver
+from canvy.snapshot import SnapshotEntry, SnapshotStore
+from canvy.types import CanvyConfig, ProcessingConfig
+from tests.conftest import vanilla_config
+
+
+def test_download_uses_whole_config(
+    tmp_path: Path, canvas: Canvas, monkeypatch: pytest.MonkeyPatch
+):
+    config = vanilla_config(tmp_path)
+    config.canvas_aliases = ["canvas.alias.edu"]
+    config.processing = ProcessingConfig(
+        processors=["tests.test_processors:describe"], workers=1
+    )
+    aliases: list[list[str]] = []
+    for_url = LinkResolver.for_url
+
+    def record_aliases(canvas: Canvas, url: str, aliases_: list[str]) -> LinkResolver:
+        aliases.append(list(aliases_))
+        return for_url(canvas, url, aliases_)
+
+    def requires_canvas(*, http2: bool = False) -> tuple[Canvas, CanvyConfig]:
+        return canvas, config
+
+    monkeypatch.setattr(main, "requires_canvas", requires_canvas)
+    monkeypatch.setattr(LinkResolver, "for_url", staticmethod(record_aliases))
+    result = CliRunner().invoke(main.cli, ["download"])
+    assert result.exit_code == 0, result.output
+    assert "tests.test_processors:describe: 4 processed, 0 failed" in result.output
+    assert aliases == [["canvas.alias.edu"]]
+
+
+def test_download_shard_with_workers():
+    result = CliRunner().invoke(
+        main.cli, ["download", "--shard", "1/2", "--workers", "2"]
+    )
+    assert result.exit_code == 1
+    assert "can't be used together" in result.output
+
+
+def test_tree_skips_unnamed_levels(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    store = SnapshotStore(tmp_path)
+    writer = store.begin()
+    writer.walk(1)
+    files = (("", "syllabus.pdf"), ("Week 1", "slides.pdf"))
+    for file_id, (module, filename) in enumerate(files, 1):
+        path = "/".join(filter(None, ("Course", module, filename)))
+        writer.add(
+            SnapshotEntry(1, "Course", module, "", file_id, filename, path, 10, None)
+        )
+    snapshot_id = writer.commit()
+    writer.close()
+    monkeypatch.setattr(main, "requires_snapshot", lambda _: (store, snapshot_id))
+    result = CliRunner().invoke(main.cli, ["tree"])
+    assert result.exit_code == 0, result.output
+    lines = result.output.splitlines()
+    assert "syllabus.pdf" in lines[2] and "Week 1" in lines[3]
+    assert "slides.pdf" in lines[4] and not lines[5:]
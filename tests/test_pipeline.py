@@ -0,0 +1,45 @@
+import time
+from threading import Lock, Thread
+
+from canvy.pipeline import BoundedExecutor, ConnectionSlots
+
+
+def test_bounded_executor_limits_pending():
+    workers, pending = 2, 4
+    lock = Lock()
+    in_flight = peak = 0
+
+    def work():
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        time.sleep(0.001)
+        with lock:
+            in_flight -= 1
+
+    with BoundedExecutor(max_workers=workers, max_pending=pending) as executor:
+        for _ in range(50):
+            executor.submit(work)
+            assert executor._work_queue.qsize() <= pending
+    assert peak <= workers
+
+
+def test_bounded_executor_results():
+    with BoundedExecutor(max_workers=3, max_pending=3) as executor:
+        futures = [executor.submit(pow, n, 2) for n in range(20)]
+    assert [f.result() for f in futures] == [n**2 for n in range(20)]
+
+
+def test_connection_slots_yield_to_waiters():
+    slots = ConnectionSlots(1)
+    assert slots.try_acquire()
+    assert not slots.try_acquire()
+    waiter = Thread(target=slots.acquire)
+    waiter.start()
+    while not slots._waiting:
+        time.sleep(0.001)
+    slots.release()
+    waiter.join()
+    slots.release()
+    assert slots.try_acquire()
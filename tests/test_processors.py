@@ -0,0 +1,78 @@
+import zipfile
+from pathlib import Path
+
+import pytest
+from canvasapi.canvas import Canvas
+from pydantic import ValidationError
+
+from canvy.processors import ProcessorResult, load_processor, run_processors, unzip
+from canvy.snapshot import SnapshotEntry
+from canvy.storage import LocalStorage
+from canvy.sync import Downloaded, Processed, Syncer
+from canvy.types import ProcessingConfig
+from tests.conftest import vanilla_config
+
+ENTRY = SnapshotEntry(
+    1, "Course", "Week 1", "Files", 2, "a.zip", "Course/a.zip", 10, None
+)
+
+
+def describe(path: Path, entry: SnapshotEntry) -> str:
+    return f"{entry.module}: {path.name}"
+
+
+def explode(path: Path, entry: SnapshotEntry) -> str:
+    e = "boom"
+    raise RuntimeError(e)
+
+
+def test_unzip(tmp_path: Path):
+    archive = tmp_path / "a.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("notes/one.txt", "1")
+        zf.writestr("../escape.txt", "2")
+    assert unzip(archive, ENTRY) == "Extracted 2 files into a"
+    assert (tmp_path / "a" / "notes" / "one.txt").read_text() == "1"
+    assert not (tmp_path / "escape.txt").exists()
+    (tmp_path / "slides.pdf").write_text("not a zip")
+    assert unzip(tmp_path / "slides.pdf", ENTRY) is None
+
+
+def test_run_processors_isolates_failures(tmp_path: Path):
+    results = run_processors(
+        ("tests.test_processors:explode", "tests.test_processors:describe"),
+        tmp_path / "a.zip",
+        ENTRY,
+    )
+    assert results == [
+        ProcessorResult("tests.test_processors:explode", ok=False, message="boom"),
+        ProcessorResult(
+            "tests.test_processors:describe", ok=True, message="Week 1: a.zip"
+        ),
+    ]
+
+
+def test_processor_specs():
+    with pytest.raises(ValidationError):
+        ProcessingConfig(processors=["not a path"])
+    with pytest.raises(ImportError):
+        load_processor("canvy.processors:nope")
+
+
+def test_syncer_processes_downloads(tmp_path: Path, canvas: Canvas):
+    config = vanilla_config(tmp_path)
+    config.processing = ProcessingConfig(
+        processors=["canvy.processors:unzip", "tests.test_processors:describe"],
+        workers=1,
+    )
+    events = list(Syncer(config, canvas=canvas, storage=LocalStorage(tmp_path)).run())
+    downloaded = [e for e in events if isinstance(e, Downloaded)]
+    processed = [e for e in events if isinstance(e, Processed)]
+    assert downloaded and len(processed) == len(downloaded)
+    assert processed[0].results[1].message == f"Cool 1: {Path(processed[0].path).name}"
+    summary = events[-1].summary  # pyright: ignore[reportAttributeAccessIssue]
+    assert summary.processed == {
+        "canvy.processors:unzip": len(downloaded),
+        "tests.test_processors:describe": len(downloaded),
+    }
+    assert summary.processing_failed == {}
@@ -0,0 +1,189 @@
+import time
+from datetime import UTC, datetime, timedelta
+from email.utils import format_datetime
+from http import HTTPStatus
+
+import pytest
+import requests
+from canvasapi.exceptions import CanvasException, Forbidden, ResourceDoesNotExist
+from requests import PreparedRequest, Response
+from requests.adapters import BaseAdapter
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
+
+from canvy.retry import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryAdapter,
+    RetryQueue,
+    backoff_delay,
+    is_transient,
+    parse_retry_after,
+)
+from canvy.types import RetryPolicy
+
+
+class ScriptedAdapter(BaseAdapter):
+    """
+    Replays a list of status codes or exceptions, one per request
+    """
+
+    def __init__(self, *script: int | Exception, headers: dict[str, str] | None = None):
+        super().__init__()
+        self.script = list(script)
+        self.headers = headers or {}
+        self.calls = 0
+
+    def send(self, request: PreparedRequest, **_) -> Response:
+        self.calls += 1
+        step = self.script.pop(0)
+        if isinstance(step, Exception):
+            raise step
+        response = Response()
+        response.status_code = step
+        response.headers.update(self.headers)
+        response._content = b""
+        response._content_consumed = True
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def get_request(url: str = "https://canvas.test/api/v1/courses") -> PreparedRequest:
+    return requests.Request("GET", url).prepare()
+
+
+def test_parse_retry_after():
+    wait = 60
+    assert parse_retry_after(str(wait)) == wait
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    later = format_datetime(datetime.now(UTC) + timedelta(seconds=wait), usegmt=True)
+    assert wait - 5 < (parse_retry_after(later) or 0) <= wait
+
+
+def test_backoff_delay():
+    policy = RetryPolicy(backoff=1, backoff_max=10)
+    assert policy.backoff / 2 <= backoff_delay(policy, 0) <= policy.backoff
+    capped = policy.backoff * 2**3
+    assert capped / 2 <= backoff_delay(policy, 3) <= capped
+    assert policy.backoff_max / 2 <= backoff_delay(policy, 10) <= policy.backoff_max
+    retry_after = 7
+    assert backoff_delay(policy, 0, str(retry_after)) == retry_after
+    assert backoff_delay(policy, 0, "700") == policy.backoff_max
+
+
+@pytest.mark.parametrize(
+    "error,expected",
+    [
+        (requests.ConnectionError("reset"), True),
+        (ProtocolError("Connection broken"), True),
+        (ReadTimeoutError(None, "/f/1", "Read timed out"), True),
+        (CanvasException("Encountered an error: status code 503"), True),
+        (Forbidden("403 Forbidden (Rate Limit Exceeded)"), True),
+        (Forbidden("not yours"), False),
+        (ResourceDoesNotExist("Not Found"), False),
+        (ValueError("nope"), False),
+    ],
+)
+def test_is_transient(error: Exception, *, expected: bool):
+    assert is_transient(error) == expected
+
+
+def test_retry_adapter_recovers():
+    inner = ScriptedAdapter(requests.ConnectionError("reset"), 503, 200)
+    adapter = RetryAdapter(RetryPolicy(retries=3), inner=inner)
+    delays: list[float] = []
+    adapter.sleep = delays.append
+    assert adapter.send(get_request()).status_code == HTTPStatus.OK
+    assert not inner.script and len(delays) == inner.calls - 1
+
+
+def test_retry_adapter_honours_retry_after():
+    inner = ScriptedAdapter(429, 200, headers={"Retry-After": "2"})
+    adapter = RetryAdapter(RetryPolicy(retries=1), inner=inner)
+    delays: list[float] = []
+    adapter.sleep = delays.append
+    assert adapter.send(get_request()).status_code == HTTPStatus.OK
+    assert delays == [2]
+
+
+def test_retry_adapter_gives_up():
+    inner = ScriptedAdapter(503, 503)
+    adapter = RetryAdapter(RetryPolicy(retries=1), inner=inner)
+    adapter.sleep = lambda _: None
+    assert adapter.send(get_request()).status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert not inner.script
+
+
+def test_retry_adapter_only_retries_idempotent():
+    inner = ScriptedAdapter(503)
+    adapter = RetryAdapter(RetryPolicy(retries=3), inner=inner)
+    request = requests.Request("POST", "https://canvas.test/api/v1/x").prepare()
+    assert adapter.send(request).status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert inner.calls == 1
+
+
+def test_circuit_breaker_opens_per_host():
+    breaker = CircuitBreaker(threshold=2, cooldown=60)
+    inner = ScriptedAdapter(503, 503, 200)
+    adapter = RetryAdapter(RetryPolicy(retries=5), breaker=breaker, inner=inner)
+    adapter.sleep = lambda _: None
+    with pytest.raises(CircuitOpenError):
+        adapter.send(get_request())
+    assert inner.calls == breaker.threshold
+    breaker.check("files.canvas.test")
+    with pytest.raises(CircuitOpenError):
+        breaker.check("canvas.test")
+
+
+def test_circuit_breaker_half_open():
+    breaker = CircuitBreaker(threshold=2, cooldown=0)
+    breaker.record_failure("canvas.test")
+    breaker.record_failure("canvas.test")
+    breaker.check("canvas.test")
+    breaker.record_success("canvas.test")
+    breaker.record_failure("canvas.test")
+    breaker.check("canvas.test")
+
+
+def test_circuit_breaker_single_probe():
+    breaker = CircuitBreaker(threshold=1, cooldown=0.05)
+    breaker.record_failure("canvas.test")
+    time.sleep(0.06)
+    breaker.check("canvas.test")
+    with pytest.raises(CircuitOpenError):
+        breaker.check("canvas.test")
+    breaker.record_failure("canvas.test")
+    with pytest.raises(CircuitOpenError):
+        breaker.check("canvas.test")
+    time.sleep(0.06)
+    breaker.check("canvas.test")
+    breaker.record_success("canvas.test")
+    breaker.check("canvas.test")
+    breaker.check("canvas.test")
+
+
+def test_retry_queue_drain():
+    queue: RetryQueue[str] = RetryQueue()
+    attempts: list[str] = []
+
+    def flaky() -> int:
+        attempts.append("flaky")
+        if len(attempts) == 1:
+            host = "canvas.test"
+            raise CircuitOpenError(host, 1.5)
+        return 1
+
+    def broken() -> int:
+        e = "still down"
+        raise requests.ConnectionError(e)
+
+    queue.push("flaky", flaky)
+    queue.push("broken", broken)
+    queue.push("fine", lambda: 1)
+    waits: list[float] = []
+    total, failed = queue.drain(sleep=waits.append)
+    assert (total, [tag for tag, _ in failed]) == (2, ["broken"])
+    assert waits == [1.5] and not queue
@@ -0,0 +1,102 @@
+from collections.abc import Generator
+from http.server import BaseHTTPRequestHandler
+from pathlib import PurePosixPath
+from typing import Any
+
+import pytest
+from canvasapi.file import File
+from urllib3.exceptions import ProtocolError
+
+from canvy.const import MIN_PART_SIZE
+from canvy.types import StorageBackendKind, StorageConfig
+from canvy.utils import download_structured
+from tests.conftest import SERVED_BODY, serve_file
+
+boto3 = pytest.importorskip("boto3")
+
+from botocore.exceptions import ClientError  # noqa: E402
+
+from canvy.s3 import S3Storage  # noqa: E402
+
+
+class TruncatedHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(SERVED_BODY)))
+        self.end_headers()
+        self.wfile.write(SERVED_BODY[: len(SERVED_BODY) // 2])
+
+    def log_message(self, *_):
+        pass
+
+
+class ReadingClient:
+    """
+    Stands in for a boto3 client, reading uploads to the end like it does
+    """
+
+    def __init__(self):
+        self.uploaded: dict[str, bytes] = {}
+
+    def head_object(self, Bucket: str, Key: str):  # noqa: N803
+        if f"{Bucket}/{Key}" not in self.uploaded:
+            raise ClientError({"Error": {"Code": "404"}}, "HeadObject")
+
+    def upload_fileobj(self, fileobj: Any, bucket: str, key: str, **_: Any):
+        self.uploaded[f"{bucket}/{key}"] = fileobj.read()
+
+
+@pytest.fixture
+def truncated_file() -> Generator[File, None, None]:
+    yield from serve_file(TruncatedHandler)
+
+
+@pytest.fixture
+def s3_config() -> Generator[StorageConfig, None, None]:
+    moto_server = pytest.importorskip("moto.server")
+    server = moto_server.ThreadedMotoServer(ip_address="127.0.0.1", port=0)
+    server.start()
+    host, port = server.get_host_and_port()
+    yield StorageConfig(
+        backend=StorageBackendKind.S3,
+        bucket="archive",
+        prefix="canvas/",
+        endpoint_url=f"http://{host}:{port}",
+        part_size=MIN_PART_SIZE,
+    )
+    server.stop()
+
+
+def test_s3_storage_multipart(
+    s3_config: StorageConfig, served_file: File, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    storage = S3Storage(s3_config)
+    storage.client.create_bucket(Bucket="archive")
+    key = PurePosixPath("Course", "Week 1", "rec.mp4")
+    assert not storage.exists(key)
+    assert storage.write(served_file, key)
+    assert storage.exists(key)
+    uploaded = storage.client.get_object(
+        Bucket="archive", Key="canvas/Course/Week 1/rec.mp4"
+    )
+    assert uploaded["Body"].read() == SERVED_BODY
+    assert uploaded["ETag"].strip('"').endswith("-3")
+
+
+def test_s3_storage_streams(served_file: File):
+    client = ReadingClient()
+    config = StorageConfig(backend=StorageBackendKind.S3, bucket="archive")
+    storage = S3Storage(config, client=client)
+    assert storage.write(served_file, PurePosixPath("Course", "rec.mp4"))
+    assert client.uploaded == {"archive/Course/rec.mp4": SERVED_BODY}
+
+
+def test_s3_storage_dropped_stream(truncated_file: File):
+    config = StorageConfig(backend=StorageBackendKind.S3, bucket="archive")
+    storage = S3Storage(config, client=ReadingClient())
+    # INFO: Raised rather than logged as no access, so the download is retried
+    with pytest.raises(ProtocolError):
+        download_structured(truncated_file, "Course", storage=storage)
@@ -0,0 +1,151 @@
+import re
+from collections.abc import Generator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path, PurePosixPath
+from threading import Lock, Thread
+from typing import ClassVar
+
+import pytest
+from canvasapi.file import File
+from canvasapi.requester import Requester
+
+from canvy.pipeline import ConnectionSlots
+from canvy.segmented import download_segmented
+from canvy.storage import IncompleteDownloadError, LocalStorage
+from canvy.types import SegmentConfig
+from tests.conftest import CANVAS_TEST_KEY, SERVED_BODY, serve_file
+
+BODY = bytes(range(256)) * 4099
+SEGMENT = 64 * 1024
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    # INFO: Each server gets a subclass with its own list
+    ranges: ClassVar[list[str]]
+    lock = Lock()
+
+    def do_GET(self):
+        assert "Authorization" not in self.headers
+        match = re.fullmatch(r"bytes=(\d+)-(\d+)", self.headers.get("Range", ""))
+        if match is None:
+            self.send_response(200)
+            body = BODY
+        else:
+            start, end = int(match.group(1)), int(match.group(2))
+            with self.lock:
+                self.ranges.append(f"{start}-{end}")
+            body = BODY[start : end + 1]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(BODY)}")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_):
+        pass
+
+
+class UnsizedRangeHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        # INFO: Ranges are honoured but the total size is left out
+        body = BODY[:1] if "Range" in self.headers else BODY
+        self.send_response(206 if "Range" in self.headers else 200)
+        if "Range" in self.headers:
+            self.send_header("Content-Range", "bytes 0-0/*")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_):
+        pass
+
+
+def serve(handler: type[BaseHTTPRequestHandler]) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def ranges() -> list[str]:
+    """
+    Byte ranges the storage behind redirected_file was asked for
+    """
+    return []
+
+
+@pytest.fixture
+def redirected_file(ranges: list[str]) -> Generator[File, None, None]:
+    storage = serve(type("Ranges", (RangeHandler,), {"ranges": ranges}))
+
+    class CanvasHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(302)
+            self.send_header("Location", f"http://127.0.0.1:{storage.server_port}/blob")
+            self.end_headers()
+
+        def log_message(self, *_):
+            pass
+
+    canvas = serve(CanvasHandler)
+    base_url = f"http://127.0.0.1:{canvas.server_port}"
+    requester = Requester(base_url, CANVAS_TEST_KEY)
+    yield File(
+        requester,
+        {"id": 1, "filename": "rec.mp4", "url": f"{base_url}/f/1", "size": len(BODY)},
+    )
+    canvas.shutdown()
+    storage.shutdown()
+
+
+def test_download_segmented(tmp_path: Path, redirected_file: File, ranges: list[str]):
+    path = tmp_path / "rec.mp4"
+    config = SegmentConfig(size=SEGMENT, connections=4)
+    download_segmented(redirected_file, path, config, ConnectionSlots(4))
+    assert path.read_bytes() == BODY
+    segments = [r for r in ranges if r != "0-0"]
+    assert len(segments) == -(-len(BODY) // SEGMENT)
+    assert f"{(len(BODY) - 1) // SEGMENT * SEGMENT}-{len(BODY) - 1}" in segments
+
+
+def test_download_segmented_no_spare_connections(tmp_path: Path, redirected_file: File):
+    slots = ConnectionSlots(1)
+    slots.acquire()
+    path = tmp_path / "rec.mp4"
+    download_segmented(redirected_file, path, SegmentConfig(size=SEGMENT), slots)
+    assert path.read_bytes() == BODY
+    assert not slots.try_acquire()
+
+
+def test_local_storage_segments_large_files(
+    tmp_path: Path, redirected_file: File, ranges: list[str]
+):
+    storage = LocalStorage(tmp_path, SegmentConfig(threshold=SEGMENT, size=SEGMENT))
+    key = PurePosixPath("Course", "rec.mp4")
+    assert storage.write(redirected_file, key)
+    assert (tmp_path / "Course" / "rec.mp4").read_bytes() == BODY
+    assert len(ranges) > 1
+    assert storage.slots.try_acquire()
+
+
+def test_download_segmented_without_ranges(tmp_path: Path, served_file: File):
+    path = tmp_path / "rec.mp4"
+    download_segmented(
+        served_file, path, SegmentConfig(size=SEGMENT), ConnectionSlots(4)
+    )
+    assert path.read_bytes() == SERVED_BODY
+
+
+def test_download_segmented_unsized_ranges(tmp_path: Path):
+    for file in serve_file(UnsizedRangeHandler):
+        file.size = len(BODY)
+        storage = LocalStorage(tmp_path, SegmentConfig(threshold=SEGMENT))
+        assert storage.write(file, PurePosixPath("rec.mp4"))
+    assert (tmp_path / "rec.mp4").read_bytes() == BODY
+
+
+def test_local_storage_short_download(tmp_path: Path, served_file: File):
+    served_file.size = len(SERVED_BODY) + 1
+    with pytest.raises(IncompleteDownloadError):
+        LocalStorage(tmp_path).write(served_file, PurePosixPath("rec.mp4"))
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,127 @@
+import sqlite3
+from pathlib import Path
+
+from canvy.const import SNAPSHOTS_KEPT
+from canvy.snapshot import SnapshotEntry, SnapshotStore
+from canvy.types import Shard, ShardBy
+
+
+def entry(file_id: int, course_id: int = 1, size: int = 10) -> SnapshotEntry:
+    return SnapshotEntry(
+        course_id=course_id,
+        course=f"Course {course_id}",
+        module="Week 1",
+        item="Lecture",
+        file_id=file_id,
+        filename=f"{file_id}.pdf",
+        path=f"Course {course_id}/Week 1/{file_id}.pdf",
+        size=size,
+        updated_at="2025-01-01T00:00:00Z",
+    )
+
+
+def record(
+    store: SnapshotStore, *entries: SnapshotEntry, carry: tuple[int, ...] = ()
+) -> int:
+    writer = store.begin()
+    for e in entries:
+        writer.walk(e.course_id)
+        writer.add(e)
+    for course_id in carry:
+        writer.carry_over(course_id)
+    snapshot_id = writer.commit()
+    writer.close()
+    return snapshot_id
+
+
+def test_snapshot_empty(tmp_path: Path):
+    store = SnapshotStore(tmp_path)
+    assert store.latest() is None
+    assert store.snapshots() == []
+
+
+def test_snapshot_roundtrip(tmp_path: Path):
+    store = SnapshotStore(tmp_path)
+    snapshot_id = record(store, entry(1), entry(2, course_id=2, size=5))
+    assert store.latest() == snapshot_id
+    assert [c.files for c in store.courses(snapshot_id)] == [1, 1]
+    assert store.entries(snapshot_id, "Course 2") == [entry(2, course_id=2, size=5)]
+    assert store.entries(snapshot_id, "1") == [entry(1)]
+
+
+def test_snapshot_uncommitted_invisible(tmp_path: Path):
+    store = SnapshotStore(tmp_path)
+    writer = store.begin()
+    writer.add(entry(1))
+    writer.close()
+    assert store.latest() is None
+
+
+def test_snapshot_carry_over(tmp_path: Path):
+    store = SnapshotStore(tmp_path)
+    record(store, entry(1), entry(2, course_id=2))
+    snapshot_id = record(store, entry(3), carry=(2,))
+    assert {e.file_id for e in store.entries(snapshot_id)} == {2, 3}
+
+
+def test_snapshot_carry_over_file_shard(tmp_path: Path):
+    store = SnapshotStore(tmp_path)
+    record(store, entry(1), entry(2))
+    writer = store.begin(Shard(index=1, count=2), ShardBy.FILE)
+    writer.walk(1)
+    writer.add(entry(4))
+    snapshot_id = writer.commit()
+    assert {e.file_id for e in store.entries(snapshot_id)} == {1, 4}
+
+
+def test_snapshot_shards_of_a_run(tmp_path: Path):
+    store = SnapshotStore(tmp_path)
+    before = record(store, entry(1), entry(2), entry(3, course_id=2), entry(5, 3))
+    # INFO: The first shard owns course 2, the second courses 1 and 3
+    first = store.begin(Shard(index=1, count=2), ShardBy.COURSE, run="run")
+    first.carry_over(1)
+    first.carry_over(3)
+    first.walk(2)
+    first.add(entry(6, course_id=2))
+    second = store.begin(Shard(index=2, count=2), ShardBy.COURSE, run="run")
+    second.carry_over(2)
+    second.carry_over(3)
+    second.walk(1)
+    second.add(entry(1))
+    second.add(entry(2))
+    snapshot_id = first.commit()
+    assert second.commit() == snapshot_id
+    assert [info.id for info in store.snapshots()] == [before, snapshot_id]
+    assert sorted(e.file_id for e in store.entries(snapshot_id)) == [1, 2, 5, 6]
+
+
+def test_snapshot_migrates(tmp_path: Path):
+    store = SnapshotStore(tmp_path)
+    store.path.parent.mkdir(parents=True)
+    with sqlite3.connect(store.path) as connection:
+        connection.execute(
+            "CREATE TABLE snapshots (id INTEGER PRIMARY KEY, taken_at TEXT NOT NULL)"
+        )
+    connection.close()
+    assert store.latest() is None
+    snapshot_id = record(store, entry(1))
+    assert store.latest() == snapshot_id
+
+
+def test_snapshot_diff(tmp_path: Path):
+    store = SnapshotStore(tmp_path)
+    old = record(store, entry(1), entry(2))
+    new = record(store, entry(2, size=20), entry(3))
+    diff = store.diff(old, new)
+    assert [e.file_id for e in diff.added] == [3]
+    assert [e.file_id for e in diff.removed] == [1]
+    assert [(a.size, b.size) for a, b in diff.changed] == [(10, 20)]
+    assert not store.diff(new, new)
+
+
+def test_snapshot_prune(tmp_path: Path):
+    store = SnapshotStore(tmp_path)
+    for _ in range(SNAPSHOTS_KEPT + 2):
+        latest = record(store, entry(1))
+    assert len(store.snapshots()) == SNAPSHOTS_KEPT
+    assert store.snapshots()[-1].id == latest
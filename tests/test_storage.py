@@ -0,0 +1,27 @@
+from pathlib import Path, PurePosixPath
+
+import pytest
+from canvasapi.file import File
+
+from canvy.storage import LocalStorage, make_storage
+from canvy.types import StorageBackendKind, StorageConfig
+from tests.conftest import vanilla_config
+
+
+def test_local_storage(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    storage = LocalStorage(tmp_path)
+    key = PurePosixPath("course", "slides.pdf")
+    file = File(None, {"filename": "slides.pdf"})
+    monkeypatch.setattr(file, "download", lambda fn: fn.write_text("hi"))
+    assert not storage.exists(key)
+    assert storage.write(file, key)
+    assert (
+        storage.exists(key) and (tmp_path / "course" / "slides.pdf").read_text() == "hi"
+    )
+    assert not list((tmp_path / "course").glob(".*"))
+
+
+def test_make_storage(tmp_path: Path):
+    assert isinstance(make_storage(vanilla_config(tmp_path)), LocalStorage)
+    with pytest.raises(ValueError):
+        StorageConfig(backend=StorageBackendKind.S3)
@@ -0,0 +1,244 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+import requests
+from canvasapi.canvas import Canvas
+from canvasapi.course import Course
+from canvasapi.exceptions import Unauthorized
+from canvasapi.file import File
+from canvasapi.folder import Folder
+from canvasapi.module import Module
+from canvasapi.page import Page
+
+from canvy.snapshot import SnapshotStore
+from canvy.storage import LocalStorage
+from canvy.sync import (
+    CourseSkipped,
+    CourseStarted,
+    Discovered,
+    Downloaded,
+    Finished,
+    ItemFailed,
+    ModuleStarted,
+    Skipped,
+    Syncer,
+    SyncEvent,
+    SyncSummary,
+)
+from canvy.types import FilterConfig, Layout, Shard, ShardBy, SkipReason
+from tests.conftest import vanilla_config
+
+# INFO: Files the module items of the canvas fixture lead to
+FIXTURE_FILES = 4
+
+
+def summary_of(events: list[SyncEvent]) -> SyncSummary:
+    finished = events[-1]
+    assert isinstance(finished, Finished)
+    return finished.summary
+
+
+def make_syncer(tmp_path: Path, canvas: Canvas) -> Syncer:
+    return Syncer(
+        vanilla_config(tmp_path), canvas=canvas, storage=LocalStorage(tmp_path)
+    )
+
+
+def test_syncer_events(tmp_path: Path, canvas: Canvas):
+    events = list(make_syncer(tmp_path, canvas).run())
+    kinds = [type(event) for event in events]
+    assert kinds[:2] == [CourseStarted, ModuleStarted]
+    assert kinds[-1] is Finished
+    discovered = [e for e in events if isinstance(e, Discovered)]
+    outcomes = [e for e in events if isinstance(e, Downloaded | Skipped)]
+    assert len(discovered) == len(outcomes) == FIXTURE_FILES
+    assert {e.path for e in outcomes if isinstance(e, Downloaded)} >= {
+        "Chill course about testing/Cool 1/slides.pdf"
+    }
+    summary = summary_of(events)
+    assert summary.discovered == FIXTURE_FILES
+    assert summary.downloaded + summary.skipped == FIXTURE_FILES and summary.failed == 0
+
+
+def test_syncer_reusable(tmp_path: Path, canvas: Canvas):
+    syncer = make_syncer(tmp_path, canvas)
+    assert syncer.sync().downloaded > 0
+    events = list(syncer.run())
+    assert [e.reason for e in events if isinstance(e, CourseSkipped)] == [
+        SkipReason.UNCHANGED
+    ]
+    assert summary_of(events).discovered == 0
+
+
+def test_syncer_async(tmp_path: Path, canvas: Canvas):
+    async def collect() -> list[SyncEvent]:
+        return [event async for event in make_syncer(tmp_path, canvas).arun()]
+
+    events = asyncio.run(collect())
+    assert isinstance(events[-1], Finished) and events[-1].summary.downloaded > 0
+
+
+def test_syncer_stop_early(tmp_path: Path, canvas: Canvas):
+    events = make_syncer(tmp_path, canvas).run()
+    assert isinstance(next(events), CourseStarted)
+    events.close()
+
+
+def test_sync_summary_add():
+    total = SyncSummary(downloaded=1, bytes=10, seconds=2) + SyncSummary(
+        downloaded=2, failed=1, bytes=5, seconds=3
+    )
+    assert total == SyncSummary(downloaded=3, failed=1, bytes=15, seconds=3)
+
+
+def test_syncer_snapshot(tmp_path: Path, canvas: Canvas):
+    syncer = make_syncer(tmp_path, canvas)
+    syncer.sync()
+    store = SnapshotStore(tmp_path)
+    first = store.latest()
+    assert first is not None
+    entries = store.entries(first)
+    assert {e.course for e in entries} == {"Chill course about testing"}
+    assert {e.module for e in entries} == {"Cool 1"}
+    # INFO: The unchanged course is carried over rather than dropped
+    syncer.sync()
+    second = store.latest()
+    assert second != first
+    assert store.entries(second) == entries  # pyright: ignore[reportArgumentType]
+    assert not store.diff(first, second)  # pyright: ignore[reportArgumentType]
+
+
+def test_syncer_filters(tmp_path: Path, canvas: Canvas):
+    syncer = make_syncer(tmp_path, canvas)
+    events = list(syncer.run(filters=FilterConfig(exclude_extensions=["pdf"])))
+    reasons = [e.reason for e in events if isinstance(e, Skipped)]
+    assert reasons and set(reasons) == {SkipReason.FILTERED}
+    assert summary_of(events).downloaded == 0
+    # INFO: A different set of filters doesn't trust the fingerprints of this one
+    events = list(syncer.run(filters=FilterConfig(exclude_courses=["Chill*"])))
+    assert [e.reason for e in events if isinstance(e, CourseSkipped)] == [
+        SkipReason.FILTERED
+    ]
+    assert syncer.sync().downloaded > 0
+
+
+def test_syncer_folder_layout(tmp_path: Path, canvas: Canvas, monkeypatch):
+    folders = [
+        Folder(None, {"id": 1, "full_name": "course files"}),
+        Folder(None, {"id": 2, "full_name": "course files/Week 1"}),
+        Folder(None, {"id": 3, "full_name": "course files/Week 1/Extra"}),
+    ]
+    files = [
+        File(None, {"id": 10, "filename": "syllabus.pdf", "folder_id": 1}),
+        File(None, {"id": 11, "filename": "slides.pdf", "folder_id": 3}),
+        File(None, {"id": 12, "filename": "notes.txt", "folder_id": 2}),
+    ]
+    monkeypatch.setattr(Course, "get_folders", lambda *_, **_a: iter(folders))
+    monkeypatch.setattr(Course, "get_files", lambda *_, **_a: iter(files))
+    events = list(make_syncer(tmp_path, canvas).run(layout=Layout.FOLDERS))
+    assert [e.name for e in events if isinstance(e, ModuleStarted)] == [
+        "Chill course about testing",
+        "Week 1",
+        "Week 1/Extra",
+    ]
+    assert {e.path for e in events if isinstance(e, Downloaded)} == {
+        "Chill course about testing/syllabus.pdf",
+        "Chill course about testing/Week 1/notes.txt",
+        "Chill course about testing/Week 1/Extra/slides.pdf",
+    }
+
+
+def test_syncer_folder_layout_fallback(tmp_path: Path, canvas: Canvas, monkeypatch):
+    def hidden(*_, **_a):
+        e = "Files tab hidden"
+        raise Unauthorized(e)
+
+    monkeypatch.setattr(Course, "get_folders", hidden)
+    events = list(make_syncer(tmp_path, canvas).run(layout=Layout.FOLDERS))
+    assert [e.name for e in events if isinstance(e, ModuleStarted)] == ["Cool 1"]
+    assert summary_of(events).discovered == FIXTURE_FILES
+
+
+def test_syncer_folder_layout_hidden_tracks_modules(
+    tmp_path: Path, canvas: Canvas, monkeypatch
+):
+    def hidden(*_, **_a):
+        e = "Files tab hidden"
+        raise Unauthorized(e)
+
+    monkeypatch.setattr(Course, "get_folders", hidden)
+    monkeypatch.setattr(Course, "get_files", hidden)
+    syncer = make_syncer(tmp_path, canvas)
+    syncer.sync(layout=Layout.FOLDERS)
+    events = list(syncer.run(layout=Layout.FOLDERS))
+    assert [e.reason for e in events if isinstance(e, CourseSkipped)] == [
+        SkipReason.UNCHANGED
+    ]
+    courses = Canvas.get_courses
+    added = Module(None, {"id": 13, "name": "Cool 2"})
+    monkeypatch.setattr(added, "get_module_items", lambda *_, **_a: iter([]))
+
+    def with_new_module(*args, **kwargs):
+        for course in courses(*args, **kwargs):
+            modules = course.get_modules()
+            monkeypatch.setattr(
+                course, "get_modules", lambda *_, m=modules, **_a: iter([*m, added])
+            )
+            yield course
+
+    monkeypatch.setattr(Canvas, "get_courses", with_new_module)
+    events = list(syncer.run(layout=Layout.FOLDERS))
+    assert [e.name for e in events if isinstance(e, ModuleStarted)] == [
+        "Cool 1",
+        "Cool 2",
+    ]
+
+
+def test_syncer_hidden_files_tracks_pages(tmp_path: Path, canvas: Canvas, monkeypatch):
+    # INFO: The canvas fixture lists no files, as when the Files tab is hidden
+    syncer = make_syncer(tmp_path, canvas)
+    syncer.sync()
+    events = list(syncer.run())
+    assert [e.reason for e in events if isinstance(e, CourseSkipped)] == [
+        SkipReason.UNCHANGED
+    ]
+    page = Course.get_page
+
+    def edited_page(course: Course, url: str) -> Page:
+        edited = page(course, url)
+        if url == "page-empty":
+            edited.body = '<a href="/courses/1/files/5">new slides</a>'
+        return edited
+
+    edited = Page(None, {"url": "page-empty", "updated_at": "2025-02-01T00:00:00Z"})
+    monkeypatch.setattr(Course, "get_page", edited_page)
+    monkeypatch.setattr(Course, "get_pages", lambda *_, **_a: iter([edited]))
+    events = list(syncer.run())
+    assert not [e for e in events if isinstance(e, CourseSkipped)]
+    assert any(isinstance(e, CourseStarted) for e in events)
+
+
+def test_syncer_shards_share_snapshot(tmp_path: Path, canvas: Canvas):
+    syncer = make_syncer(tmp_path, canvas)
+    for shard_by in ShardBy:
+        for index in (1, 2):
+            shard = Shard(index=index, count=2)
+            syncer.sync(shard=shard, shard_by=shard_by, run_id=f"{shard_by}")
+    store = SnapshotStore(tmp_path)
+    assert len(snapshots := store.snapshots()) == len(ShardBy)
+    assert [snapshot.files for snapshot in snapshots] == [4, 4]
+
+
+def test_syncer_item_failed(
+    tmp_path: Path, canvas: Canvas, monkeypatch: pytest.MonkeyPatch
+):
+    def unreachable(*_):
+        e = "reset"
+        raise requests.ConnectionError(e)
+
+    monkeypatch.setattr("canvy.sync.module_item_files", unreachable)
+    events = list(make_syncer(tmp_path, canvas).run())
+    failed = [e for e in events if isinstance(e, ItemFailed)]
+    assert failed and failed[0].error == "reset"
+    assert summary_of(events).failed == len(failed)
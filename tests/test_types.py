@@ -2,7 +2,7 @@ from pathlib import Path
 
 import pytest
 
-from canvy.types import CanvyConfig
+from canvy.types import CanvyConfig, Shard
 from tests.conftest import vanilla_config
 
 
@@ -34,3 +34,17 @@ def test_serialize_path(tmp_path: Path):
 )
 def test_add_https(url: str, expected: str):
     assert CanvyConfig.add_https(url) == expected
+
+
+def test_shard_parse():
+    assert Shard.parse("2/4") == Shard(index=2, count=4)
+    assert str(Shard.parse(" 1/ 3")) == "1/3"
+    for bad in ("3", "0/2", "5/4", "a/b"):
+        with pytest.raises(ValueError):
+            Shard.parse(bad)
+
+
+def test_shard_owns():
+    shards = [Shard(index=i, count=3) for i in range(1, 4)]
+    for key in range(30):
+        assert sum(shard.owns(key) for shard in shards) == 1
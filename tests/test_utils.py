@@ -1,19 +1,27 @@
+import copy
 import getpass
 import logging.config
+import multiprocessing
 import os
+import queue
+from logging.handlers import QueueHandler
+from multiprocessing.queues import Queue
 from pathlib import Path
 
 import pytest
 from canvasapi.file import File
 from canvasapi.requester import ResourceDoesNotExist
 
+from canvy import utils
 from canvy.const import LOGGING_CONFIG
 from canvy.types import CanvyConfig
 from canvy.utils import (
     better_course_name,
+    claim_file,
     create_dir,
     delete_config,
     download_structured,
+    forward_logging,
     get_config,
     has_config,
     set_config,
@@ -28,12 +36,22 @@ from tests.conftest import (
 logger = logging.getLogger(__name__)
 
 
-def test_setup_logging(monkeypatch: pytest.MonkeyPatch):
-    def mock_dictconfig[T](conf: T) -> T:
-        return conf
-
-    monkeypatch.setattr(logging.config, "dictConfig", mock_dictconfig)
-    assert setup_logging() == LOGGING_CONFIG  # Unbelievably cursed
+def test_setup_logging(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    config = copy.deepcopy(LOGGING_CONFIG)
+    config["handlers"]["file"]["filename"] = tmp_path / "canvy.log"
+    monkeypatch.setattr(utils, "LOGGING_CONFIG", config)
+    monkeypatch.setattr(utils, "LOG_FN", tmp_path / "canvy.log")
+    setup_logging()
+    handler = logging.getHandlerByName("queue")
+    assert isinstance(handler, QueueHandler)
+    assert handler in logging.getLogger().handlers
+    assert handler.listener in utils._started_listeners
+    assert isinstance(handler.queue, queue.Queue)
+    logger.info("Written out by the listener")
+    # INFO: Only returns once the listener thread has handled every queued record
+    handler.queue.join()
+    logging.getLogger().removeHandler(handler)
+    assert "Written out by the listener" in (tmp_path / "canvy.log").read_text()
 
 
 @pytest.mark.parametrize(
@@ -49,6 +67,22 @@ def test_better_course_name(name: str, expected: str):
     assert better_course_name(name) == expected
 
 
+def log_from_worker(records: Queue[logging.LogRecord]):
+    forward_logging(records)
+    logging.getLogger("canvy.worker").info("Hello from %s", "a worker")
+
+
+def test_forward_logging():
+    context = multiprocessing.get_context("spawn")
+    records = context.Queue()
+    worker = context.Process(target=log_from_worker, args=(records,))
+    worker.start()
+    worker.join()
+    record = records.get(timeout=5)
+    assert record.name == "canvy.worker"
+    assert record.getMessage() == "Hello from a worker"
+
+
 def test_create_dir(tmp_path: Path):
     new_path = tmp_path / "1c03177a-e4f6-4ae3-9c36-25b1e0880002"
     create_dir(new_path)
@@ -64,13 +98,11 @@ def test_get_config(tmp_path: Path):
     doc_path = tmp_path / "Documents"
     os.makedirs(doc_path)
     with open(new_path, "w") as fp:
-        fp.write(
-            f"""\
+        fp.write(f"""\
 canvas_key = "{CANVAS_TEST_KEY}"
 canvas_url = "{CANVAS_TEST_URL}"
 storage_path = "{doc_path}"
-"""
-        )
+""")
     equivalent = vanilla_config(doc_path)
     assert get_config(new_path) == equivalent
 
@@ -185,3 +217,28 @@ def test_has_config(tmp_path: Path):
     delete_config(tmp_file_path)
     assert not has_config(tmp_file_path)
     assert not has_config(tmp_path / "doesntexist")
+
+
+def test_claim_file(tmp_path: Path):
+    lock_path = tmp_path / ".slides.pdf.lock"
+    with claim_file(lock_path) as claimed:
+        assert claimed
+        with claim_file(lock_path) as claimed_again:
+            assert not claimed_again
+    assert not lock_path.exists()
+    with claim_file(lock_path) as claimed:
+        assert claimed
+
+
+def test_claim_file_removed_meanwhile(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    lock_path = tmp_path / ".slides.pdf.lock"
+    try_lock = utils._try_lock_fd
+
+    # INFO: The last holder let go and removed it between our open and lock
+    def finished_meanwhile(fd: int) -> bool:
+        lock_path.unlink()
+        return try_lock(fd)
+
+    monkeypatch.setattr(utils, "_try_lock_fd", finished_meanwhile)
+    with claim_file(lock_path) as claimed:
+        assert not claimed